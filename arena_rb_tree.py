@@ -0,0 +1,812 @@
+from array import array
+
+RED = 1
+BLACK = 0
+
+
+class arena_node(object):
+    """arena_node
+    Lightweight view of one node of an arena_rb_tree. The node itself only exists as an
+    index into the columns of the tree, the view is created on demand and reads the
+    columns through the same attribute names as Node (data, left, right, parent, color
+    and size). Two views are equal if they refer to the same index of the same tree.
+    """
+    __slots__ = ('tree', 'index')
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    @property
+    def data(self):
+        return self.tree._key[self.index]
+
+    @property
+    def left(self):
+        return arena_node(self.tree, self.tree._left[self.index])
+
+    @property
+    def right(self):
+        return arena_node(self.tree, self.tree._right[self.index])
+
+    @property
+    def parent(self):
+        return arena_node(self.tree, self.tree._parent[self.index])
+
+    @property
+    def color(self):
+        return 'red' if self.tree._color[self.index] == RED else 'black'
+
+    @property
+    def size(self):
+        return self.tree._size[self.index]
+
+    def __eq__(self, other):
+        return isinstance(other, arena_node) and other.tree is self.tree and other.index == self.index
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((id(self.tree), self.index))
+
+    def __repr__(self):
+        return 'arena_node({!r}, {})'.format(self.data, self.color)
+
+
+class arena_rb_tree(object):
+    """arena_rb_tree
+    Red Black Tree with the same public interface as rb_tree, but instead of one object
+    per node, every field lives in a parallel column indexed by an integer:
+        - left, right, parent and size are array('I') columns
+        - color is an array('b') column holding RED (1) or BLACK (0)
+        - the data is a list, or an array of the given typecode (e.g. 'q' for 64 bit
+          ints or 'd' for floats) which stores the keys unboxed
+    Index 0 is the sentinel. Deleted indices go on a free list and are reused by the
+    next insertions. Nodes handed out by find_node, the traversals etc. are arena_node
+    views that read the columns on demand.
+
+    Attributes
+    ----------
+    typecode: str
+        array typecode of the data column, None to store arbitrary objects in a list
+    root: arena_node
+        view of the root of the tree, None if the tree is empty
+    sentinel: arena_node
+        view of the sentinel (index 0)
+
+    Methods
+    -------
+    from_sorted(iterable, typecode) / from_iterable(iterable, typecode):
+        Class methods which build a balanced tree in O(n) (after sorting, for the latter).
+    print_tree() / print_with_colors():
+        Print the data of all nodes in preorder, optionally with color indicators.
+    __iter__() / __reversed__() / inorder() / preorder() / postorder():
+        Iterate over the nodes.
+    irange(lo, hi, inclusive, reverse):
+        Lazily iterate over the nodes with data between lo and hi in O(log n + k).
+    __len__() / rank(data) / select(k) / count_range(lo, hi):
+        Order statistics in O(log n), see rb_tree.
+    find_min() / find_node(data) / find_successor(data):
+        Searches, see rb_tree.
+    successor(node) / predecessor(node):
+        Neighbours of a node without searching, see rb_tree.
+    insert(data) / bst_insert(data) / delete(data) / delete_node(node):
+        Modifications, see rb_tree. insert returns the new node.
+    insert_many(iterable):
+        Inserts a batch in sorted order.
+    left_rotate(current_node) / right_rotate(current_node):
+        Rotations at the given node, see rb_tree.
+    """
+
+    def __init__(self, typecode = None):
+        self.typecode = typecode
+        self._key = array(typecode, [0]) if typecode else [None]
+        self._left = array('I', [0])
+        self._right = array('I', [0])
+        self._parent = array('I', [0])
+        self._color = array('b', [BLACK])
+        self._size = array('I', [0])
+        self._free = array('I')
+        self._root = 0
+
+    @classmethod
+    def from_sorted(cls, iterable, typecode = None):
+        """Builds a tree from data that is already in ascending order in O(n), without any
+        rotations, see rb_tree.from_sorted.
+
+        Parameters
+        ----------
+        iterable: iterable of int
+            data in ascending order, duplicates are allowed
+        typecode: str
+            array typecode of the data column, None for a list
+
+        Raises
+        ------
+        ValueError
+            if the data is not in ascending order"""
+        items = list(iterable)
+        for i in range(1, len(items)):
+            if items[i] < items[i - 1]:
+                raise ValueError('Error, data is not sorted')
+
+        tree = cls(typecode)
+        n = len(items)
+        if not n:
+            return tree
+        max_depth = n.bit_length() - 1
+        red_depth = max_depth if (n + 1) & n else -1
+
+        # the columns are filled in sorted order, so the node of items[i] is index i + 1
+        tree._key.extend(items)
+        tree._left.extend(array('I', [0]) * n)
+        tree._right.extend(array('I', [0]) * n)
+        tree._parent.extend(array('I', [0]) * n)
+        tree._color.extend(array('b', [BLACK]) * n)
+        tree._size.extend(array('I', [0]) * n)
+
+        # explicit stack of (lo, hi, depth, parent) ranges to build
+        tree._root = n // 2 + 1
+        stack = [(0, n, 0, 0)]
+        left, right, parent, color, size = tree._left, tree._right, tree._parent, tree._color, tree._size
+        while stack:
+            lo, hi, depth, p = stack.pop()
+            mid = (lo + hi) // 2
+            i = mid + 1
+            parent[i] = p
+            size[i] = hi - lo
+            if depth == red_depth:
+                color[i] = RED
+            if lo < mid:
+                left[i] = (lo + mid) // 2 + 1
+                stack.append((lo, mid, depth + 1, i))
+            if mid + 1 < hi:
+                right[i] = (mid + 1 + hi) // 2 + 1
+                stack.append((mid + 1, hi, depth + 1, i))
+        return tree
+
+    @classmethod
+    def from_iterable(cls, iterable, typecode = None):
+        """Builds a tree from data in any order by sorting it first.
+
+        Parameters
+        ----------
+        iterable: iterable of int
+            data of the nodes to insert
+        typecode: str
+            array typecode of the data column, None for a list"""
+        return cls.from_sorted(sorted(iterable), typecode)
+
+    @property
+    def root(self):
+        return arena_node(self, self._root) if self._root else None
+
+    @property
+    def sentinel(self):
+        return arena_node(self, 0)
+
+    def __alloc(self, data, parent):
+        """Helper function which stores a new red leaf and returns its index, reusing a
+        freed index if there is one.
+
+        Parameters
+        ----------
+        data: int
+            data of the new node
+        parent: int
+            index of the parent of the new node"""
+        if self._free:
+            i = self._free.pop()
+            self._key[i] = data
+            self._left[i] = 0
+            self._right[i] = 0
+            self._parent[i] = parent
+            self._color[i] = RED
+            self._size[i] = 1
+        else:
+            i = len(self._left)
+            self._key.append(data)
+            self._left.append(0)
+            self._right.append(0)
+            self._parent.append(parent)
+            self._color.append(RED)
+            self._size.append(1)
+        return i
+
+    def __release(self, i):
+        """Helper function which puts the index of a deleted node on the free list.
+
+        Parameters
+        ----------
+        i: int
+            index of the deleted node"""
+        if self.typecode is None:
+            # drop the reference so the data can be garbage collected
+            self._key[i] = None
+        self._free.append(i)
+
+    def print_tree(self):
+        """Prints the data of all nodes in preorder."""
+        for node in self.preorder():
+            print(str(node.data), end=' ')  # save space
+
+    def print_with_colors(self):
+        """Prints the data of all nodes in preorder, with color indicators."""
+        for node in self.preorder():
+            print(str(node.data) + ('R' if node.color == 'red' else 'B'), end=' ')  # save space
+
+    def __iter__(self):
+        """Iterates over nodes with inorder traversal."""
+        return self.inorder()
+
+    def __reversed__(self):
+        """Iterates over nodes with reverse inorder traversal."""
+        return self.irange(reverse = True)
+
+    def inorder(self):
+        """Iterate over nodes with inorder traversal."""
+        return self.irange()
+
+    def preorder(self):
+        """Iterate over nodes with preorder traversal."""
+        left, right = self._left, self._right
+        stack = [self._root] if self._root else []
+        while stack:
+            i = stack.pop()
+            yield arena_node(self, i)
+            if right[i]:
+                stack.append(right[i])
+            if left[i]:
+                stack.append(left[i])
+
+    def postorder(self):
+        """Iterate over nodes with postorder traversal."""
+        left, right = self._left, self._right
+        stack = []
+        last_visited = 0
+        i = self._root
+        while stack or i:
+            if i:
+                stack.append(i)
+                i = left[i]
+            else:
+                top = stack[-1]
+                if right[top] and right[top] != last_visited:
+                    i = right[top]
+                else:
+                    yield arena_node(self, top)
+                    last_visited = stack.pop()
+
+    def irange(self, lo = None, hi = None, inclusive = (True, True), reverse = False):
+        """Lazily iterates over the nodes whose data lies between lo and hi in
+        O(log n + k), see rb_tree.irange.
+
+        Parameters
+        ----------
+        lo: int
+            lower bound of the range, None for no lower bound
+        hi: int
+            upper bound of the range, None for no upper bound
+        inclusive: (bool, bool)
+            whether lo and hi themselves are part of the range
+        reverse: bool
+            yield the nodes in descending instead of ascending order"""
+        lo_inclusive, hi_inclusive = inclusive
+        key = self._key
+        if not reverse:
+            i = self.__lower_index(lo, lo_inclusive)
+            while i:
+                if hi is not None and (hi < key[i] or (not hi_inclusive and key[i] == hi)):
+                    return
+                yield arena_node(self, i)
+                i = self.__successor(i)
+        else:
+            i = self.__upper_index(hi, hi_inclusive)
+            while i:
+                if lo is not None and (key[i] < lo or (not lo_inclusive and key[i] == lo)):
+                    return
+                yield arena_node(self, i)
+                i = self.__predecessor(i)
+
+    def __lower_index(self, lo, inclusive):
+        """Helper function which returns the index of the first node with data >= lo
+        (> lo if not inclusive), 0 if there is none."""
+        key, left, right = self._key, self._left, self._right
+        i = self._root
+        found = 0
+        while i:
+            if lo is None or lo < key[i] or (inclusive and lo == key[i]):
+                found = i
+                i = left[i]
+            else:
+                i = right[i]
+        return found
+
+    def __upper_index(self, hi, inclusive):
+        """Helper function which returns the index of the last node with data <= hi
+        (< hi if not inclusive), 0 if there is none."""
+        key, left, right = self._key, self._left, self._right
+        i = self._root
+        found = 0
+        while i:
+            if hi is None or key[i] < hi or (inclusive and key[i] == hi):
+                found = i
+                i = right[i]
+            else:
+                i = left[i]
+        return found
+
+    def __successor(self, i):
+        """Helper function which returns the index of the next node in inorder, 0 if i is
+        the largest node."""
+        left, right, parent = self._left, self._right, self._parent
+        if right[i]:
+            i = right[i]
+            while left[i]:
+                i = left[i]
+            return i
+        p = parent[i]
+        while p and i == right[p]:
+            i = p
+            p = parent[p]
+        return p
+
+    def __predecessor(self, i):
+        """Helper function which returns the index of the previous node in inorder, 0 if i
+        is the smallest node."""
+        left, right, parent = self._left, self._right, self._parent
+        if left[i]:
+            i = left[i]
+            while right[i]:
+                i = right[i]
+            return i
+        p = parent[i]
+        while p and i == left[p]:
+            i = p
+            p = parent[p]
+        return p
+
+    def __len__(self):
+        """Returns the number of nodes in the tree."""
+        return self._size[self._root]
+
+    def rank(self, data):
+        """Returns the number of nodes whose data is smaller than the given data.
+
+        Parameters
+        ----------
+        data: int
+            data value to rank"""
+        return self.__count_below(data, False)
+
+    def select(self, k):
+        """Returns the node holding the k-th smallest data (counting from 0).
+
+        Parameters
+        ----------
+        k: int
+            position of the node in an inorder traversal, negative values count from the end
+
+        Raises
+        ------
+        IndexError
+            if k is out of range"""
+        n = len(self)
+        if k < 0:
+            k += n
+        if not 0 <= k < n:
+            raise IndexError('Error, select index out of range')
+        left, right, size = self._left, self._right, self._size
+        i = self._root
+        while True:
+            left_size = size[left[i]]
+            if k < left_size:
+                i = left[i]
+            elif k == left_size:
+                return arena_node(self, i)
+            else:
+                k -= left_size + 1
+                i = right[i]
+
+    def count_range(self, lo, hi):
+        """Returns the number of nodes whose data lies between lo and hi (both inclusive).
+
+        Parameters
+        ----------
+        lo: int
+            lower bound of the range
+        hi: int
+            upper bound of the range"""
+        if hi < lo:
+            return 0
+        return self.__count_below(hi, True) - self.__count_below(lo, False)
+
+    def __count_below(self, data, inclusive):
+        """Helper function which counts the nodes with data smaller than (or equal to, if
+        inclusive) the given data."""
+        key, left, right, size = self._key, self._left, self._right, self._size
+        count = 0
+        i = self._root
+        while i:
+            if data < key[i] or (not inclusive and data == key[i]):
+                i = left[i]
+            else:
+                count += size[left[i]] + 1
+                i = right[i]
+        return count
+
+    def find_min(self):
+        """Returns node with the min value of the tree, if tree is empty returns sentinel."""
+        left = self._left
+        i = self._root
+        while left[i]:
+            i = left[i]
+        return arena_node(self, i)
+
+    def find_node(self, data):
+        """Returns the node object for the given data
+
+        Parameters
+        ----------
+        data: int
+            data value of the node to be found
+
+        Raises
+        ------
+        KeyError
+            If node is not in tree or if tree is empty"""
+        if not self._root:
+            raise KeyError('Error, tree has no root')
+        i = self.__get(data)
+        if not i:
+            raise KeyError('Error, data not found')
+        return arena_node(self, i)
+
+    def __get(self, data):
+        """Helper function which returns the index of a node with the given data, 0 if
+        there is none."""
+        key, left, right = self._key, self._left, self._right
+        i = self._root
+        while i:
+            k = key[i]
+            if data == k:
+                return i
+            i = left[i] if data < k else right[i]
+        return 0
+
+    def find_successor(self, data):
+        """Returns the successor of the node with the given data, None if it is the largest
+        node.
+
+        Parameters
+        ----------
+        data: int
+            data value of the node to find the successor of
+
+        Raises
+        ------
+        KeyError
+            If data is not in tree or if tree is empty"""
+        return self.successor(self.find_node(data))
+
+    def successor(self, node):
+        """Returns the next node in inorder, None if node is the largest node.
+
+        Parameters
+        ----------
+        node: arena_node
+            node of this tree, e.g. as returned by insert or find_node"""
+        i = self.__successor(node.index)
+        return arena_node(self, i) if i else None
+
+    def predecessor(self, node):
+        """Returns the previous node in inorder, None if node is the smallest node.
+
+        Parameters
+        ----------
+        node: arena_node
+            node of this tree, e.g. as returned by insert or find_node"""
+        i = self.__predecessor(node.index)
+        return arena_node(self, i) if i else None
+
+    def insert(self, data):
+        """Adds node with given data to the tree and fixes up the rb properties
+
+        Parameters
+        ----------
+        data: int
+            data of the node to insert
+
+        Returns
+        -------
+        arena_node
+            the new node, valid as a handle until it is deleted"""
+        i = self.__put(data)
+        self.__rb_insert_fixup(i)
+        return arena_node(self, i)
+
+    def insert_many(self, iterable):
+        """Adds nodes for all the given data, in sorted order so that consecutive
+        descents share their path through the columns.
+
+        Parameters
+        ----------
+        iterable: iterable of int
+            data of the nodes to insert"""
+        insert = self.insert
+        for data in sorted(iterable):
+            insert(data)
+
+    def bst_insert(self, data):
+        """Insert of BST, without fixing up the rb properties
+
+        Parameters
+        ----------
+        data: int
+            data of the node to insert"""
+        return arena_node(self, self.__put(data))
+
+    def __put(self, data):
+        """Helper function which adds a red leaf with the given data below the appropriate
+        node and returns its index. Equal data goes to the right."""
+        if not self._root:
+            self._root = self.__alloc(data, 0)
+            return self._root
+        key, left, right, size = self._key, self._left, self._right, self._size
+        i = self._root
+        while True:
+            size[i] += 1
+            if data < key[i]:
+                if left[i]:
+                    i = left[i]
+                else:
+                    new = self.__alloc(data, i)
+                    self._left[i] = new
+                    return new
+            else:
+                if right[i]:
+                    i = right[i]
+                else:
+                    new = self.__alloc(data, i)
+                    self._right[i] = new
+                    return new
+
+    def delete(self, data):
+        """Find and delete node with given data, then fixes up the coloring of the nodes.
+
+        Parameters
+        ----------
+        data: int
+            data of the node to delete
+
+        Raises
+        ------
+        KeyError
+            if data isn't in tree or if tree is empty"""
+        self.delete_node(self.find_node(data))
+
+    def delete_node(self, node):
+        """Deletes the given node without searching for it, then fixes up the coloring of
+        the nodes. Its index goes on the free list, so the handle must not be used again.
+
+        Parameters
+        ----------
+        node: arena_node
+            node of this tree, e.g. as returned by insert or find_node"""
+        z = node.index
+        left, right, parent, color, size = self._left, self._right, self._parent, self._color, self._size
+
+        # y is the node spliced out of its position, see rb_tree.delete
+        if not left[z] or not right[z]:
+            y = z
+        else:
+            y = right[z]
+            while left[y]:
+                y = left[y]
+        y_original_color = color[y]
+
+        a = parent[y]
+        while a:
+            size[a] -= 1
+            a = parent[a]
+
+        if not left[z]:
+            x = right[z]
+            self.__transplant(z, x)
+        elif not right[z]:
+            x = left[z]
+            self.__transplant(z, x)
+        else:
+            x = right[y]
+            if parent[y] == z:
+                parent[x] = y
+            else:
+                self.__transplant(y, x)
+                right[y] = right[z]
+                parent[right[y]] = y
+            self.__transplant(z, y)
+            left[y] = left[z]
+            parent[left[y]] = y
+            color[y] = color[z]
+            size[y] = size[z]
+
+        if y_original_color == BLACK:
+            self.__rb_delete_fixup(x)
+        # the sentinel never keeps links or size
+        parent[0] = left[0] = right[0] = 0
+        color[0] = BLACK
+        self.__release(z)
+
+    def __transplant(self, u, v):
+        """Replaces the subtree rooted at index u with the subtree rooted at index v."""
+        parent = self._parent
+        p = parent[u]
+        if not p:
+            self._root = v
+        elif u == self._left[p]:
+            self._left[p] = v
+        else:
+            self._right[p] = v
+        parent[v] = p
+
+    def left_rotate(self, current_node):
+        """Rotates at current_node to the left, see rb_tree.left_rotate.
+
+        Parameters
+        ----------
+        current_node: arena_node
+            node which to be rotated at
+
+        Raises
+        ------
+        KeyError
+            if the tree is empty or current_node has no right child"""
+        if not self._root or not self._right[current_node.index]:
+            raise KeyError
+        self.__left_rotate(current_node.index)
+
+    def right_rotate(self, current_node):
+        """Rotates at current_node to the right, see rb_tree.right_rotate.
+
+        Parameters
+        ----------
+        current_node: arena_node
+            node which to rotate at
+
+        Raises
+        ------
+        KeyError
+            if the tree is empty or current_node has no left child"""
+        if not self._root or not self._left[current_node.index]:
+            raise KeyError
+        self.__right_rotate(current_node.index)
+
+    def __left_rotate(self, x):
+        """Helper function which rotates left at index x, whose right child must exist."""
+        left, right, parent, size = self._left, self._right, self._parent, self._size
+        y = right[x]
+        right[x] = left[y]
+        if left[y]:
+            parent[left[y]] = x
+        p = parent[x]
+        parent[y] = p
+        if not p:
+            self._root = y
+        elif x == left[p]:
+            left[p] = y
+        else:
+            right[p] = y
+        left[y] = x
+        parent[x] = y
+        size[y] = size[x]
+        size[x] = size[left[x]] + size[right[x]] + 1
+
+    def __right_rotate(self, x):
+        """Helper function which rotates right at index x, whose left child must exist."""
+        left, right, parent, size = self._left, self._right, self._parent, self._size
+        y = left[x]
+        left[x] = right[y]
+        if right[y]:
+            parent[right[y]] = x
+        p = parent[x]
+        parent[y] = p
+        if not p:
+            self._root = y
+        elif x == left[p]:
+            left[p] = y
+        else:
+            right[p] = y
+        right[y] = x
+        parent[x] = y
+        size[y] = size[x]
+        size[x] = size[left[x]] + size[right[x]] + 1
+
+    def __rb_insert_fixup(self, z):
+        """Maintains the balancing and coloring property after bst insertion of index z,
+        see rb_tree._rb_insert_fixup."""
+        left, right, parent, color = self._left, self._right, self._parent, self._color
+        while color[parent[z]] == RED:
+            p = parent[z]
+            g = parent[p]
+            if p == left[g]:
+                y = right[g]
+                if color[y] == RED:
+                    color[p] = BLACK
+                    color[y] = BLACK
+                    color[g] = RED
+                    z = g
+                else:
+                    if z == right[p]:
+                        z = p
+                        self.__left_rotate(z)
+                        p = parent[z]
+                    color[p] = BLACK
+                    color[g] = RED
+                    self.__right_rotate(g)
+            else:
+                y = left[g]
+                if color[y] == RED:
+                    color[p] = BLACK
+                    color[y] = BLACK
+                    color[g] = RED
+                    z = g
+                else:
+                    if z == left[p]:
+                        z = p
+                        self.__right_rotate(z)
+                        p = parent[z]
+                    color[p] = BLACK
+                    color[g] = RED
+                    self.__left_rotate(g)
+        color[self._root] = BLACK
+
+    def __rb_delete_fixup(self, x):
+        """Maintains the balancing and coloring property after bst deletion, starting at
+        index x (which may be the sentinel), see rb_tree._rb_delete_fixup."""
+        left, right, parent, color = self._left, self._right, self._parent, self._color
+        while x != self._root and color[x] == BLACK:
+            p = parent[x]
+            if x == left[p]:
+                w = right[p]
+                if color[w] == RED:
+                    color[w] = BLACK
+                    color[p] = RED
+                    self.__left_rotate(p)
+                    w = right[p]
+                if color[left[w]] == BLACK and color[right[w]] == BLACK:
+                    color[w] = RED
+                    x = p
+                else:
+                    if color[right[w]] == BLACK:
+                        color[left[w]] = BLACK
+                        color[w] = RED
+                        self.__right_rotate(w)
+                        w = right[p]
+                    color[w] = color[p]
+                    color[p] = BLACK
+                    color[right[w]] = BLACK
+                    self.__left_rotate(p)
+                    x = self._root
+            else:
+                w = left[p]
+                if color[w] == RED:
+                    color[w] = BLACK
+                    color[p] = RED
+                    self.__right_rotate(p)
+                    w = left[p]
+                if color[right[w]] == BLACK and color[left[w]] == BLACK:
+                    color[w] = RED
+                    x = p
+                else:
+                    if color[left[w]] == BLACK:
+                        color[right[w]] = BLACK
+                        color[w] = RED
+                        self.__left_rotate(w)
+                        w = left[p]
+                    color[w] = color[p]
+                    color[p] = BLACK
+                    color[left[w]] = BLACK
+                    self.__right_rotate(p)
+                    x = self._root
+        color[x] = BLACK
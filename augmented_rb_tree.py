@@ -0,0 +1,235 @@
+import operator
+
+from rb_tree import Node, rb_tree
+
+
+class augmented_node(Node):
+    """Node of an augmented_rb_tree: value is the monoid value of its data, aggregate
+    the combination of the values of its whole subtree in order."""
+    __slots__ = ('value', 'aggregate')
+
+    def __init__(self, data, left = None, right = None, parent = None, color = 'red', size = 1):
+        Node.__init__(self, data, left, right, parent, color, size)
+        self.value = None
+        self.aggregate = None
+
+
+class augmented_rb_tree(rb_tree):
+    """augmented_rb_tree
+    rb_tree which keeps a monoid aggregate in every node: the values of all data in the
+    subtree, combined in order. The user supplies how a value is derived from the data,
+    an associative combine function and its identity element, e.g. value = size of a
+    record, combine = operator.add and identity = 0 for range sums, or min / max with
+    +-inf for range minima / maxima. The count is the size every node already keeps.
+
+    Every insert updates the aggregates on the path of the new node, every delete those
+    on the path of the removed position, and left_rotate / right_rotate (and with them
+    both fixups) recompute the two nodes they move, so aggregate(lo, hi) combines
+    O(log n) subtree aggregates instead of scanning the range. join and split link
+    nodes through the same insert path, so they and the set operations built on them
+    keep the aggregates too, at O(1) extra per linked node.
+
+    The class methods from_sorted / from_iterable take the monoid as extra arguments,
+    join and split hand it on to the trees they return.
+
+    Attributes
+    ----------
+    value: callable
+        function deriving the value of a node from its data
+    combine: callable
+        associative function combining two values
+    identity: object
+        identity element of combine, the aggregate of an empty range
+
+    Methods
+    -------
+    aggregate(lo, hi, inclusive):
+        Returns the combined values of all data between lo and hi in O(log n).
+    refresh(node):
+        Recomputes the value of a node after its data changed in place.
+    """
+
+    node_class = augmented_node
+
+    def __init__(self, value = None, combine = operator.add, identity = 0):
+        """Creates an empty tree with the given monoid, by default the sum of the data.
+
+        Parameters
+        ----------
+        value: callable
+            derives the value of a node from its data, None for the data itself
+        combine: callable
+            associative function combining two values, in order
+        identity: object
+            identity element of combine"""
+        rb_tree.__init__(self)
+        self.__init_monoid(value, combine, identity)
+
+    @classmethod
+    def from_sorted(cls, iterable, value = None, combine = operator.add, identity = 0):
+        """Builds a balanced tree from sorted data in O(n), see rb_tree.from_sorted, and
+        computes all aggregates bottom up in O(n)."""
+        tree = super(augmented_rb_tree, cls).from_sorted(iterable)
+        augmented_rb_tree.__init_monoid(tree, value, combine, identity)
+        tree.__pull_all()
+        return tree
+
+    @classmethod
+    def from_iterable(cls, iterable, value = None, combine = operator.add, identity = 0):
+        """Sorts the data and builds the tree with from_sorted."""
+        return cls.from_sorted(sorted(iterable), value, combine, identity)
+
+    def __init_monoid(self, value, combine, identity):
+        self.value = value if value is not None else (lambda data: data)
+        self.combine = combine
+        self.identity = identity
+
+    def __subtree(self, node):
+        """Helper function which returns the aggregate of the subtree at node."""
+        return node.aggregate if node is not self.sentinel else self.identity
+
+    def __pull(self, node):
+        """Helper function which recomputes the aggregate of node from its children."""
+        combine = self.combine
+        node.aggregate = combine(combine(self.__subtree(node.left), node.value),
+                                 self.__subtree(node.right))
+
+    def __pull_path(self, node):
+        """Helper function which recomputes the aggregates from node up to the root."""
+        sentinel = self.sentinel
+        while node is not sentinel:
+            self.__pull(node)
+            node = node.parent
+
+    def __pull_all(self):
+        """Helper function which recomputes the values and aggregates of all nodes,
+        children before their parents."""
+        value = self.value
+        for node in self.postorder():
+            node.value = value(node.data)
+            self.__pull(node)
+
+    def refresh(self, node):
+        """Recomputes the value of a node and the aggregates above it, after something
+        its value depends on changed in place (but not its position in the order).
+
+        Parameters
+        ----------
+        node: augmented_node
+            node of this tree"""
+        node.value = self.value(node.data)
+        self.__pull_path(node)
+
+    def _after_link(self, node):
+        # every insert path and every join step links its node through here, the path
+        # above it is updated before the insert fixup rotates anything
+        self.refresh(node)
+
+    def _spawn(self):
+        tree = super(augmented_rb_tree, self)._spawn()
+        augmented_rb_tree.__init_monoid(tree, self.value, self.combine, self.identity)
+        return tree
+
+    def _after_rebuild(self, nodes):
+        # the big batches of insert_many / delete_many relink all nodes at once, the
+        # aggregates are recomputed bottom up in O(n) afterwards
+        self.__pull_all()
+
+    def delete_node(self, node):
+        """Removes the node from the tree, see rb_tree.delete_node, and updates the
+        aggregates above the position that was removed.
+
+        Parameters
+        ----------
+        node: augmented_node
+            node of this tree"""
+        sentinel = self.sentinel
+        # lowest node whose subtree loses a node: the parent of node, or with two
+        # children the parent of the successor that takes node's place (the successor
+        # itself if it is node's right child)
+        if node.left is sentinel or node.right is sentinel:
+            start = node.parent
+        else:
+            start = node.right
+            while start.left is not sentinel:
+                start = start.left
+            if start.parent is not node:
+                start = start.parent
+        super(augmented_rb_tree, self).delete_node(node)
+        # the delete fixup's rotations only recompute nodes from their children, so any
+        # stale aggregate is still on the path from start to the root
+        self.__pull_path(start)
+
+    def left_rotate(self, current_node):
+        super(augmented_rb_tree, self).left_rotate(current_node)
+        if current_node is not None:
+            self.__pull(current_node)
+            self.__pull(current_node.parent)
+
+    def right_rotate(self, current_node):
+        super(augmented_rb_tree, self).right_rotate(current_node)
+        if current_node is not None:
+            self.__pull(current_node)
+            self.__pull(current_node.parent)
+
+    def aggregate(self, lo = None, hi = None, inclusive = (True, True)):
+        """Returns the values of all data between lo and hi, combined in ascending order,
+        in O(log n). The identity if there is no such data.
+
+        Parameters
+        ----------
+        lo: int
+            lower bound of the range, None for no lower bound
+        hi: int
+            upper bound of the range, None for no upper bound
+        inclusive: (bool, bool)
+            whether lo and hi themselves are part of the range, e.g. (True, False) for
+            the half open range [lo, hi)"""
+        if self.root is None:
+            return self.identity
+        sentinel = self.sentinel
+        combine = self.combine
+        lo_inclusive, hi_inclusive = inclusive
+
+        def above_lo(data):
+            return lo is None or lo < data or (lo_inclusive and lo == data)
+
+        def below_hi(data):
+            return hi is None or data < hi or (hi_inclusive and data == hi)
+
+        # 1. descend to the highest node inside the range, the paths to both bounds
+        # split there
+        split = self.root
+        while split is not sentinel:
+            if not above_lo(split.data):
+                split = split.right
+            elif not below_hi(split.data):
+                split = split.left
+            else:
+                break
+        if split is sentinel:
+            return self.identity
+
+        # 2. everything in the left subtree of split is <= hi: walk towards lo and take
+        # every node above it together with its right subtree, which lie right of
+        # (after) everything collected further down
+        left = self.identity
+        current_node = split.left
+        while current_node is not sentinel:
+            if above_lo(current_node.data):
+                left = combine(combine(current_node.value, self.__subtree(current_node.right)), left)
+                current_node = current_node.left
+            else:
+                current_node = current_node.right
+
+        # 3. and symmetrically towards hi in the right subtree
+        right = self.identity
+        current_node = split.right
+        while current_node is not sentinel:
+            if below_hi(current_node.data):
+                right = combine(right, combine(self.__subtree(current_node.left), current_node.value))
+                current_node = current_node.right
+            else:
+                current_node = current_node.left
+
+        return combine(combine(left, split.value), right)
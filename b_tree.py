@@ -0,0 +1,524 @@
+from bisect import bisect_left, bisect_right, insort_right
+
+# maximum number of keys per leaf and of children per inner node
+DEFAULT_FANOUT = 256
+
+
+class b_tree_item(object):
+    """b_tree_item
+    Handle of one key of a b_tree, as returned by insert, find_node, find_successor and
+    the iterators. Keys live in the sorted lists of the leaves and move between leaves
+    when they split or merge, so the handle only carries the data (like the .data of a
+    Node) and not a position in the tree.
+    """
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __repr__(self):
+        return 'b_tree_item({!r})'.format(self.data)
+
+
+class _leaf(object):
+    """Leaf of a b_tree: a sorted list of keys, linked to its neighbours in order."""
+    __slots__ = ('keys', 'prev', 'next')
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.prev = None
+        self.next = None
+
+
+class _branch(object):
+    """Inner node of a b_tree: children[i + 1] only holds keys >= keys[i] and children[i]
+    only keys <= keys[i]. A separator may be stale (smaller than the first key of its
+    child) after deletes, the bounds still hold then."""
+    __slots__ = ('keys', 'children')
+
+    def __init__(self, keys, children):
+        self.keys = keys
+        self.children = children
+
+
+class b_tree(object):
+    """b_tree
+    B+ tree with the same search and modification interface as rb_tree, for large in
+    memory indexes. The keys are kept in the sorted lists of the leaves, up to fanout
+    per leaf, and an inner node holds up to fanout children with a sorted list of
+    separators. A search bisects one short list per level instead of following one
+    pointer and doing one Python comparison per binary level, so a lookup touches about
+    log(n) / log(fanout) nodes, e.g. 3 instead of 20 for a million keys.
+
+    Insert goes right of equal data like rb_tree and splits full nodes on the way back
+    up. Delete removes the first occurrence, merges a leaf that got less than a quarter
+    full into a neighbour that has room and removes empty nodes, so the tree never has
+    more levels than a tree built from the largest number of keys it ever held. The
+    leaves are linked, so the iterators and find_successor walk them without searching.
+
+    Attributes
+    ----------
+    fanout: int
+        maximum number of keys per leaf and children per inner node
+
+    Methods
+    -------
+    from_sorted(iterable, fanout) / from_iterable(iterable, fanout):
+        Class methods which build a tree in O(n) (after sorting, for the latter).
+    __iter__() / __reversed__() / inorder():
+        Iterate over the items in ascending (__reversed__: descending) order.
+    irange(lo, hi, inclusive, reverse):
+        Lazily iterate over the items with data between lo and hi.
+    __len__() / __contains__(data) / height():
+        Number of keys, membership and number of levels.
+    find_min() / find_max() / find_node(data) / find_successor(data):
+        Searches, see rb_tree. They return b_tree_items (None if there is none).
+    insert(data) / delete(data):
+        Modifications, see rb_tree. insert returns an item of the new key.
+    insert_many(iterable):
+        Inserts a batch, merging a large one with the keys and bulk loading the tree.
+    """
+
+    # batches larger than this fraction of the tree are merged and bulk loaded in
+    # O(n + m) instead of inserted one by one, like rb_tree.REBUILD_FRACTION
+    REBUILD_FRACTION = 0.25
+
+    def __init__(self, fanout = DEFAULT_FANOUT):
+        """Creates an empty tree.
+
+        Parameters
+        ----------
+        fanout: int
+            maximum number of keys per leaf and children per inner node, at least 4"""
+        if fanout < 4:
+            raise ValueError('Error, fanout must be at least 4')
+        self.fanout = fanout
+        self.__set_root(_leaf([]))
+        self._len = 0
+        self._mod_count = 0
+
+    @classmethod
+    def from_sorted(cls, iterable, fanout = DEFAULT_FANOUT):
+        """Builds a tree from data that is already in ascending order in O(n). The nodes
+        are filled to three quarters, so the first inserts do not split right away.
+
+        Parameters
+        ----------
+        iterable: iterable of int
+            data in ascending order, duplicates are allowed
+        fanout: int
+            maximum number of keys per leaf and children per inner node
+
+        Raises
+        ------
+        ValueError
+            if the data is not in ascending order"""
+        items = list(iterable)
+        for i in range(1, len(items)):
+            if items[i] < items[i - 1]:
+                raise ValueError('Error, data is not sorted')
+
+        tree = cls(fanout)
+        if not items:
+            return tree
+        fill = max(2, fanout * 3 // 4)
+
+        # 1. the leaves, linked in order
+        level = [_leaf(items[i:i + fill]) for i in range(0, len(items), fill)]
+        for left, right in zip(level, level[1:]):
+            left.next = right
+            right.prev = left
+        first, last = level[0], level[-1]
+        # the first key of every node is the separator in front of it
+        lows = [node.keys[0] for node in level]
+
+        # 2. the inner nodes, level by level up to the root
+        while len(level) > 1:
+            parents = []
+            parent_lows = []
+            for i in range(0, len(level), fill):
+                parents.append(_branch(lows[i + 1:i + fill], level[i:i + fill]))
+                parent_lows.append(lows[i])
+            level, lows = parents, parent_lows
+
+        tree.root = level[0]
+        tree._first, tree._last = first, last
+        tree._len = len(items)
+        return tree
+
+    @classmethod
+    def from_iterable(cls, iterable, fanout = DEFAULT_FANOUT):
+        """Builds a tree from data in any order by sorting it first.
+
+        Parameters
+        ----------
+        iterable: iterable of int
+            data of the keys to insert
+        fanout: int
+            maximum number of keys per leaf and children per inner node"""
+        return cls.from_sorted(sorted(iterable), fanout)
+
+    def __set_root(self, leaf):
+        """Helper function which makes a single leaf the whole tree."""
+        self.root = leaf
+        self._first = leaf
+        self._last = leaf
+
+    def __len__(self):
+        return self._len
+
+    def __contains__(self, data):
+        return self.__locate(data) is not None
+
+    def height(self):
+        """Returns the number of levels, 1 for a tree that is a single leaf."""
+        levels = 1
+        node = self.root
+        while type(node) is _branch:
+            node = node.children[0]
+            levels += 1
+        return levels
+
+    def __descend(self, data, bisect):
+        """Helper function which returns the leaf the given bisect (bisect_left to find
+        the first occurrence of data, bisect_right to insert after the last one) leads
+        to, and the path to it as a list of (branch, child index)."""
+        path = []
+        node = self.root
+        while type(node) is _branch:
+            i = bisect(node.keys, data)
+            path.append((node, i))
+            node = node.children[i]
+        return node, path
+
+    def __locate(self, data):
+        """Helper function which returns (leaf, index) of the first occurrence of data,
+        None if data is not in the tree."""
+        # the descent of __descend, without recording the path
+        node = self.root
+        while type(node) is _branch:
+            node = node.children[bisect_left(node.keys, data)]
+        leaf = node
+        i = bisect_left(leaf.keys, data)
+        if i == len(leaf.keys):
+            # all keys of this leaf are smaller, data can only start the next one
+            leaf, i = leaf.next, 0
+        if leaf is None or leaf.keys[i] != data:
+            return None
+        return leaf, i
+
+    def find_min(self):
+        """Returns the item of the smallest data, None if the tree is empty."""
+        return b_tree_item(self._first.keys[0]) if self._len else None
+
+    def find_max(self):
+        """Returns the item of the largest data, None if the tree is empty."""
+        return b_tree_item(self._last.keys[-1]) if self._len else None
+
+    def find_node(self, data):
+        """Returns an item of the given data
+
+        Parameters
+        ----------
+        data: int
+            data value of the item to be found
+
+        Raises
+        ------
+        KeyError
+            If data is not in tree or if tree is empty"""
+        if self.__locate(data) is None:
+            if not self._len:
+                raise KeyError('Error, tree has no root')
+            raise KeyError('Error, data not found')
+        return b_tree_item(data)
+
+    def find_successor(self, data):
+        """Returns the item after the first occurrence of the given data in order, None
+        if it is the largest data
+
+        Parameters
+        ----------
+        data: int
+            data value of the item to find the successor of
+
+        Raises
+        ------
+        KeyError
+            If data is not in tree or if tree is empty"""
+        if not self._len:
+            raise KeyError('Error, tree has no root')
+        position = self.__locate(data)
+        if position is None:
+            raise KeyError('Error, data not found')
+        leaf, i = position
+        i += 1
+        if i == len(leaf.keys):
+            leaf, i = leaf.next, 0
+            if leaf is None:
+                return None
+        return b_tree_item(leaf.keys[i])
+
+    def __iter__(self):
+        """Iterates over items in ascending order."""
+        return self.inorder()
+
+    def __reversed__(self):
+        """Iterates over items in descending order."""
+        return self.irange(reverse = True)
+
+    def inorder(self):
+        """Iterate over items in ascending order."""
+        return self.irange()
+
+    def irange(self, lo = None, hi = None, inclusive = (True, True), reverse = False):
+        """Lazily iterates over the items whose data lies between lo and hi, leaf by leaf,
+        in O(log n + k). Raises RuntimeError once the tree is modified, see
+        rb_tree.irange.
+
+        Parameters
+        ----------
+        lo: int
+            lower bound of the range, None for no lower bound
+        hi: int
+            upper bound of the range, None for no upper bound
+        inclusive: (bool, bool)
+            whether lo and hi themselves are part of the range
+        reverse: bool
+            yield the items in descending instead of ascending order"""
+        # taken here and not inside the generator, which only starts at its first step
+        return self.__irange(lo, hi, inclusive, reverse, self._mod_count)
+
+    def __irange(self, lo, hi, inclusive, reverse, mod_count):
+        """Generator behind irange, mod_count is the modification count at the time
+        the iterator was created."""
+        if mod_count != self._mod_count:
+            raise RuntimeError('Error, tree changed during iteration')
+        lo_inclusive, hi_inclusive = inclusive
+        if not reverse:
+            if lo is None:
+                leaf, i = self._first, 0
+            else:
+                bisect = bisect_left if lo_inclusive else bisect_right
+                leaf, _ = self.__descend(lo, bisect)
+                i = bisect(leaf.keys, lo)
+            while leaf is not None:
+                keys = leaf.keys
+                # the part of this leaf that is not beyond hi
+                if hi is None:
+                    end = len(keys)
+                else:
+                    end = (bisect_right if hi_inclusive else bisect_left)(keys, hi, i)
+                for j in range(i, end):
+                    yield b_tree_item(keys[j])
+                    if mod_count != self._mod_count:
+                        raise RuntimeError('Error, tree changed during iteration')
+                if end < len(keys):
+                    return
+                leaf, i = leaf.next, 0
+        else:
+            if hi is None:
+                leaf = self._last
+                i = len(leaf.keys)
+            else:
+                bisect = bisect_right if hi_inclusive else bisect_left
+                leaf, _ = self.__descend(hi, bisect)
+                i = bisect(leaf.keys, hi)
+            while leaf is not None:
+                keys = leaf.keys
+                # the part of this leaf that is not below lo
+                if lo is None:
+                    start = 0
+                else:
+                    start = (bisect_left if lo_inclusive else bisect_right)(keys, lo, 0, i)
+                for j in range(i - 1, start - 1, -1):
+                    yield b_tree_item(keys[j])
+                    if mod_count != self._mod_count:
+                        raise RuntimeError('Error, tree changed during iteration')
+                if start > 0:
+                    return
+                leaf = leaf.prev
+                if leaf is not None:
+                    i = len(leaf.keys)
+
+    def insert(self, data):
+        """Inserts data into the leaf it belongs to, after equal data, and splits the
+        nodes that overflow on the way back up.
+
+        Parameters
+        ----------
+        data: int
+            data of the key to insert
+
+        Returns
+        -------
+        b_tree_item
+            item of the new key"""
+        leaf, path = self.__descend(data, bisect_right)
+        insort_right(leaf.keys, data)
+        self._len += 1
+        self._mod_count += 1
+        if len(leaf.keys) > self.fanout:
+            self.__split(leaf, path)
+        return b_tree_item(data)
+
+    def insert_many(self, iterable):
+        """Inserts all the given data. The batch is sorted once and inserted in order; a
+        batch that is large compared with the tree (see REBUILD_FRACTION) is merged with
+        the keys of the tree instead and the tree is bulk loaded like from_sorted. Items
+        only carry the data, so they stay valid either way.
+
+        Parameters
+        ----------
+        iterable: iterable of int
+            data of the keys to insert"""
+        items = sorted(iterable)
+        if not items:
+            return
+        if len(items) > self._len * self.REBUILD_FRACTION:
+            keys = []
+            leaf = self._first
+            while leaf is not None:
+                keys.extend(leaf.keys)
+                leaf = leaf.next
+            # timsort merges the two sorted runs in linear time
+            keys.extend(items)
+            keys.sort()
+            tree = type(self).from_sorted(keys, self.fanout)
+            self.root, self._first, self._last = tree.root, tree._first, tree._last
+            self._len = tree._len
+            self._mod_count += 1
+            return
+        insert = self.insert
+        for data in items:
+            insert(data)
+
+    def __split(self, leaf, path):
+        """Helper function which splits an overflowing leaf in half, and every ancestor
+        that overflows from the new child in turn. Splitting the root adds a level."""
+        # 1. split the leaf and link the new right half in after it
+        mid = len(leaf.keys) // 2
+        right = _leaf(leaf.keys[mid:])
+        del leaf.keys[mid:]
+        right.prev, right.next = leaf, leaf.next
+        if leaf.next is not None:
+            leaf.next.prev = right
+        else:
+            self._last = right
+        leaf.next = right
+
+        # 2. insert the new node into the parent, splitting full parents
+        node, separator, new = leaf, right.keys[0], right
+        while path:
+            parent, i = path.pop()
+            parent.keys.insert(i, separator)
+            parent.children.insert(i + 1, new)
+            if len(parent.children) <= self.fanout:
+                return
+            half = len(parent.children) // 2
+            new = _branch(parent.keys[half:], parent.children[half:])
+            separator = parent.keys[half - 1]
+            del parent.keys[half - 1:]
+            del parent.children[half:]
+            node = parent
+
+        # 3. the root was split
+        self.root = _branch([separator], [node, new])
+
+    def delete(self, data):
+        """Deletes the first occurrence of data, merges its leaf into a neighbour if it
+        became small enough and removes nodes that became empty.
+
+        Parameters
+        ----------
+        data: int
+            data of the key to delete
+
+        Raises
+        ------
+        KeyError
+            if data isn't in tree or if tree is empty"""
+        if not self._len:
+            raise KeyError('Error, tree has no root')
+        leaf, path = self.__descend(data, bisect_left)
+        i = bisect_left(leaf.keys, data)
+        if i == len(leaf.keys) and leaf.next is not None:
+            # data can only start the next leaf, whose path follows from this one's
+            leaf, i = leaf.next, 0
+            self.__advance(path)
+        if i == len(leaf.keys) or leaf.keys[i] != data:
+            raise KeyError('Error, data not found')
+        del leaf.keys[i]
+        self._len -= 1
+        self._mod_count += 1
+
+        if not path:
+            # the root leaf may be empty or small
+            return
+        if not leaf.keys:
+            self.__remove(leaf, path)
+        elif len(leaf.keys) < self.fanout // 4:
+            self.__merge(leaf, path)
+
+    def __advance(self, path):
+        """Helper function which turns the path of a leaf into the path of the next leaf,
+        like incrementing a number digit by digit."""
+        depth = len(path) - 1
+        while path[depth][1] + 1 == len(path[depth][0].children):
+            depth -= 1
+        parent, i = path[depth]
+        path[depth] = (parent, i + 1)
+        node = parent.children[i + 1]
+        for depth in range(depth + 1, len(path)):
+            path[depth] = (node, 0)
+            node = node.children[0]
+
+    def __merge(self, leaf, path):
+        """Helper function which moves the keys of a small leaf into a neighbour with the
+        same parent if they fit into one leaf, and removes the leaf that got empty."""
+        parent, i = path[-1]
+        if i > 0:
+            left = parent.children[i - 1]
+            if len(left.keys) + len(leaf.keys) <= self.fanout:
+                left.keys.extend(leaf.keys)
+                del leaf.keys[:]
+                self.__remove(leaf, path)
+                return
+        if i + 1 < len(parent.children):
+            right = parent.children[i + 1]
+            if len(leaf.keys) + len(right.keys) <= self.fanout:
+                leaf.keys.extend(right.keys)
+                del right.keys[:]
+                path[-1] = (parent, i + 1)
+                self.__remove(right, path)
+
+    def __remove(self, leaf, path):
+        """Helper function which unlinks an empty leaf and removes it from its parent,
+        then every ancestor that is left without children. A root with a single child
+        is replaced by the child."""
+        if leaf.prev is not None:
+            leaf.prev.next = leaf.next
+        else:
+            self._first = leaf.next
+        if leaf.next is not None:
+            leaf.next.prev = leaf.prev
+        else:
+            self._last = leaf.prev
+
+        while path:
+            parent, i = path.pop()
+            del parent.children[i]
+            # the separator in front of the child, or behind it for the first child
+            if parent.keys:
+                del parent.keys[i - 1 if i else 0]
+            if parent.children:
+                break
+
+        root = self.root
+        while type(root) is _branch and len(root.children) == 1:
+            root = root.children[0]
+        if type(root) is _branch and not root.children:
+            root = _leaf([])
+        self.root = root
+        if type(root) is _leaf:
+            self.__set_root(root)
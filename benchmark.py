@@ -0,0 +1,419 @@
+"""Benchmarks for rb_tree against the b_tree engine, a sorted list with bisect and a plain
+dict.
+
+Every operation is timed for every combination of tree size and key distribution, as
+the best of a few repetitions, and reported in operations per second. The build
+additionally reports the peak memory (measured in a separate run under tracemalloc,
+which would distort the timings) and the height of the resulting tree.
+
+Examples
+--------
+    python benchmark.py
+    python benchmark.py --sizes 1000 1000000 --distributions random zipf --output new.json
+    python benchmark.py --output new.json --baseline old.json --threshold 0.2
+
+With --baseline the results are compared against an earlier --output file, and the
+script exits with status 1 if some operation got slower by more than the threshold.
+"""
+import argparse
+import bisect
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from b_tree import b_tree
+from rb_tree import rb_tree
+
+DISTRIBUTIONS = ('random', 'sorted', 'reversed', 'duplicates', 'zipf')
+IMPLEMENTATIONS = ('rb_tree', 'b_tree', 'bisect', 'dict')
+# the partial iteration visits PARTIAL_RANGES ranges of PARTIAL_FRACTION of the keys
+PARTIAL_FRACTION = 0.01
+PARTIAL_RANGES = 100
+
+
+def make_keys(distribution, n, rng):
+    """Returns n keys of the given distribution.
+
+    Parameters
+    ----------
+    distribution: str
+        'random' (uniform, few duplicates), 'sorted', 'reversed', 'duplicates' (about
+        100 copies of each key) or 'zipf' (Zipfian frequencies with exponent 1.1)
+    n: int
+        number of keys
+    rng: random.Random
+        source of randomness, seeded for reproducible runs"""
+    if distribution == 'random':
+        return [rng.randrange(10 * n) for _ in range(n)]
+    if distribution == 'sorted':
+        return list(range(n))
+    if distribution == 'reversed':
+        return list(range(n, 0, -1))
+    if distribution == 'duplicates':
+        return [rng.randrange(max(1, n // 100)) for _ in range(n)]
+    if distribution == 'zipf':
+        # the i-th most frequent key is drawn with weight 1 / i^1.1, and the keys are
+        # shuffled so frequency and order are unrelated
+        values = list(range(n))
+        rng.shuffle(values)
+        weights = list(itertools.accumulate(1.0 / (i ** 1.1) for i in range(1, n + 1)))
+        return rng.choices(values, cum_weights = weights, k = n)
+    raise ValueError('Error, unknown distribution {}'.format(distribution))
+
+
+def height(tree):
+    """Returns the number of nodes on the longest root to leaf path of an rb_tree."""
+    if tree.root is None:
+        return 0
+    best = 0
+    stack = [(tree.root, 1)]
+    while stack:
+        node, depth = stack.pop()
+        best = max(best, depth)
+        for child in (node.left, node.right):
+            if child is not tree.sentinel:
+                stack.append((child, depth + 1))
+    return best
+
+
+# Each implementation maps an operation name to (setup, run): setup(keys) builds the
+# state a run needs (outside of the timing) and run(state, keys) performs the
+# operation once for every key (or visits every key, for the iterations). The partial
+# iterations get the bounds of their ranges instead of the keys.
+
+def _rb_build(keys):
+    tree = rb_tree()
+    for key in keys:
+        tree.insert(key)
+    return tree
+
+
+def _rb_find(tree, keys):
+    find_node = tree.find_node
+    for key in keys:
+        find_node(key)
+
+
+def _rb_successor(tree, keys):
+    find_successor = tree.find_successor
+    for key in keys:
+        find_successor(key)
+
+
+def _rb_partial(tree, bounds):
+    for lo, hi in bounds:
+        for _ in tree.irange(lo, hi):
+            pass
+
+
+def _rb_delete(tree, keys):
+    delete = tree.delete
+    for key in keys:
+        delete(key)
+
+
+def _b_build(keys):
+    tree = b_tree()
+    for key in keys:
+        tree.insert(key)
+    return tree
+
+
+def _list_build(keys):
+    data = []
+    insort = bisect.insort
+    for key in keys:
+        insort(data, key)
+    return data
+
+
+def _list_find(data, keys):
+    bisect_left = bisect.bisect_left
+    for key in keys:
+        i = bisect_left(data, key)
+        if i == len(data) or data[i] != key:
+            raise KeyError(key)
+
+
+def _list_successor(data, keys):
+    bisect_right = bisect.bisect_right
+    n = len(data)
+    for key in keys:
+        i = bisect_right(data, key)
+        data[i] if i < n else None
+
+
+def _list_partial(data, bounds):
+    for lo, hi in bounds:
+        for _ in data[bisect.bisect_left(data, lo):bisect.bisect_right(data, hi)]:
+            pass
+
+
+def _list_delete(data, keys):
+    bisect_left = bisect.bisect_left
+    for key in keys:
+        del data[bisect_left(data, key)]
+
+
+def _dict_build(keys):
+    # a dict has no duplicates, so it counts them like a multiset would
+    counts = {}
+    get = counts.get
+    for key in keys:
+        counts[key] = get(key, 0) + 1
+    return counts
+
+
+def _dict_find(counts, keys):
+    for key in keys:
+        counts[key]
+
+
+def _dict_delete(counts, keys):
+    for key in keys:
+        if counts[key] == 1:
+            del counts[key]
+        else:
+            counts[key] -= 1
+
+
+def _iterate(state, keys):
+    for _ in state:
+        pass
+
+
+def _dict_iterate(counts, keys):
+    # visits every key as often as it was added, like the multisets of the other ones
+    repeat = itertools.repeat
+    for key, count in counts.items():
+        for _ in repeat(key, count):
+            pass
+
+
+def _partial_bounds(keys):
+    """Returns the bounds of PARTIAL_RANGES ranges at deterministic random positions,
+    each holding about PARTIAL_FRACTION of the keys, so a partial iteration visits
+    about as many keys as a full one but also pays for PARTIAL_RANGES range seeks."""
+    ordered = sorted(keys)
+    width = int(len(ordered) * PARTIAL_FRACTION)
+    rng = random.Random(len(ordered))
+    bounds = []
+    for _ in range(PARTIAL_RANGES):
+        start = rng.randrange(len(ordered) - width)
+        bounds.append((ordered[start], ordered[start + width]))
+    return bounds
+
+
+OPERATIONS = {
+    'rb_tree': {
+        'build': (None, lambda state, keys: _rb_build(keys)),
+        'build_sorted': (sorted, lambda state, keys: rb_tree.from_sorted(state)),
+        'find_node': (_rb_build, _rb_find),
+        'find_successor': (_rb_build, _rb_successor),
+        'iterate': (_rb_build, _iterate),
+        'partial_iterate': (_rb_build, _rb_partial),
+        'delete': (_rb_build, _rb_delete),
+    },
+    # the searches, iterations and delete only use the methods both engines share
+    'b_tree': {
+        'build': (None, lambda state, keys: _b_build(keys)),
+        'build_sorted': (sorted, lambda state, keys: b_tree.from_sorted(state)),
+        'find_node': (_b_build, _rb_find),
+        'find_successor': (_b_build, _rb_successor),
+        'iterate': (_b_build, _iterate),
+        'partial_iterate': (_b_build, _rb_partial),
+        'delete': (_b_build, _rb_delete),
+    },
+    'bisect': {
+        'build': (None, lambda state, keys: _list_build(keys)),
+        'build_sorted': (None, lambda state, keys: sorted(keys)),
+        'find_node': (sorted, _list_find),
+        'find_successor': (sorted, _list_successor),
+        'iterate': (sorted, _iterate),
+        'partial_iterate': (sorted, _list_partial),
+        'delete': (sorted, _list_delete),
+    },
+    'dict': {
+        'build': (None, lambda state, keys: _dict_build(keys)),
+        'find_node': (_dict_build, _dict_find),
+        'iterate': (_dict_build, _dict_iterate),
+        'delete': (_dict_build, _dict_delete),
+    },
+}
+
+
+def time_operation(implementation, operation, keys, repeat):
+    """Returns the best time in seconds of the operation over repeat runs, each on a
+    freshly set up state."""
+    setup, run = OPERATIONS[implementation][operation]
+    best = float('inf')
+    for _ in range(repeat):
+        state = setup(keys) if setup is not None else None
+        # the search order is shuffled so lookups do not just follow the insertion
+        # order, but deterministically so every implementation sees the same order
+        if operation in ('build', 'build_sorted'):
+            queries = keys
+        elif operation == 'partial_iterate':
+            queries = _partial_bounds(keys)
+        else:
+            queries = _shuffled(keys)
+        start = time.perf_counter()
+        run(state, queries)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _shuffled(keys):
+    shuffled = list(keys)
+    random.Random(len(keys)).shuffle(shuffled)
+    return shuffled
+
+
+def peak_memory(implementation, keys):
+    """Returns the peak number of bytes allocated while building the structure."""
+    tracemalloc.start()
+    try:
+        OPERATIONS[implementation]['build'][1](None, keys)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(sizes, distributions, implementations, operations, repeat, seed, memory = True):
+    """Runs the benchmarks and returns one result record per measurement.
+
+    Parameters
+    ----------
+    sizes: list of int
+        tree sizes n
+    distributions: list of str
+        key distributions, see make_keys
+    implementations: list of str
+        structures to benchmark, see IMPLEMENTATIONS
+    operations: list of str or None
+        operations to time, None for all of them
+    repeat: int
+        runs per measurement, the best one is reported
+    seed: int
+        seed of the key generation
+    memory: bool
+        whether to measure the peak memory of the builds"""
+    results = []
+    for n in sizes:
+        for distribution in distributions:
+            keys = make_keys(distribution, n, random.Random(seed))
+            for implementation in implementations:
+                for operation in OPERATIONS[implementation]:
+                    if operations is not None and operation not in operations:
+                        continue
+                    seconds = time_operation(implementation, operation, keys, repeat)
+                    record = {
+                        'implementation': implementation,
+                        'operation': operation,
+                        'distribution': distribution,
+                        'n': n,
+                        'seconds': seconds,
+                        'ops_per_sec': n / seconds if seconds else float('inf'),
+                    }
+                    if operation == 'build':
+                        if implementation == 'rb_tree':
+                            record['height'] = height(_rb_build(keys))
+                        elif implementation == 'b_tree':
+                            record['height'] = _b_build(keys).height()
+                        if memory:
+                            record['peak_memory'] = peak_memory(implementation, keys)
+                    results.append(record)
+                    print(_format(record), file = sys.stderr)
+    return results
+
+
+def _format(record):
+    extra = ''
+    if 'height' in record:
+        extra += '  height {}'.format(record['height'])
+    if 'peak_memory' in record:
+        extra += '  peak {:.1f} MiB'.format(record['peak_memory'] / 2 ** 20)
+    return '{implementation:>8} {operation:<16} {distribution:<11} n={n:<9} ' \
+           '{ops_per_sec:>14,.0f} ops/s'.format(**record) + extra
+
+
+def _key(record):
+    return (record['implementation'], record['operation'], record['distribution'],
+            record['n'])
+
+
+def compare(results, baseline, threshold):
+    """Returns the records that got slower than in the baseline by more than the
+    threshold, as (record, baseline ops/sec) pairs.
+
+    Parameters
+    ----------
+    results: list of dict
+        records of the current run
+    baseline: list of dict
+        records of an earlier run
+    threshold: float
+        allowed relative slowdown, e.g. 0.2 for 20%"""
+    before = {_key(record): record['ops_per_sec'] for record in baseline}
+    regressions = []
+    for record in results:
+        old = before.get(_key(record))
+        if old is not None and record['ops_per_sec'] < old * (1 - threshold):
+            regressions.append((record, old))
+    return regressions
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type = int, nargs = '+', default = [10 ** 3, 10 ** 4, 10 ** 5],
+                        help = 'tree sizes, up to 10**7 (the bisect build is quadratic)')
+    parser.add_argument('--distributions', nargs = '+', choices = DISTRIBUTIONS,
+                        default = list(DISTRIBUTIONS))
+    parser.add_argument('--implementations', nargs = '+', choices = IMPLEMENTATIONS,
+                        default = list(IMPLEMENTATIONS))
+    parser.add_argument('--operations', nargs = '+', default = None,
+                        help = 'operations to time, all by default')
+    parser.add_argument('--repeat', type = int, default = 3)
+    parser.add_argument('--seed', type = int, default = 313)
+    parser.add_argument('--no-memory', action = 'store_true',
+                        help = 'skip the (slow) peak memory measurements')
+    parser.add_argument('--output', help = 'write the results as JSON to this file')
+    parser.add_argument('--baseline', help = 'JSON results of an earlier run to compare with')
+    parser.add_argument('--threshold', type = float, default = 0.2,
+                        help = 'relative slowdown reported as a regression')
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.distributions, args.implementations, args.operations,
+                  args.repeat, args.seed, memory = not args.no_memory)
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent = 1)
+    else:
+        json.dump(report, sys.stdout, indent = 1)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for record, old in regressions:
+            print('regression: {}  (was {:,.0f} ops/s)'.format(_format(record), old),
+                  file = sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
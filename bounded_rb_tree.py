@@ -0,0 +1,218 @@
+import heapq
+
+from rb_tree import rb_tree
+
+
+class bounded_rb_tree(rb_tree):
+    """bounded_rb_tree
+    rb_tree holding at most capacity nodes, e.g. the top K scores of a stream. With
+    keep = 'largest' a full tree rejects data that is not larger than its minimum in
+    O(1) by comparing with the cached leftmost node, and any other data evicts the
+    minimum through that pointer (pop_min, no search) before it is inserted.
+    keep = 'smallest' keeps the K smallest data in the same way, evicting the maximum.
+
+    Attributes
+    ----------
+    capacity: int
+        maximum number of nodes, None for no bound
+    keep: str
+        'largest' or 'smallest', which data the tree keeps
+    on_evict: callable
+        called with the data of every evicted node, None to not be told
+    offered / rejected / evicted: int
+        number of data offered to the tree, rejected by a full tree and evicted
+
+    Methods
+    -------
+    insert(data):
+        Inserts data, evicting the worst node if full. Returns None if data is rejected.
+    insert_hint(data, hint) / insert_many(iterable) / union(other) / join(left, data, right):
+        Like the ones of rb_tree, keeping the bound.
+    from_sorted(iterable, capacity, keep, on_evict) / from_iterable(...):
+        Builds a bounded tree from the best capacity data of iterable.
+    eviction_stats():
+        Returns the counters, the fill and the current threshold as a dict.
+    """
+
+    def __init__(self, capacity = None, keep = 'largest', on_evict = None):
+        """Creates an empty bounded tree.
+
+        Parameters
+        ----------
+        capacity: int
+            maximum number of nodes, None for no bound
+        keep: str
+            'largest' to keep the largest data (evicting the minimum), 'smallest' to keep
+            the smallest (evicting the maximum)
+        on_evict: callable
+            called as on_evict(data) for every evicted node"""
+        rb_tree.__init__(self)
+        self.__configure(capacity, keep, on_evict)
+        self.offered = 0
+        self.rejected = 0
+        self.evicted = 0
+        # set while insert_hint runs, whose fallback to insert must not admit data twice
+        self._admitted = False
+
+    @classmethod
+    def from_sorted(cls, iterable, capacity = None, keep = 'largest', on_evict = None):
+        """Builds a bounded tree from data in ascending order in O(n), see
+        rb_tree.from_sorted. Only the capacity best data are built into the tree, the
+        rest is counted as rejected like in insert_many.
+
+        Raises
+        ------
+        ValueError
+            if the data is not in ascending order"""
+        items = list(iterable)
+        offered = len(items)
+        if capacity is not None and offered > capacity:
+            # the best data are at one end, so the rest is only checked for the order
+            for i in range(1, offered):
+                if items[i] < items[i - 1]:
+                    raise ValueError('Error, data is not sorted')
+            items = items[offered - capacity:] if keep == 'largest' else items[:capacity]
+        tree = super(bounded_rb_tree, cls).from_sorted(items)
+        tree.__configure(capacity, keep, on_evict)
+        tree.offered = offered
+        tree.rejected = offered - len(items)
+        return tree
+
+    @classmethod
+    def from_iterable(cls, iterable, capacity = None, keep = 'largest', on_evict = None):
+        """Sorts the data and builds the tree with from_sorted."""
+        return cls.from_sorted(sorted(iterable), capacity, keep, on_evict)
+
+    def __configure(self, capacity, keep, on_evict):
+        """Helper function which checks and sets the bound of the tree."""
+        if keep not in ('largest', 'smallest'):
+            raise ValueError("Error, keep must be 'largest' or 'smallest'")
+        if capacity is not None and capacity < 1:
+            raise ValueError('Error, capacity must be positive')
+        self.capacity = capacity
+        self.keep = keep
+        self.on_evict = on_evict
+
+    def _spawn(self):
+        # the trees of join and split keep the bound, with fresh counters
+        tree = super(bounded_rb_tree, self)._spawn()
+        tree.__configure(self.capacity, self.keep, self.on_evict)
+        return tree
+
+    def __admit(self, data):
+        """Helper function which decides whether data goes into the tree, evicting the
+        worst node first when the tree is full. Returns False if data is rejected."""
+        self.offered += 1
+        if self.capacity is None or not self.root or self.root.size < self.capacity:
+            return True
+        if self.keep == 'largest':
+            if not self.leftmost.data < data:
+                self.rejected += 1
+                return False
+            evicted = self.pop_min()
+        else:
+            if not data < self.rightmost.data:
+                self.rejected += 1
+                return False
+            evicted = self.pop_max()
+        self.evicted += 1
+        if self.on_evict is not None:
+            self.on_evict(evicted)
+        return True
+
+    def insert(self, data):
+        """Inserts data if the tree has room or data beats the worst node, which is then
+        evicted.
+
+        Parameters
+        ----------
+        data: int
+            data of the node to insert
+
+        Returns
+        -------
+        Node
+            the new node, None if data was rejected"""
+        if self._admitted:
+            self._admitted = False
+        elif not self.__admit(data):
+            return None
+        return rb_tree.insert(self, data)
+
+    def insert_hint(self, data, hint):
+        """Like rb_tree.insert_hint, but rejects or evicts like insert.
+
+        Returns
+        -------
+        Node
+            the new node, None if data was rejected"""
+        worst = self.leftmost if self.keep == 'largest' else self.rightmost
+        if hint is worst and self.capacity is not None and len(self) >= self.capacity:
+            # the hint may be evicted below, insert descends from the root instead
+            hint = None
+        if not self.__admit(data):
+            return None
+        self._admitted = True
+        try:
+            return rb_tree.insert_hint(self, data, hint)
+        finally:
+            self._admitted = False
+
+    def insert_many(self, iterable):
+        """Offers all the given data. Only the capacity best data of the batch can end
+        up in the tree, so the rest is counted as rejected right away.
+
+        Parameters
+        ----------
+        iterable: iterable of int
+            data to offer"""
+        items = list(iterable)
+        if self.capacity is not None and len(items) > self.capacity:
+            best = heapq.nlargest if self.keep == 'largest' else heapq.nsmallest
+            kept = best(self.capacity, items)
+            self.offered += len(items) - len(kept)
+            self.rejected += len(items) - len(kept)
+            items = kept
+        for data in items:
+            self.insert(data)
+
+    def union(self, other):
+        """Like rb_tree.union, then evicts the worst nodes beyond the capacity."""
+        rb_tree.union(self, other)
+        self.__trim()
+
+    @classmethod
+    def join(cls, left, data, right):
+        """Like rb_tree.join, then evicts the worst nodes beyond the capacity of left."""
+        tree = super(bounded_rb_tree, cls).join(left, data, right)
+        tree.__trim()
+        return tree
+
+    def __trim(self):
+        """Helper function which evicts the worst nodes until the tree fits."""
+        if self.capacity is None:
+            return
+        while len(self) > self.capacity:
+            evicted = self.pop_min() if self.keep == 'largest' else self.pop_max()
+            self.evicted += 1
+            if self.on_evict is not None:
+                self.on_evict(evicted)
+
+    def eviction_stats(self):
+        """Returns the counters, the number of nodes, the capacity and the threshold (the
+        data a new one has to beat once the tree is full, None while it is empty)."""
+        if not self.root:
+            threshold = None
+        elif self.keep == 'largest':
+            threshold = self.leftmost.data
+        else:
+            threshold = self.rightmost.data
+        return {
+            'capacity': self.capacity,
+            'size': len(self),
+            'offered': self.offered,
+            'accepted': self.offered - self.rejected,
+            'rejected': self.rejected,
+            'evicted': self.evicted,
+            'threshold': threshold,
+        }
@@ -0,0 +1,269 @@
+import threading
+from contextlib import contextmanager
+
+from rb_tree import rb_tree
+
+
+class rw_lock(object):
+    """rw_lock
+    Readers-writer lock: any number of readers may hold it at the same time, a writer
+    holds it alone. Waiting writers are preferred over new readers, so a steady stream
+    of readers cannot starve the writer. The lock is not reentrant.
+
+    Methods
+    -------
+    acquire_read() / release_read():
+        Enter / leave a shared section.
+    acquire_write() / release_write():
+        Enter / leave an exclusive section.
+    read_locked() / write_locked():
+        Context managers around the above.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    def acquire_read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+    @contextmanager
+    def read_locked(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class concurrent_rb_tree(object):
+    """concurrent_rb_tree
+    Thread-safe wrapper around an rb_tree. Searches, order statistics and the steps of
+    the iterators take a shared read lock and run alongside each other, modifications
+    take the exclusive write lock and are serialized.
+
+    Iterators do not hold the lock between steps: every step (or chunk of ITER_CHUNK
+    nodes) takes the read lock, and the tree's modification counter makes an iterator
+    raise RuntimeError as soon as a writer changed the tree since it was created,
+    instead of silently walking a rotated tree.
+
+    Nodes returned by the searches are live handles into the tree; reading their fields
+    outside of a read_section() races with writers.
+
+    Attributes
+    ----------
+    tree: rb_tree
+        the wrapped tree, only to be used directly inside read_section / write_batch
+
+    Methods
+    -------
+    read_section():
+        Context manager holding the read lock once for several reads, yields the tree.
+    write_batch():
+        Context manager holding the write lock once for several writes, yields the tree.
+    __len__() / find_min() / find_max() / peek_min() / peek_max() / find_node(data) /
+    find_successor(data) / successor(node) / predecessor(node) / floor(data) /
+    ceiling(data) / lower_bound(data) / upper_bound(data) / find_predecessor(data) /
+    nearest(data, k) / rank(data) / select(k) / count_range(lo, hi) /
+    contains_many(iterable) / find_many(iterable):
+        Reads under the read lock, see rb_tree.
+    __iter__() / __reversed__() / inorder() / preorder() / postorder() /
+    irange(lo, hi, inclusive, reverse):
+        Fail-fast iterators which take the read lock per chunk.
+    insert(data) / insert_hint(data, hint) / delete(data) / delete_node(node) /
+    pop_min() / pop_max() / insert_many(iterable) / delete_many(iterable):
+        Modifications under the write lock, see rb_tree.
+    """
+
+    # number of nodes an iterator fetches per acquisition of the read lock
+    ITER_CHUNK = 64
+
+    def __init__(self, tree = None):
+        self.tree = tree if tree is not None else rb_tree()
+        self._lock = rw_lock()
+
+    @contextmanager
+    def read_section(self):
+        """Holds the read lock for the duration of the with block and yields the wrapped
+        tree, which must only be read inside it."""
+        with self._lock.read_locked():
+            yield self.tree
+
+    @contextmanager
+    def write_batch(self):
+        """Holds the write lock for the duration of the with block and yields the wrapped
+        tree, so a batch of modifications takes the lock once instead of once per call."""
+        with self._lock.write_locked():
+            yield self.tree
+
+    def __read(self, method, *args):
+        """Helper function which calls a method of the tree under the read lock."""
+        with self._lock.read_locked():
+            return method(*args)
+
+    def __write(self, method, *args):
+        """Helper function which calls a method of the tree under the write lock."""
+        with self._lock.write_locked():
+            return method(*args)
+
+    def __len__(self):
+        return self.__read(self.tree.__len__)
+
+    def find_min(self):
+        return self.__read(self.tree.find_min)
+
+    def find_max(self):
+        return self.__read(self.tree.find_max)
+
+    def peek_min(self):
+        return self.__read(self.tree.peek_min)
+
+    def peek_max(self):
+        return self.__read(self.tree.peek_max)
+
+    def find_node(self, data):
+        return self.__read(self.tree.find_node, data)
+
+    def find_successor(self, data):
+        return self.__read(self.tree.find_successor, data)
+
+    def successor(self, node):
+        return self.__read(self.tree.successor, node)
+
+    def predecessor(self, node):
+        return self.__read(self.tree.predecessor, node)
+
+    def floor(self, data):
+        return self.__read(self.tree.floor, data)
+
+    def ceiling(self, data):
+        return self.__read(self.tree.ceiling, data)
+
+    def lower_bound(self, data):
+        return self.__read(self.tree.lower_bound, data)
+
+    def upper_bound(self, data):
+        return self.__read(self.tree.upper_bound, data)
+
+    def find_predecessor(self, data):
+        return self.__read(self.tree.find_predecessor, data)
+
+    def nearest(self, data, k = 1):
+        return self.__read(self.tree.nearest, data, k)
+
+    def rank(self, data):
+        return self.__read(self.tree.rank, data)
+
+    def select(self, k):
+        return self.__read(self.tree.select, k)
+
+    def count_range(self, lo, hi):
+        return self.__read(self.tree.count_range, lo, hi)
+
+    def contains_many(self, iterable):
+        return self.__read(self.tree.contains_many, iterable)
+
+    def find_many(self, iterable):
+        return self.__read(self.tree.find_many, iterable)
+
+    def insert(self, data):
+        return self.__write(self.tree.insert, data)
+
+    def insert_hint(self, data, hint):
+        return self.__write(self.tree.insert_hint, data, hint)
+
+    def delete(self, data):
+        return self.__write(self.tree.delete, data)
+
+    def delete_node(self, node):
+        return self.__write(self.tree.delete_node, node)
+
+    def pop_min(self):
+        return self.__write(self.tree.pop_min)
+
+    def pop_max(self):
+        return self.__write(self.tree.pop_max)
+
+    def insert_many(self, iterable):
+        return self.__write(self.tree.insert_many, iterable)
+
+    def delete_many(self, iterable):
+        return self.__write(self.tree.delete_many, iterable)
+
+    def __iter__(self):
+        return self.inorder()
+
+    def __reversed__(self):
+        return self.irange(reverse = True)
+
+    def inorder(self):
+        return self.irange()
+
+    def preorder(self):
+        return self.__locked_iter(self.tree.preorder)
+
+    def postorder(self):
+        return self.__locked_iter(self.tree.postorder)
+
+    def irange(self, lo = None, hi = None, inclusive = (True, True), reverse = False):
+        return self.__locked_iter(self.tree.irange, lo, hi, inclusive, reverse)
+
+    def __locked_iter(self, method, *args):
+        """Helper function which creates an iterator of the tree under the read lock, right
+        away, and returns a generator advancing it in chunks. The iterator of the tree
+        itself raises RuntimeError when a writer got in after it was created."""
+        with self._lock.read_locked():
+            iterator = method(*args)
+        return self.__chunks(iterator)
+
+    def __chunks(self, iterator):
+        """Helper generator which advances an iterator of the tree in chunks, each under
+        the read lock."""
+        lock = self._lock
+        chunk_size = self.ITER_CHUNK
+        while True:
+            chunk = []
+            with lock.read_locked():
+                for node in iterator:
+                    chunk.append(node)
+                    if len(chunk) == chunk_size:
+                        break
+            if not chunk:
+                return
+            # yield outside of the lock, the consumer may take as long as it wants
+            for node in chunk:
+                yield node
+            if len(chunk) < chunk_size:
+                return
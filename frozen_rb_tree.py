@@ -0,0 +1,257 @@
+from bisect import bisect_left, bisect_right
+
+try:
+    import numpy
+except ImportError:  # numpy is optional, only used by the batch lookups
+    numpy = None
+
+
+class frozen_rb_tree(object):
+    """frozen_rb_tree
+    Immutable, read-only version of an rb_tree (see rb_tree.freeze). The data lives in
+    one contiguous sorted list instead of linked Nodes, so a lookup is a binary search
+    done by bisect in C, without following any pointers in Python. Batched lookups with
+    NumPy arrays run through numpy.searchsorted on a NumPy copy of the data, which is
+    made on the first batch call.
+
+    Since there are no Nodes, searches return data or positions and the iterators yield
+    the data itself.
+
+    Methods
+    -------
+    thaw():
+        Returns a new mutable rb_tree with the same data, built in O(n).
+    __len__() / __contains__(data) / __iter__() / __reversed__() / inorder():
+        Size, membership and iteration over the data in ascending (descending) order.
+    find(data):
+        Returns the position of the first occurrence of data.
+    find_successor(data):
+        Returns the data following the first occurrence of data, else None.
+    rank(data) / select(k) / count_range(lo, hi):
+        Order statistics in O(log n), see rb_tree.
+    irange(lo, hi, inclusive, reverse):
+        Lazily iterate over the data between lo and hi in O(log n + k).
+    contains_many(keys) / rank_many(keys) / find_many(keys):
+        Batched lookups, vectorized with numpy.searchsorted for NumPy arrays.
+    """
+    __slots__ = ('_data', '_array')
+
+    def __init__(self, iterable = ()):
+        """Builds the frozen tree from sorted data in O(n).
+
+        Parameters
+        ----------
+        iterable: iterable of int
+            data in ascending order, e.g. a traversal of an rb_tree
+
+        Raises
+        ------
+        ValueError
+            if the data is not in ascending order"""
+        data = list(iterable)
+        for i in range(1, len(data)):
+            if data[i] < data[i - 1]:
+                raise ValueError('Error, data is not sorted')
+        self._data = data
+        self._array = None
+
+    @classmethod
+    def from_sequence(cls, sequence):
+        """Wraps an already sorted sequence without copying or checking it, e.g. the keys
+        of a memory-mapped file (see rb_tree_io.load_mmap).
+
+        Parameters
+        ----------
+        sequence: sequence
+            data in ascending order, supporting len() and indexing"""
+        frozen = cls.__new__(cls)
+        frozen._data = sequence
+        frozen._array = None
+        return frozen
+
+    def thaw(self):
+        """Returns a new mutable rb_tree holding the same data, built in O(n)."""
+        from rb_tree import rb_tree
+        return rb_tree.from_sorted(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, data):
+        i = bisect_left(self._data, data)
+        return i < len(self._data) and self._data[i] == data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __reversed__(self):
+        return reversed(self._data)
+
+    def inorder(self):
+        """Iterate over the data in ascending order."""
+        return iter(self._data)
+
+    def find(self, data):
+        """Returns the position of the first occurrence of the given data
+
+        Parameters
+        ----------
+        data: int
+            data value to be found
+
+        Raises
+        ------
+        KeyError
+            If data is not in the tree or if the tree is empty"""
+        if not self._data:
+            raise KeyError('Error, tree has no root')
+        i = bisect_left(self._data, data)
+        if i < len(self._data) and self._data[i] == data:
+            return i
+        raise KeyError('Error, data not found')
+
+    def find_successor(self, data):
+        """Returns the data following the first occurrence of the given data, None if it
+        is the last one.
+
+        Parameters
+        ----------
+        data: int
+            data value to find the successor of
+
+        Raises
+        ------
+        KeyError
+            If data is not in the tree or if the tree is empty"""
+        i = self.find(data) + 1
+        return self._data[i] if i < len(self._data) else None
+
+    def rank(self, data):
+        """Returns the number of data values smaller than the given data.
+
+        Parameters
+        ----------
+        data: int
+            data value to rank"""
+        return bisect_left(self._data, data)
+
+    def select(self, k):
+        """Returns the k-th smallest data (counting from 0, negative from the end).
+
+        Parameters
+        ----------
+        k: int
+            position in ascending order
+
+        Raises
+        ------
+        IndexError
+            if k is out of range"""
+        n = len(self._data)
+        if not -n <= k < n:
+            raise IndexError('Error, select index out of range')
+        return self._data[k]
+
+    def count_range(self, lo, hi):
+        """Returns the number of data values between lo and hi (both inclusive).
+
+        Parameters
+        ----------
+        lo: int
+            lower bound of the range
+        hi: int
+            upper bound of the range"""
+        if hi < lo:
+            return 0
+        return bisect_right(self._data, hi) - bisect_left(self._data, lo)
+
+    def irange(self, lo = None, hi = None, inclusive = (True, True), reverse = False):
+        """Lazily iterates over the data between lo and hi, in O(log n + k).
+
+        Parameters
+        ----------
+        lo: int
+            lower bound of the range, None for no lower bound
+        hi: int
+            upper bound of the range, None for no upper bound
+        inclusive: (bool, bool)
+            whether lo and hi themselves are part of the range
+        reverse: bool
+            yield the data in descending instead of ascending order"""
+        data = self._data
+        start = 0
+        stop = len(data)
+        if lo is not None:
+            start = bisect_left(data, lo) if inclusive[0] else bisect_right(data, lo)
+        if hi is not None:
+            stop = bisect_right(data, hi) if inclusive[1] else bisect_left(data, hi)
+        if reverse:
+            return (data[i] for i in range(stop - 1, start - 1, -1))
+        return (data[i] for i in range(start, stop))
+
+    def __as_array(self):
+        """Helper function which returns (and caches) the data as a NumPy array, None if
+        NumPy is missing or the data is not numeric."""
+        if self._array is None and numpy is not None:
+            array = numpy.asarray(self._data)
+            self._array = array if array.dtype != object else False
+        return self._array if self._array is not False else None
+
+    def rank_many(self, keys):
+        """Returns rank(key) for each of the keys, in input order. A NumPy array of keys is
+        answered with one numpy.searchsorted call.
+
+        Parameters
+        ----------
+        keys: iterable of int or numpy.ndarray
+            data values to rank"""
+        if numpy is not None and isinstance(keys, numpy.ndarray):
+            array = self.__as_array()
+            if array is not None:
+                return numpy.searchsorted(array, keys, side = 'left')
+            keys = keys.tolist()
+        data = self._data
+        return [bisect_left(data, key) for key in keys]
+
+    def contains_many(self, keys):
+        """Returns for each of the keys whether it is in the tree, in input order, as a
+        NumPy bool array for NumPy input.
+
+        Parameters
+        ----------
+        keys: iterable of int or numpy.ndarray
+            data values to look up"""
+        if numpy is not None and isinstance(keys, numpy.ndarray):
+            array = self.__as_array()
+            if array is not None:
+                if not len(array):
+                    return numpy.zeros(len(keys), dtype = bool)
+                positions = numpy.minimum(numpy.searchsorted(array, keys), len(array) - 1)
+                return array[positions] == keys
+            return numpy.array(self.contains_many(keys.tolist()), dtype = bool)
+        data = self._data
+        n = len(data)
+        result = []
+        for key in keys:
+            i = bisect_left(data, key)
+            result.append(i < n and data[i] == key)
+        return result
+
+    def find_many(self, keys):
+        """Returns for each of the keys the position of its first occurrence, or -1 if it
+        is not in the tree, in input order (a NumPy int array for NumPy input).
+
+        Parameters
+        ----------
+        keys: iterable of int or numpy.ndarray
+            data values to look up"""
+        if numpy is not None and isinstance(keys, numpy.ndarray):
+            positions = numpy.asarray(self.rank_many(keys))
+            return numpy.where(self.contains_many(keys), positions, -1)
+        data = self._data
+        n = len(data)
+        result = []
+        for key in keys:
+            i = bisect_left(data, key)
+            result.append(i if i < n and data[i] == key else -1)
+        return result
@@ -0,0 +1,162 @@
+from augmented_rb_tree import augmented_rb_tree
+
+
+def _end(interval):
+    return interval[1]
+
+
+def _max_end(a, b):
+    """max with None as the identity, so endpoints of any comparable type work."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return a if b < a else b
+
+
+class interval_rb_tree(augmented_rb_tree):
+    """interval_rb_tree
+    Interval tree: the data are closed intervals (start, end), ordered by start (then
+    end), and the aggregate of every node is the maximum end in its subtree (see
+    augmented_rb_tree), which insert, delete and the rotations keep correct. A query
+    skips every subtree whose maximum end lies before the query and stops at the first
+    start after it, so it visits O(log n) nodes per reported interval in the worst case
+    and O(log n + k) for the usual, not deeply nested intervals.
+
+    Methods
+    -------
+    add(start, end) / remove(start, end):
+        Insert / delete an interval.
+    overlapping(lo, hi):
+        Lazily iterate over the nodes of the intervals overlapping [lo, hi], by start.
+    stab(point):
+        Lazily iterate over the nodes of the intervals containing point.
+    count_overlapping(lo, hi):
+        Returns the number of intervals overlapping [lo, hi].
+    """
+
+    def __init__(self):
+        augmented_rb_tree.__init__(self, value = _end, combine = _max_end, identity = None)
+
+    @classmethod
+    def from_sorted(cls, iterable):
+        """Builds the tree from intervals sorted by (start, end) in O(n)."""
+        intervals = list(iterable)
+        for start, end in intervals:
+            if end < start:
+                raise ValueError('Error, interval ends before it starts')
+        return super(interval_rb_tree, cls).from_sorted(intervals, _end, _max_end, None)
+
+    @classmethod
+    def from_iterable(cls, iterable):
+        """Sorts the intervals and builds the tree with from_sorted."""
+        return cls.from_sorted(sorted(iterable))
+
+    def _new_node(self, data, parent):
+        # every insert path (insert, insert_hint, insert_many, bst_insert, join) creates
+        # its node here before it changes the tree
+        start, end = data
+        if end < start:
+            raise ValueError('Error, interval ends before it starts')
+        return augmented_rb_tree._new_node(self, data, parent)
+
+    def insert(self, data):
+        """Adds the interval (start, end), see rb_tree.insert.
+
+        Raises
+        ------
+        ValueError
+            if end is smaller than start"""
+        start, end = data
+        return augmented_rb_tree.insert(self, (start, end))
+
+    def add(self, start, end):
+        """Adds the closed interval [start, end] and returns its node.
+
+        Parameters
+        ----------
+        start: int
+            first point of the interval
+        end: int
+            last point of the interval, not smaller than start
+
+        Raises
+        ------
+        ValueError
+            if end is smaller than start"""
+        return self.insert((start, end))
+
+    def remove(self, start, end):
+        """Deletes one interval [start, end].
+
+        Raises
+        ------
+        KeyError
+            if the interval is not in the tree"""
+        self.delete((start, end))
+
+    def overlapping(self, lo, hi = None):
+        """Lazily iterates, in order of their starts, over the nodes of all intervals
+        that share at least one point with [lo, hi]. Like the other iterators it raises
+        RuntimeError once the tree is modified.
+
+        Parameters
+        ----------
+        lo: int
+            first point of the query
+        hi: int
+            last point of the query, None for the single point lo"""
+        if hi is None:
+            hi = lo
+        # taken here and not inside the generator, which only starts at its first step
+        return self.__overlapping(lo, hi, self._mod_count)
+
+    def __overlapping(self, lo, hi, mod_count):
+        """Generator behind overlapping, mod_count is the modification count at the
+        time the iterator was created."""
+        if mod_count != self._mod_count:
+            raise RuntimeError('Error, tree changed during iteration')
+        sentinel = self.sentinel
+        stack = []
+        current_node = self.root if self.root is not None else sentinel
+        while stack or current_node is not sentinel:
+            # go left as long as the subtree still reaches lo
+            while current_node is not sentinel and not current_node.aggregate < lo:
+                stack.append(current_node)
+                current_node = current_node.left
+            if not stack:
+                return
+            current_node = stack.pop()
+            start, end = current_node.data
+            if hi < start:
+                # every later interval starts even later
+                return
+            if not end < lo:
+                yield current_node
+                if mod_count != self._mod_count:
+                    raise RuntimeError('Error, tree changed during iteration')
+            current_node = current_node.right
+
+    def stab(self, point):
+        """Lazily iterates over the nodes of all intervals containing point.
+
+        Parameters
+        ----------
+        point: int
+            query point"""
+        return self.overlapping(point, point)
+
+    def count_overlapping(self, lo, hi = None):
+        """Returns the number of intervals sharing at least one point with [lo, hi],
+        without collecting them.
+
+        Parameters
+        ----------
+        lo: int
+            first point of the query
+        hi: int
+            last point of the query, None for the single point lo"""
+        count = 0
+        for _ in self.overlapping(lo, hi):
+            count += 1
+        return count
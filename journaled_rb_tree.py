@@ -0,0 +1,328 @@
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+
+from rb_tree import rb_tree
+from rb_tree_io import key_kind
+
+# record header: payload length and CRC-32 of the payload
+_RECORD = struct.Struct('<II')
+_INSERT = b'i'
+_DELETE = b'd'
+
+
+class journaled_rb_tree(object):
+    """journaled_rb_tree
+    Durable rb_tree. Every insert and delete is applied to the in-memory tree and then
+    appended as a record to a write-ahead log in a directory. After a crash, opening
+    the same directory again gives the tree as of the last durable record.
+
+    Records are grouped: they are buffered and written with a single write and fsync
+    (group commit) once batch_size records are pending, and at the latest
+    fsync_interval seconds after the first of them was logged, by a background timer
+    that is armed with that record. So a crash loses at most the records of the last
+    fsync_interval seconds (all pending records if it is None), sync() forces them out
+    right away.
+
+    Every checkpoint_every records the tree is dumped (see rb_tree.dump) as a new
+    checkpoint and a fresh log is started, so recovery loads the last checkpoint in
+    O(n) and only replays the records logged after it. Checkpoints and logs carry a
+    generation number in their file name, a checkpoint only becomes visible through an
+    atomic rename once it is complete, and a torn record at the end of the log (failing
+    its length or CRC-32 check) is dropped.
+
+    The data must be dumpable (int64, float, str or bytes) and of one kind, so that
+    every checkpoint can be written; insert and insert_many raise TypeError before
+    anything is applied or logged otherwise. The tree itself is read through the tree
+    attribute.
+
+    Attributes
+    ----------
+    tree: rb_tree
+        the in-memory tree, only to be modified through this journal
+    generation: int
+        number of the current checkpoint / log pair
+
+    Methods
+    -------
+    insert(data) / delete(data):
+        Modify the tree and log the change.
+    insert_many(iterable) / delete_many(iterable):
+        Modify the tree with a batch and log it.
+    sync():
+        Write and fsync all pending records, without waiting for the flush timer.
+    checkpoint():
+        Dump the tree as a new checkpoint and start a new, empty log.
+    close():
+        Sync and close the log, also done when leaving a with block.
+    __recover():
+        Loads the newest checkpoint and replays its log.
+    """
+
+    def __init__(self, directory, batch_size = 256, fsync_interval = 0.05,
+                 checkpoint_every = 1000000):
+        """Opens (or creates) the journal in a directory and recovers its tree.
+
+        Parameters
+        ----------
+        directory: str
+            directory holding the checkpoints and logs, created if missing
+        batch_size: int
+            number of pending records that triggers a group commit
+        fsync_interval: float
+            seconds after which pending records are committed by a timer, None to only
+            commit on full batches and sync()
+        checkpoint_every: int
+            number of logged records after which a checkpoint is taken, None to only
+            checkpoint when checkpoint() is called"""
+        self.directory = directory
+        self.batch_size = batch_size
+        self.fsync_interval = fsync_interval
+        self.checkpoint_every = checkpoint_every
+        os.makedirs(directory, exist_ok = True)
+        self._pending = []
+        self._last_sync = time.monotonic()
+        self._logged = 0
+        # guards the pending records and the log against the flush timer
+        self._lock = threading.RLock()
+        self._timer = None
+        self.__recover()
+
+    def __path(self, kind, generation):
+        return os.path.join(self.directory, '{}-{:08d}.{}'.format(
+            'checkpoint' if kind == 'rbt' else 'journal', generation, kind))
+
+    def __generations(self):
+        """Helper function which returns the generations of the complete checkpoints."""
+        generations = []
+        for name in os.listdir(self.directory):
+            if name.startswith('checkpoint-') and name.endswith('.rbt'):
+                generations.append(int(name[len('checkpoint-'):-len('.rbt')]))
+        return generations
+
+    def __recover(self):
+        """Helper function which loads the newest checkpoint (an empty tree for
+        generation 0) and replays the records of its log, truncating a torn tail."""
+        generations = self.__generations()
+        self.generation = max(generations) if generations else 0
+        if generations:
+            self.tree = rb_tree.load(self.__path('rbt', self.generation))
+        else:
+            self.tree = rb_tree()
+
+        path = self.__path('log', self.generation)
+        good = 0
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                log = f.read()
+            while good + _RECORD.size <= len(log):
+                length, crc = _RECORD.unpack_from(log, good)
+                start = good + _RECORD.size
+                payload = log[start:start + length]
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+                self.__replay(payload)
+                self._logged += 1
+                good = start + length
+        self._log = open(path, 'ab')
+        if self._log.tell() != good:
+            self._log.truncate(good)
+        self.__remove_older()
+
+    def __replay(self, payload):
+        """Helper function which applies one logged record to the tree."""
+        op = payload[:1]
+        data = pickle.loads(payload[1:])
+        if len(data) == 1:
+            if op == _INSERT:
+                self.tree.insert(data[0])
+            else:
+                self.tree.delete(data[0])
+        elif op == _INSERT:
+            self.tree.insert_many(data)
+        else:
+            self.tree.delete_many(data)
+
+    def __remove_older(self):
+        """Helper function which deletes the files of older generations, they are no
+        longer needed once the current checkpoint is complete."""
+        for name in os.listdir(self.directory):
+            if name.startswith(('checkpoint-', 'journal-')):
+                stem = name.split('-', 1)[1].split('.', 1)[0]
+                if stem.isdigit() and int(stem) < self.generation:
+                    os.remove(os.path.join(self.directory, name))
+
+    def __log(self, op, items):
+        """Helper function which queues a record and commits the pending group when it
+        is full or the fsync interval has passed, otherwise makes sure the flush timer
+        is armed."""
+        payload = op + pickle.dumps(items, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._pending.append(_RECORD.pack(len(payload), zlib.crc32(payload)))
+            self._pending.append(payload)
+            self._logged += 1
+            if (len(self._pending) >= 2 * self.batch_size or self.fsync_interval is not None
+                    and time.monotonic() - self._last_sync >= self.fsync_interval):
+                self.sync()
+            elif self._timer is None and self.fsync_interval is not None:
+                self._timer = threading.Timer(self.fsync_interval, self.__flush)
+                self._timer.daemon = True
+                self._timer.start()
+            if self.checkpoint_every is not None and self._logged >= self.checkpoint_every:
+                self.checkpoint()
+
+    def __flush(self):
+        """Helper function run by the flush timer, commits the records that are still
+        pending when the fsync interval is over."""
+        with self._lock:
+            self._timer = None
+            if not self._log.closed:
+                self.sync()
+
+    def __check(self, items):
+        """Helper function which raises TypeError unless the data to insert can be
+        dumped in one checkpoint with the data of the tree (see rb_tree_io.key_kind)."""
+        if not items:
+            return
+        kind = key_kind(items)
+        if self.tree.root is not None and key_kind((self.tree.leftmost.data,)) != kind:
+            raise TypeError('Error, data of different kinds cannot be checkpointed together')
+
+    def insert(self, data):
+        """Inserts data into the tree and logs it, returns the new node.
+
+        Parameters
+        ----------
+        data: int
+            data of the node to insert
+
+        Raises
+        ------
+        TypeError
+            if data cannot be dumped together with the data of the tree"""
+        self.__check((data,))
+        node = self.tree.insert(data)
+        self.__log(_INSERT, (data,))
+        return node
+
+    def delete(self, data):
+        """Deletes the first occurrence of data from the tree and logs it.
+
+        Parameters
+        ----------
+        data: int
+            data value of the node to delete
+
+        Raises
+        ------
+        KeyError
+            If data is not in the tree, nothing is logged then"""
+        self.tree.delete(data)
+        self.__log(_DELETE, (data,))
+
+    def insert_many(self, iterable):
+        """Inserts a batch of data and logs it as a single record.
+
+        Parameters
+        ----------
+        iterable: iterable of int
+            data of the nodes to insert
+
+        Raises
+        ------
+        TypeError
+            if the data cannot be dumped together with the data of the tree"""
+        items = list(iterable)
+        self.__check(items)
+        self.tree.insert_many(items)
+        self.__log(_INSERT, items)
+
+    def delete_many(self, iterable):
+        """Deletes a batch of data and logs it as a single record.
+
+        Parameters
+        ----------
+        iterable: iterable of int
+            data values of the nodes to delete
+
+        Raises
+        ------
+        KeyError
+            If a value is not in the tree, the tree is then unchanged and nothing is
+            logged"""
+        items = list(iterable)
+        self.tree.delete_many(items)
+        self.__log(_DELETE, items)
+
+    def sync(self):
+        """Writes all pending records with one write and makes them durable with one
+        fsync. Modifications return before their records are durable, call this where
+        they have to be (the flush timer does it fsync_interval seconds later)."""
+        with self._lock:
+            if self._pending:
+                self._log.write(b''.join(self._pending))
+                self._pending = []
+                self._log.flush()
+                os.fsync(self._log.fileno())
+            self._last_sync = time.monotonic()
+
+    def checkpoint(self):
+        """Dumps the tree as the checkpoint of the next generation and switches to its
+        empty log. The checkpoint is written to a temporary file and renamed once it is
+        durable, so a crash at any point leaves a complete checkpoint with its log."""
+        with self._lock:
+            self.__checkpoint()
+
+    def __checkpoint(self):
+        """Helper function which takes the checkpoint, with the lock held."""
+        self.sync()
+        generation = self.generation + 1
+        path = self.__path('rbt', generation)
+        temporary = path + '.tmp'
+        self.tree.dump(temporary, shape = True)
+        with open(temporary, 'rb') as f:
+            os.fsync(f.fileno())
+        self._log.close()
+        # 'wb' drops a stale log left by a crash during an earlier attempt
+        self._log = open(self.__path('log', generation), 'wb')
+        os.replace(temporary, path)
+        self.__sync_directory()
+        self.generation = generation
+        self._logged = 0
+        self.__remove_older()
+
+    def __sync_directory(self):
+        """Helper function which makes the renames in the directory durable (where the
+        platform allows opening a directory)."""
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def close(self):
+        """Syncs the pending records, stops the flush timer and closes the log."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._log.closed:
+                self.sync()
+                self._log.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.tree)
@@ -0,0 +1,504 @@
+import itertools
+
+# every tree (and every snapshot taken of it) gets a fresh generation, nodes of an older
+# generation may be shared with snapshots and are copied before they are changed
+_generations = itertools.count(1)
+
+
+class persistent_node(object):
+    """persistent_node
+    Node of a persistent_rb_tree. There are no parent pointers, so a node can be shared
+    by any number of versions of a tree; empty children are None.
+    """
+    __slots__ = ('data', 'left', 'right', 'color', 'size', 'gen')
+
+    def __init__(self, data, left = None, right = None, color = 'red', size = 1, gen = 0):
+        self.data = data
+        self.left = left
+        self.right = right
+        self.color = color
+        self.size = size
+        # generation of the tree that owns (and may modify) this node
+        self.gen = gen
+
+    def copy(self, gen):
+        """Returns a copy of the node owned by the given generation."""
+        return persistent_node(self.data, self.left, self.right, self.color, self.size, gen)
+
+
+def _size(node):
+    return node.size if node is not None else 0
+
+
+def _is_red(node):
+    return node is not None and node.color == "red"
+
+
+class _persistent_reader(object):
+    """Read-only operations shared by persistent_rb_tree and rb_snapshot. Both only
+    need a root attribute."""
+    __slots__ = ()
+
+    def __len__(self):
+        """Returns the number of nodes."""
+        return _size(self.root)
+
+    def __iter__(self):
+        """Iterates over nodes with inorder traversal."""
+        return self.irange()
+
+    def __reversed__(self):
+        """Iterates over nodes with reverse inorder traversal."""
+        return self.irange(reverse = True)
+
+    def inorder(self):
+        """Iterate over nodes with inorder traversal."""
+        return self.irange()
+
+    def find_node(self, data):
+        """Returns the node object for the given data
+
+        Parameters
+        ----------
+        data: int
+            data value of the node to be found
+
+        Raises
+        ------
+        KeyError
+            If node is not in tree or if tree is empty"""
+        current_node = self.root
+        if current_node is None:
+            raise KeyError('Error, tree has no root')
+        while current_node is not None:
+            if current_node.data == data:
+                return current_node
+            current_node = current_node.left if data < current_node.data else current_node.right
+        raise KeyError('Error, data not found')
+
+    def find_successor(self, data):
+        """Returns the first node with data greater than the given data, None if there is
+        none.
+
+        Parameters
+        ----------
+        data: int
+            data value of the node to find the successor of
+
+        Raises
+        ------
+        KeyError
+            If data is not in tree or if tree is empty"""
+        self.find_node(data)
+        return next(self.irange(data, inclusive = (False, True)), None)
+
+    def rank(self, data):
+        """Returns the number of nodes whose data is smaller than the given data.
+
+        Parameters
+        ----------
+        data: int
+            data value to rank"""
+        count = 0
+        current_node = self.root
+        while current_node is not None:
+            if current_node.data < data:
+                count += _size(current_node.left) + 1
+                current_node = current_node.right
+            else:
+                current_node = current_node.left
+        return count
+
+    def select(self, k):
+        """Returns the node holding the k-th smallest data (counting from 0).
+
+        Parameters
+        ----------
+        k: int
+            position of the node in an inorder traversal, negative values count from the end
+
+        Raises
+        ------
+        IndexError
+            if k is out of range"""
+        n = len(self)
+        if k < 0:
+            k += n
+        if not 0 <= k < n:
+            raise IndexError('Error, select index out of range')
+        current_node = self.root
+        while True:
+            left_size = _size(current_node.left)
+            if k < left_size:
+                current_node = current_node.left
+            elif k == left_size:
+                return current_node
+            else:
+                k -= left_size + 1
+                current_node = current_node.right
+
+    def irange(self, lo = None, hi = None, inclusive = (True, True), reverse = False):
+        """Lazily iterates over the nodes whose data lies between lo and hi, in
+        O(log n + k). Iterating a snapshot is not affected by later modifications of the
+        tree; iterate snapshot() rather than the tree itself while it is being modified.
+
+        Parameters
+        ----------
+        lo: int
+            lower bound of the range, None for no lower bound
+        hi: int
+            upper bound of the range, None for no upper bound
+        inclusive: (bool, bool)
+            whether lo and hi themselves are part of the range
+        reverse: bool
+            yield the nodes in descending instead of ascending order"""
+        return self.__irange(self.root, lo, hi, inclusive, reverse)
+
+    @staticmethod
+    def __irange(root, lo, hi, inclusive, reverse):
+        """Helper generator for irange, an inorder walk with an explicit stack of the
+        ancestors still to visit."""
+        lo_inclusive, hi_inclusive = inclusive
+
+        def above_lo(data):
+            return lo is None or lo < data or (lo_inclusive and lo == data)
+
+        def below_hi(data):
+            return hi is None or data < hi or (hi_inclusive and data == hi)
+
+        # seek: keep the nodes at which the walk has to come back on the stack
+        stack = []
+        current_node = root
+        while current_node is not None:
+            if reverse:
+                if below_hi(current_node.data):
+                    stack.append(current_node)
+                    current_node = current_node.right
+                else:
+                    current_node = current_node.left
+            else:
+                if above_lo(current_node.data):
+                    stack.append(current_node)
+                    current_node = current_node.left
+                else:
+                    current_node = current_node.right
+
+        while stack:
+            current_node = stack.pop()
+            if reverse:
+                if not above_lo(current_node.data):
+                    return
+                yield current_node
+                child = current_node.left
+                while child is not None:
+                    stack.append(child)
+                    child = child.right
+            else:
+                if not below_hi(current_node.data):
+                    return
+                yield current_node
+                child = current_node.right
+                while child is not None:
+                    stack.append(child)
+                    child = child.left
+
+
+class rb_snapshot(_persistent_reader):
+    """rb_snapshot
+    Immutable view of a persistent_rb_tree at the time snapshot() was called. It shares
+    all nodes with the tree (and with other snapshots) and stays valid and iterable no
+    matter how the tree is modified afterwards. Nodes only reachable from dropped
+    snapshots are reclaimed by reference counting.
+
+    Attributes
+    ----------
+    root: persistent_node
+        root of the snapshot, None if it is empty
+    """
+    __slots__ = ('root',)
+
+    def __init__(self, root):
+        self.root = root
+
+
+class persistent_rb_tree(_persistent_reader):
+    """persistent_rb_tree
+    Red Black Tree whose modifications copy the O(log n) nodes on the search path (and
+    the few siblings the fixups touch) instead of changing nodes in place, as long as
+    those nodes may be shared with a snapshot. snapshot() returns an immutable
+    rb_snapshot in O(1), so readers can iterate a snapshot while a writer keeps calling
+    insert and delete on the tree.
+
+    Nodes belong to a generation. A snapshot freezes all current nodes by moving the
+    tree to a new generation, and a modification only copies nodes of an older
+    generation, so without snapshots in between nothing is copied at all.
+
+    Attributes
+    ----------
+    root: persistent_node
+        root of the current version of the tree, None if it is empty
+
+    Methods
+    -------
+    snapshot():
+        Returns an immutable view of the current version in O(1).
+    insert(data):
+        Adds node with given data to the tree and fixes up the rb properties.
+    delete(data):
+        Deletes one node with given data and fixes up the rb properties.
+    __len__() / __iter__() / __reversed__() / inorder() / irange(lo, hi, inclusive, reverse):
+        Size and iteration, see rb_tree.
+    find_node(data) / find_successor(data) / rank(data) / select(k):
+        Searches and order statistics, see rb_tree.
+    __own(node) / __own_left(parent) / __own_right(parent):
+        Helper functions which copy a node of an older generation before it is changed.
+    __rotate_left(x) / __rotate_right(x):
+        Helper functions which rotate an owned subtree and return its new root.
+    """
+
+    def __init__(self):
+        self.root = None
+        self._gen = next(_generations)
+
+    def snapshot(self):
+        """Returns an immutable view of the current version of the tree in O(1)."""
+        # the current nodes now belong to the snapshot as well, so they must be copied
+        # before the next change
+        self._gen = next(_generations)
+        return rb_snapshot(self.root)
+
+    def __own(self, node):
+        """Helper function which returns node itself if this tree owns it, else a copy of
+        it owned by this tree. The caller has to link the copy in place of node."""
+        if node is None or node.gen == self._gen:
+            return node
+        return node.copy(self._gen)
+
+    def __own_left(self, parent):
+        """Helper function which makes the left child of the (owned) parent owned."""
+        child = self.__own(parent.left)
+        parent.left = child
+        return child
+
+    def __own_right(self, parent):
+        """Helper function which makes the right child of the (owned) parent owned."""
+        child = self.__own(parent.right)
+        parent.right = child
+        return child
+
+    def __relink(self, stack, old, new):
+        """Helper function which replaces the child old of the last node on the stack (or
+        the root if the stack is empty) by new."""
+        if not stack:
+            self.root = new
+        elif stack[-1].left is old:
+            stack[-1].left = new
+        else:
+            stack[-1].right = new
+
+    @staticmethod
+    def __rotate_left(x):
+        """Helper function which rotates the owned node x with its owned right child to the
+        left and returns the new root of the subtree."""
+        y = x.right
+        x.right = y.left
+        y.left = x
+        y.size = x.size
+        x.size = _size(x.left) + _size(x.right) + 1
+        return y
+
+    @staticmethod
+    def __rotate_right(x):
+        """Helper function which rotates the owned node x with its owned left child to the
+        right and returns the new root of the subtree."""
+        y = x.left
+        x.left = y.right
+        y.right = x
+        y.size = x.size
+        x.size = _size(x.left) + _size(x.right) + 1
+        return y
+
+    def insert(self, data):
+        """Adds node with given data to the tree and fixes up the rb properties, copying
+        the shared nodes on the way.
+
+        Parameters
+        ----------
+        data: int
+            data of the node to insert"""
+        new_node = persistent_node(data, gen = self._gen)
+        if self.root is None:
+            new_node.color = "black"
+            self.root = new_node
+            return
+
+        # 1. descend like __put, making every node on the path owned; the stack holds the
+        # ancestors of the new node since there are no parent pointers
+        self.root = self.__own(self.root)
+        current_node = self.root
+        stack = []
+        while current_node is not None:
+            current_node.size += 1
+            stack.append(current_node)
+            if data < current_node.data:
+                current_node = self.__own_left(current_node)
+            else:
+                current_node = self.__own_right(current_node)
+        parent = stack[-1]
+        if data < parent.data:
+            parent.left = new_node
+        else:
+            parent.right = new_node
+
+        # 2. same cases as rb_tree._rb_insert_fixup, with the stack in place of parents
+        z = new_node
+        while len(stack) >= 2 and stack[-1].color == "red":
+            p = stack.pop()
+            g = stack.pop()
+            if p is g.left:
+                y = g.right
+                if _is_red(y):
+                    y = self.__own_right(g)
+                    p.color = y.color = "black"
+                    g.color = "red"
+                    z = g
+                    continue
+                if z is p.right:
+                    g.left = self.__rotate_left(p)
+                    p = z
+                p.color = "black"
+                g.color = "red"
+                self.__relink(stack, g, self.__rotate_right(g))
+            else:
+                y = g.left
+                if _is_red(y):
+                    y = self.__own_left(g)
+                    p.color = y.color = "black"
+                    g.color = "red"
+                    z = g
+                    continue
+                if z is p.left:
+                    g.right = self.__rotate_right(p)
+                    p = z
+                p.color = "black"
+                g.color = "red"
+                self.__relink(stack, g, self.__rotate_left(g))
+            break
+        self.root.color = "black"
+
+    def delete(self, data):
+        """Deletes one node with the given data and fixes up the rb properties, copying the
+        shared nodes on the way.
+
+        Parameters
+        ----------
+        data: int
+            data of the node to delete
+
+        Raises
+        ------
+        KeyError
+            if data isn't in tree or if tree is empty"""
+        # 1. search first, so that a miss does not copy anything
+        self.find_node(data)
+
+        # 2. descend to the node, making the path owned
+        self.root = self.__own(self.root)
+        stack = []
+        node = self.root
+        while node.data != data:
+            stack.append(node)
+            node = self.__own_left(node) if data < node.data else self.__own_right(node)
+
+        # 3. a node with two children takes over the data of its successor, which is
+        # removed instead (no handles exist here, so copying data is fine)
+        if node.left is not None and node.right is not None:
+            stack.append(node)
+            successor = self.__own_right(node)
+            while successor.left is not None:
+                stack.append(successor)
+                successor = self.__own_left(successor)
+            node.data = successor.data
+            node = successor
+
+        # 4. splice node out: its only child (or None) takes its place
+        for ancestor in stack:
+            ancestor.size -= 1
+        x = node.left if node.left is not None else node.right
+        if not stack:
+            self.root = x
+            if x is not None:
+                x = self.__own(x)
+                self.root = x
+                x.color = "black"
+            return
+        parent = stack[-1]
+        is_left = parent.left is node
+        if is_left:
+            parent.left = x
+        else:
+            parent.right = x
+        if node.color == "red":
+            return
+        if _is_red(x):
+            x = self.__own_left(parent) if is_left else self.__own_right(parent)
+            x.color = "black"
+            return
+
+        # 5. x is doubly black, same cases as rb_tree._rb_delete_fixup with the stack in
+        # place of parents and is_left telling on which side of its parent x hangs
+        while stack:
+            parent = stack.pop()
+            if is_left:
+                w = self.__own_right(parent)
+                if w.color == "red":
+                    w.color = "black"
+                    parent.color = "red"
+                    self.__relink(stack, parent, self.__rotate_left(parent))
+                    stack.append(w)
+                    w = self.__own_right(parent)
+                if not _is_red(w.left) and not _is_red(w.right):
+                    w.color = "red"
+                    if parent.color == "red":
+                        parent.color = "black"
+                        return
+                    x = parent
+                    is_left = bool(stack) and stack[-1].left is x
+                    continue
+                if not _is_red(w.right):
+                    self.__own_left(w).color = "black"
+                    w.color = "red"
+                    w = self.__rotate_right(w)
+                    parent.right = w
+                w.color = parent.color
+                parent.color = "black"
+                self.__own_right(w).color = "black"
+                self.__relink(stack, parent, self.__rotate_left(parent))
+                return
+            else:
+                w = self.__own_left(parent)
+                if w.color == "red":
+                    w.color = "black"
+                    parent.color = "red"
+                    self.__relink(stack, parent, self.__rotate_right(parent))
+                    stack.append(w)
+                    w = self.__own_left(parent)
+                if not _is_red(w.left) and not _is_red(w.right):
+                    w.color = "red"
+                    if parent.color == "red":
+                        parent.color = "black"
+                        return
+                    x = parent
+                    is_left = bool(stack) and stack[-1].left is x
+                    continue
+                if not _is_red(w.left):
+                    self.__own_right(w).color = "black"
+                    w.color = "red"
+                    w = self.__rotate_left(w)
+                    parent.left = w
+                w.color = parent.color
+                parent.color = "black"
+                self.__own_left(w).color = "black"
+                self.__relink(stack, parent, self.__rotate_right(parent))
+                return
+        # the extra black reached the root, where it is simply dropped
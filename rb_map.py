@@ -0,0 +1,220 @@
+from rb_tree import Node, rb_tree
+
+# default of pop, which raises KeyError when it is not given
+_MISSING = object()
+
+
+class item_node(Node):
+    """Node of an rb_map: data holds the (cached) sort key, key the key as given by the
+    user and value the value mapped to it."""
+    __slots__ = ('key', 'value')
+
+    def __init__(self, data, left = None, right = None, parent = None, color = 'red', size = 1):
+        Node.__init__(self, data, left, right, parent, color, size)
+        self.key = data
+        self.value = None
+
+
+class item_rb_tree(rb_tree):
+    """rb_tree whose nodes are item_nodes, the entries of an rb_map."""
+    node_class = item_node
+
+
+class rb_map(object):
+    """rb_map
+    Sorted mapping backed by an rb_tree with one item_node per key, which holds the key
+    and its value side by side instead of a (key, value) tuple as data. The tree is
+    ordered by key(k) if a key function is given, which is computed once when the key is
+    inserted and cached in the node, so comparisons never call it again. Keys with equal
+    sort keys are the same entry.
+
+    Assigning to a key that is already present overwrites its value in place, without
+    touching the structure of the tree.
+
+    Attributes
+    ----------
+    tree: item_rb_tree
+        tree of the entries, ordered by their sort keys
+    key: callable
+        function deriving the sort key from a key, None to sort by the keys themselves
+
+    Methods
+    -------
+    __getitem__(k) / __setitem__(k, value) / __delitem__(k):
+        Look up, assign and remove entries in O(log n).
+    get(k, default) / pop(k, default) / setdefault(k, default):
+        Like the ones of dict.
+    __contains__(k) / __len__():
+        Membership and number of entries.
+    __iter__() / __reversed__() / keys() / values() / items():
+        Iterate over the entries in ascending (__reversed__: descending) order.
+    irange(lo, hi, inclusive, reverse) / irange_items(lo, hi, inclusive, reverse):
+        Lazily iterate over the keys / (key, value) pairs between lo and hi.
+    peekitem(index):
+        Returns the (key, value) pair at the given position in sorted order.
+    index(k):
+        Returns the number of keys smaller than k.
+    """
+
+    def __init__(self, items = (), key = None):
+        """Builds a map from a mapping or an iterable of (key, value) pairs.
+
+        Parameters
+        ----------
+        items: mapping or iterable of (key, value)
+            initial entries, later pairs overwrite earlier ones with the same key
+        key: callable
+            function deriving the sort key of each key, None to sort by the keys"""
+        self.tree = item_rb_tree()
+        self.key = key
+        if hasattr(items, 'items'):
+            items = items.items()
+        for k, value in items:
+            self[k] = value
+
+    def __sort_key(self, k):
+        return k if self.key is None else self.key(k)
+
+    def __find(self, k):
+        """Helper function which returns the node of key k, None if there is none."""
+        return self.__find_sorted(self.__sort_key(k))
+
+    def __find_sorted(self, sort_key):
+        """Helper function which returns the node with the given sort key, None if there
+        is none."""
+        try:
+            return self.tree.find_node(sort_key)
+        except KeyError:
+            return None
+
+    def __add(self, k, sort_key, value):
+        """Helper function which inserts key k, whose sort key is already computed."""
+        node = self.tree.insert(sort_key)
+        node.key = k
+        node.value = value
+        return node
+
+    def __getitem__(self, k):
+        node = self.__find(k)
+        if node is None:
+            raise KeyError('Error, key not found')
+        return node.value
+
+    def __setitem__(self, k, value):
+        # the key function runs once, for the lookup and the insert
+        sort_key = self.__sort_key(k)
+        node = self.__find_sorted(sort_key)
+        if node is None:
+            self.__add(k, sort_key, value)
+        else:
+            # an existing key keeps its node, only the value changes
+            node.value = value
+
+    def __delitem__(self, k):
+        node = self.__find(k)
+        if node is None:
+            raise KeyError('Error, key not found')
+        self.tree.delete_node(node)
+
+    def get(self, k, default = None):
+        """Returns the value of key k, default if there is none."""
+        node = self.__find(k)
+        return node.value if node is not None else default
+
+    def pop(self, k, default = _MISSING):
+        """Removes key k and returns its value, or default if there is no key k.
+
+        Raises
+        ------
+        KeyError
+            if there is no key k and no default is given"""
+        node = self.__find(k)
+        if node is None:
+            if default is _MISSING:
+                raise KeyError('Error, key not found')
+            return default
+        self.tree.delete_node(node)
+        return node.value
+
+    def setdefault(self, k, default = None):
+        """Returns the value of key k, first inserting it with value default if there is
+        no key k."""
+        sort_key = self.__sort_key(k)
+        node = self.__find_sorted(sort_key)
+        if node is None:
+            node = self.__add(k, sort_key, default)
+        return node.value
+
+    def __contains__(self, k):
+        return self.__find(k) is not None
+
+    def __len__(self):
+        return len(self.tree)
+
+    def __iter__(self):
+        return (node.key for node in self.tree)
+
+    def __reversed__(self):
+        return (node.key for node in reversed(self.tree))
+
+    def keys(self):
+        """Iterate over the keys in ascending order."""
+        return iter(self)
+
+    def values(self):
+        """Iterate over the values in ascending order of their keys."""
+        return (node.value for node in self.tree)
+
+    def items(self):
+        """Iterate over the (key, value) pairs in ascending order."""
+        return ((node.key, node.value) for node in self.tree)
+
+    def __range(self, lo, hi, inclusive, reverse):
+        return self.tree.irange(None if lo is None else self.__sort_key(lo),
+                                None if hi is None else self.__sort_key(hi),
+                                inclusive, reverse)
+
+    def irange(self, lo = None, hi = None, inclusive = (True, True), reverse = False):
+        """Lazily iterates over the keys between lo and hi, in O(log n + k).
+
+        Parameters
+        ----------
+        lo: key
+            lower bound of the range, None for no lower bound
+        hi: key
+            upper bound of the range, None for no upper bound
+        inclusive: (bool, bool)
+            whether lo and hi themselves are part of the range
+        reverse: bool
+            yield the keys in descending instead of ascending order"""
+        return (node.key for node in self.__range(lo, hi, inclusive, reverse))
+
+    def irange_items(self, lo = None, hi = None, inclusive = (True, True), reverse = False):
+        """Lazily iterates over the (key, value) pairs with keys between lo and hi, see
+        irange."""
+        return ((node.key, node.value) for node in self.__range(lo, hi, inclusive, reverse))
+
+    def peekitem(self, index = -1):
+        """Returns the (key, value) pair at the given position in ascending order, the
+        largest one by default.
+
+        Parameters
+        ----------
+        index: int
+            position, negative counts from the end
+
+        Raises
+        ------
+        IndexError
+            if index is out of range"""
+        node = self.tree.select(index)
+        return node.key, node.value
+
+    def index(self, k):
+        """Returns the number of keys smaller than k.
+
+        Parameters
+        ----------
+        k: key
+            key to rank, it does not have to be in the map"""
+        return self.tree.rank(self.__sort_key(k))
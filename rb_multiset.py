@@ -0,0 +1,215 @@
+from rb_tree import Node, rb_tree
+
+
+class counted_node(Node):
+    """Node of an rb_multiset, which also stores how often its data was added."""
+    __slots__ = ('count',)
+
+    def __init__(self, data, left = None, right = None, parent = None, color = 'red', size = 1):
+        Node.__init__(self, data, left, right, parent, color, size)
+        self.count = 1
+
+
+class counted_rb_tree(rb_tree):
+    """rb_tree whose nodes are counted_nodes, the distinct keys of an rb_multiset."""
+    node_class = counted_node
+
+
+class rb_multiset(object):
+    """rb_multiset
+    Sorted multiset backed by an rb_tree with one counted_node per distinct key, which
+    counts how often the key was added. Adding a key that is already present only
+    increments its count, so the tree's size and height depend on the number of
+    distinct keys and not on the number of copies.
+
+    Attributes
+    ----------
+    tree: counted_rb_tree
+        tree of the distinct keys, the subtree sizes and order statistics of the tree
+        count distinct keys
+
+    Methods
+    -------
+    add(data, n):
+        Adds n copies of data, O(log d) for d distinct keys.
+    discard(data, n):
+        Removes up to n copies of data (nothing if there are none), O(log d).
+    remove(data, n):
+        Like discard, but raises KeyError if there are less than n copies.
+    count(data):
+        Returns the number of copies of data, O(log d).
+    __len__() / distinct():
+        Number of copies in total / number of distinct keys, O(1).
+    __contains__(data):
+        Whether data has at least one copy.
+    __iter__() / __reversed__():
+        Iterate over the keys in ascending (descending) order, each as often as it
+        was added.
+    items():
+        Iterate over (key, count) pairs in ascending order.
+    irange(lo, hi, inclusive, reverse):
+        Like __iter__, restricted to the keys between lo and hi.
+    """
+
+    def __init__(self, iterable = ()):
+        """Builds a multiset from any data. The data is sorted and grouped, and the
+        distinct keys are built into a tree in O(n log n) (see rb_tree.from_sorted).
+
+        Parameters
+        ----------
+        iterable: iterable of int
+            data to add, repeated data is counted"""
+        items = sorted(iterable)
+        keys = []
+        counts = []
+        for data in items:
+            if keys and keys[-1] == data:
+                counts[-1] += 1
+            else:
+                keys.append(data)
+                counts.append(1)
+        self.tree = counted_rb_tree.from_sorted(keys)
+        for node, count in zip(self.tree, counts):
+            node.count = count
+        self._len = len(items)
+
+    def __find(self, data):
+        """Helper function which returns the node of data, None if it was never added."""
+        try:
+            return self.tree.find_node(data)
+        except KeyError:
+            return None
+
+    def add(self, data, n = 1):
+        """Adds n copies of data.
+
+        Parameters
+        ----------
+        data: int
+            key to add
+        n: int
+            number of copies, at least 1
+
+        Returns
+        -------
+        counted_node
+            the node of data"""
+        if n < 1:
+            raise ValueError('Error, number of copies must be positive')
+        node = self.__find(data)
+        if node is None:
+            node = self.tree.insert(data)
+            node.count = n
+        else:
+            node.count += n
+        self._len += n
+        return node
+
+    def discard(self, data, n = 1):
+        """Removes up to n copies of data, the key disappears from the tree with its
+        last copy. Does nothing if data was never added.
+
+        Parameters
+        ----------
+        data: int
+            key to remove
+        n: int
+            number of copies to remove at most, at least 1
+
+        Returns
+        -------
+        int
+            number of copies removed
+
+        Raises
+        ------
+        ValueError
+            if n is smaller than 1"""
+        if n < 1:
+            raise ValueError('Error, number of copies must be positive')
+        node = self.__find(data)
+        if node is None:
+            return 0
+        if node.count > n:
+            node.count -= n
+            self._len -= n
+            return n
+        removed = node.count
+        self.tree.delete_node(node)
+        self._len -= removed
+        return removed
+
+    def remove(self, data, n = 1):
+        """Removes n copies of data.
+
+        Parameters
+        ----------
+        data: int
+            key to remove
+        n: int
+            number of copies to remove, at least 1
+
+        Raises
+        ------
+        KeyError
+            if data has less than n copies, nothing is removed then
+        ValueError
+            if n is smaller than 1"""
+        if n < 1:
+            raise ValueError('Error, number of copies must be positive')
+        if self.count(data) < n:
+            raise KeyError('Error, data not found')
+        self.discard(data, n)
+
+    def count(self, data):
+        """Returns the number of copies of data, 0 if it was never added.
+
+        Parameters
+        ----------
+        data: int
+            key to count"""
+        node = self.__find(data)
+        return node.count if node is not None else 0
+
+    def __len__(self):
+        return self._len
+
+    def distinct(self):
+        """Returns the number of distinct keys."""
+        return len(self.tree)
+
+    def __contains__(self, data):
+        return self.__find(data) is not None
+
+    def __iter__(self):
+        return self.__repeat(iter(self.tree))
+
+    def __reversed__(self):
+        return self.__repeat(reversed(self.tree))
+
+    def items(self):
+        """Iterate over (key, count) pairs in ascending order."""
+        for node in self.tree:
+            yield node.data, node.count
+
+    def irange(self, lo = None, hi = None, inclusive = (True, True), reverse = False):
+        """Lazily iterate over the keys between lo and hi, each as often as it was added.
+
+        Parameters
+        ----------
+        lo: int
+            lower bound of the range, None for no lower bound
+        hi: int
+            upper bound of the range, None for no upper bound
+        inclusive: (bool, bool)
+            whether lo and hi themselves are part of the range
+        reverse: bool
+            yield the keys in descending instead of ascending order"""
+        return self.__repeat(self.tree.irange(lo, hi, inclusive, reverse))
+
+    def __repeat(self, nodes):
+        """Helper generator which yields the data of each node count times."""
+        for node in nodes:
+            data = node.data
+            for _ in range(node.count):
+                yield data
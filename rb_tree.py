@@ -1,10 +1,33 @@
+import gc
+from operator import attrgetter
+
+try:
+    import numpy
+except ImportError:  # numpy is optional, only used by the batch lookups
+    numpy = None
+
+
 class Node(object):
-    def __init__(self, data, left = None, right = None, parent = None, color = 'red'):
+    # slots instead of a per-node __dict__ cut the memory of a node by more than half;
+    # color stays an interned 'red'/'black' string, which costs one pointer like an int would
+    __slots__ = ('data', 'left', 'right', 'parent', 'color', 'size')
+
+    def __init__(self, data, left = None, right = None, parent = None, color = 'red', size = 1):
         self.data = data
         self.left = left
         self.right = right
         self.parent = parent
         self.color = color
+        # number of nodes in the subtree rooted here (the sentinel has size 0)
+        self.size = size
+
+
+# all trees share one sentinel, so that subtrees can move between trees (join, split)
+# without relinking their leaves; it is never modified once created
+SENTINEL = Node(None, color = 'black', size = 0)
+SENTINEL.parent = SENTINEL
+SENTINEL.left = SENTINEL
+SENTINEL.right = SENTINEL
 
 
 class rb_tree(object):
@@ -25,10 +48,43 @@ class rb_tree(object):
         A Node type which will be the root of the RB tree
     sentinel: Node
         A Node type with no data value and color is black. Will be the child
-        of any node without children and the parent of the root.
+        of any node without children and the parent of the root. It is shared by
+        all trees and never modified.
+    rightmost: Node
+        The node with the largest data, None if the tree is empty. Inserting data that is
+        not smaller than it appends directly below it instead of descending from the root.
+    leftmost: Node
+        The node with the smallest data, None if the tree is empty. Together with
+        rightmost it makes peek_min / peek_max O(1) and pop_min / pop_max search free.
+    node_class: type
+        Class of the nodes the tree creates, Node unless a subclass stores more per node.
+
+    The iterators raise RuntimeError on their next step once the tree has been modified
+    since they were created, like the iterators of dict.
+
+    Every Node also keeps the size of the subtree rooted at it, which makes rank, select
+    and count_range O(log n). Insertion, deletion and the rotations keep the sizes correct.
 
     Methods
     -------
+    from_sorted(iterable):
+        Class method which builds a balanced tree from sorted data in O(n).
+    from_iterable(iterable):
+        Class method which sorts the data and then builds the tree with from_sorted.
+    __build(items, lo, hi, depth, red_depth, parent):
+        Helper function which recursively builds a balanced subtree from sorted items.
+    freeze():
+        Returns an immutable, array backed frozen_rb_tree with the same data.
+    enable_stats(hook):
+        Instruments the tree with counters and timing hooks, returns its tree_stats.
+    disable_stats():
+        Removes the instrumentation again, returns the final tree_stats.
+    dump(path, shape):
+        Writes the data (and optionally colors and shape) to a compact binary file.
+    load(path, *args, **kwargs):
+        Class method which rebuilds a dumped tree in O(n), without rebalancing.
+    load_mmap(path):
+        Static method which maps a dumped file as a read-only frozen_rb_tree.
     print_tree():
         Prints the data of all nodes in order.
     __print_tree(curr_node):
@@ -41,41 +97,114 @@ class rb_tree(object):
         Prints the data of all nodes but with color indicators
     __iter__():
         Iterate over nodes with inorder traversal.
+    __reversed__():
+        Iterate over nodes with reverse inorder traversal.
     inorder():
         Iterate over nodes with inorder traversal.
     preorder():
         Iterate over nodes with preorder traversal.
     postorder():
         Iterate over nodes with postorder traversal.
-    __traverse(curr_node, traversal_type):
-        Helper method for the three traversal iterators.
-    find_min():
-        Returns node with the min value of a subtree, if tree is empty returns sentinel
+    irange(lo, hi, inclusive, reverse):
+        Lazily iterate over the nodes with data between lo and hi in O(log n + k).
+    __lower_node(lo, inclusive) / __upper_node(hi, inclusive):
+        Helper functions which seek the first node >= lo / the last node <= hi.
+    __scan(curr_node, stop, stop_inclusive, reverse, mod_count):
+        Helper generator which follows successors (or predecessors) until a bound.
+    __successor(curr_node) / __predecessor(curr_node):
+        Helper functions which step to the next / previous node via parent pointers.
+    __preorder(curr_node, mod_count) / __postorder(curr_node, mod_count):
+        Helper generators for preorder and postorder traversal using an explicit stack.
+    find_min() / find_max():
+        Returns node with the min / max value of the tree, if tree is empty returns sentinel
+    peek_min() / peek_max():
+        Returns the node with the min / max value in O(1).
+    pop_min() / pop_max():
+        Deletes the node with the min / max value without searching, returns its data.
     find_node(data):
         Returns the Node object for the given data, returns error if data isn't found or
         if tree is empty.
     __get(data, current_node):
         Helper function which returns the node with the given data starting with 
-        the given node, returns None if current_node does not exist.
+        the given node, returns None if there is no such node.
     find_successor(data):
-        Private method which returns the successor of the given data, else reutrns None
+        Returns the successor of the node with the given data, else returns None
+    successor(node) / predecessor(node):
+        Returns the next / previous node of the given node without searching, else None
+    floor(data) / ceiling(data):
+        Returns the last node <= data / the first node >= data, else None.
+    lower_bound(data) / upper_bound(data):
+        Returns the first node >= data / the first node > data, else None.
+    find_predecessor(data):
+        Returns the last node < data (data need not be in the tree), else None.
+    nearest(data, k):
+        Returns the k nodes closest to data, in O(log n + k).
+    __len__():
+        Returns the number of nodes in the tree.
+    black_height():
+        Returns the number of black nodes on any path from the root to a leaf.
+    rank(data):
+        Returns the number of nodes whose data is smaller than data, in O(log n).
+    select(k):
+        Returns the node with the k-th smallest data (0-indexed), in O(log n).
+    count_range(lo, hi):
+        Returns the number of nodes with lo <= data <= hi, in O(log n).
+    __count_below(data, inclusive):
+        Helper function which counts the nodes below (or up to) data in one descent.
     insert(data):
-        Adds node with given data to the tree and fixes up the coloring of the nodes.
+        Adds node with given data to the tree, fixes up the coloring of the nodes and
+        returns the new node.
+    insert_hint(data, hint):
+        Adds node with given data next to the hint node without a descent if it fits there.
+    __attach_between(data, before, after) / __attach(data, parent, is_left):
+        Helper functions which link a new node into a known free child position.
+    _new_node(data, parent) / _after_link(node) / _after_rebuild(nodes):
+        Hooks creating every new node and called once it is linked, for subclasses.
     bst_insert(data):
-        Insertion of BST.
-    __put(data, current_node):
+        Insertion of BST, returns the new node.
+    __put(data):
         Helper function that finds the approporiate place to add a node in the tree.
     delete(data):
         Find and delete node with given data, then fixes up the coloring of the nodes.
+    delete_node(node):
+        Deletes the given node without searching for it, then fixes up the coloring.
+    __transplant(u, v):
+        Replaces the subtree rooted at u with the subtree rooted at v.
+    insert_many(iterable) / delete_many(iterable):
+        Batch modifications in one pass over the sorted batch, or a rebuild for big batches.
+    contains_many(iterable) / find_many(iterable):
+        Batch lookups in one pass over the sorted batch, vectorized for NumPy input.
+    __locate_sorted(items, distinct) / __rebuild(nodes) / __relink(nodes, ...):
+        Helper functions for the batch operations.
+    join(left, data, right):
+        Class method which joins two trees through a new node with data in O(log n).
+    split(data):
+        Splits the tree into the trees with data < data and >= data in O(log n).
+    union(other) / intersection(other) / difference(other):
+        Set operations with the nodes of other in O(m log(n/m + 1)), built on join / split.
+    __join(left_root, left_height, node, right_root, right_height) / __join2(...):
+        Helper functions which join standalone subtrees using their black heights.
+    __split(root, height, data) / __split3(root, height, data):
+        Helper functions which split a standalone subtree around data.
+    __union / __intersection / __difference(root, height, other_root, other_height):
+        Helper functions for the set operations on standalone subtrees.
+    __unlink(node) / __unlink_subtree(root):
+        Helper functions which unlink the nodes dropped by the set operations.
+    _spawn():
+        Helper function which returns a new empty tree of the same kind.
+    __roots_and_heights(other) / __leftmost() / __clear() / __reset_root():
+        Small helper functions for join and split.
+    __black_height(root) / __detach(node) / __detach_children(root, height):
+        Helper functions which measure and detach subtrees for join and split.
     left_rotate(current_node):
         Rotates at current_node to the left. If the current_node does not have a 
         left child, raise KeyError.
     right_rotate(current_node):
         Rotates at current_node to the right. If the current_node does not have a 
         right child, raise KeyError.
-    __rb_insert_fixup(z):
+    _rb_insert_fixup(z):
         Maintains the balancing and coloring properity after BST insertion.
-    __rb_delete_fixup(x):
+    _rb_delete_fixup(x, parent):
         Maintains the balancing and coloring properity after BST deletion.
 
     """
@@ -83,14 +212,191 @@ class rb_tree(object):
     PREORDER = 1
     INORDER = 2
     POSTORDER = 3
+    # batches larger than this fraction of the tree are merged and relinked in O(n + m)
+    # instead of inserted / deleted one by one
+    REBUILD_FRACTION = 0.25
+    # tree_stats of an instrumented tree, see enable_stats
+    stats = None
+    # class of the nodes the tree creates, subclasses of Node can add fields to them
+    node_class = Node
     # initialize root and size
     def __init__(self):
         self.root = None
-        self.sentinel = Node(None, color = 'black')
-        self.sentinel.parent = self.sentinel
-        self.sentinel.left = self.sentinel
-        self.sentinel.right = self.sentinel
+        self.leftmost = None
+        self.rightmost = None
+        self.sentinel = SENTINEL
+        # bumped by every change of the structure, iterators use it to fail fast
+        self._mod_count = 0
     
+    @classmethod
+    def from_sorted(cls, iterable):
+        """Builds a tree from data that is already in ascending order in O(n), without any
+        rotations. The tree is perfectly balanced: every level is full except possibly the
+        deepest one, whose nodes are colored red while all other nodes are black.
+
+        Parameters
+        ----------
+        iterable: iterable of int
+            data in ascending order, duplicates are allowed
+
+        Raises
+        ------
+        ValueError
+            if the data is not in ascending order"""
+        items = list(iterable)
+        for i in range(1, len(items)):
+            if items[i] < items[i - 1]:
+                raise ValueError('Error, data is not sorted')
+
+        tree = cls()
+        n = len(items)
+        if n:
+            # depth of the deepest level, it is only colored red when it is not full
+            # (a full tree of n nodes has n + 1 a power of two)
+            max_depth = n.bit_length() - 1
+            red_depth = max_depth if (n + 1) & n else -1
+            # the new nodes form reference cycles (parent pointers), so every few hundred
+            # allocations the cyclic garbage collector would rescan all live objects;
+            # pausing it during the build keeps the build linear in a big process
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                tree.root = tree.__build(items, 0, n, 0, red_depth, tree.sentinel)
+            finally:
+                if gc_enabled:
+                    gc.enable()
+            tree.__reset_root()
+        return tree
+
+    @classmethod
+    def from_iterable(cls, iterable):
+        """Builds a tree from data in any order by sorting it first, O(n log n) for the sort
+        and O(n) for the build.
+
+        Parameters
+        ----------
+        iterable: iterable of int
+            data of the nodes to insert"""
+        return cls.from_sorted(sorted(iterable))
+
+    def __build(self, items, lo, hi, depth, red_depth, parent):
+        """Helper function which recursively builds a balanced subtree from items[lo:hi]
+        by making the middle item its root.
+
+        Parameters
+        ----------
+        items: list
+            sorted data of the whole tree
+        lo: int
+            index of the first item of the subtree
+        hi: int
+            index one past the last item of the subtree
+        depth: int
+            depth of the root of the subtree
+        red_depth: int
+            depth at which the nodes are colored red, -1 if all nodes are black
+        parent: Node
+            parent of the root of the subtree"""
+        if lo >= hi:
+            return self.sentinel
+        mid = (lo + hi) // 2
+        node = self.node_class(items[mid], parent = parent, size = hi - lo,
+                               color = 'red' if depth == red_depth else 'black')
+        node.left = self.__build(items, lo, mid, depth + 1, red_depth, node)
+        node.right = self.__build(items, mid + 1, hi, depth + 1, red_depth, node)
+        return node
+
+    def freeze(self):
+        """Returns an immutable frozen_rb_tree with the data of this tree, stored as one
+        contiguous sorted list for fast (and NumPy batched) lookups. Takes O(n), the tree
+        itself is not changed."""
+        from frozen_rb_tree import frozen_rb_tree
+        return frozen_rb_tree(node.data for node in self)
+
+    def enable_stats(self, hook = None):
+        """Starts collecting statistics (see rb_tree_stats.tree_stats): key comparisons of
+        the descents, rotations, recolorings, fixup loop iterations, a histogram of descent
+        depths and calls of the public operations, plus the height and black height on
+        demand.
+
+        The class of the tree is swapped for a subclass which counts around the plain
+        methods (see rb_tree_stats), so a tree without stats runs them unchanged and
+        pays nothing for the stats.
+
+        Parameters
+        ----------
+        hook: callable
+            called as hook(operation, seconds) after every insert, delete, search and
+            order statistic, None to not time them
+
+        Returns
+        -------
+        tree_stats
+            the counters, updated as the tree is used"""
+        import rb_tree_stats
+        return rb_tree_stats.enable(self, hook)
+
+    def disable_stats(self):
+        """Stops collecting statistics and swaps the plain methods back in. Returns the
+        final tree_stats, None if stats were not enabled."""
+        import rb_tree_stats
+        return rb_tree_stats.disable(self)
+
+    def dump(self, path, shape = False):
+        """Writes the data of the tree in ascending order to a compact, versioned binary
+        file (see rb_tree_io for the layout). The tree itself is not changed.
+
+        Parameters
+        ----------
+        path: str
+            file to write
+        shape: bool
+            also store the colors and the shape, so load rebuilds this exact tree instead
+            of a perfectly balanced one
+
+        Raises
+        ------
+        TypeError
+            if the data is not all int64, float, str or bytes"""
+        import rb_tree_io
+        rb_tree_io.dump(self, path, shape)
+
+    @classmethod
+    def load(cls, path, *args, **kwargs):
+        """Rebuilds a tree written by dump in O(n), without any rotations or fixups.
+
+        Parameters
+        ----------
+        path: str
+            file written by dump
+        *args, **kwargs:
+            constructor arguments, e.g. the monoid of an augmented_rb_tree
+
+        Raises
+        ------
+        ValueError
+            if the file is not a dumped tree of a supported version"""
+        import rb_tree_io
+        return rb_tree_io.load(path, cls, *args, **kwargs)
+
+    @staticmethod
+    def load_mmap(path):
+        """Maps a file written by dump into memory and returns a read-only
+        frozen_rb_tree that searches the mapped keys directly, so it is ready without
+        deserializing anything.
+
+        Parameters
+        ----------
+        path: str
+            file written by dump
+
+        Raises
+        ------
+        ValueError
+            if the file is not a dumped tree of a supported version"""
+        import rb_tree_io
+        return rb_tree_io.load_mmap(path)
+
     def print_tree(self):
         """Prints the data of all nodes in order."""
         self.__print_tree(self.root)
@@ -118,7 +424,7 @@ class rb_tree(object):
             Will be the root of printed subtree"""
         if curr_node is not self.sentinel:
 
-            if curr_node.color is "red":
+            if curr_node.color == "red":
                 node_color = "R"
             else:
                 node_color = "B"
@@ -136,44 +442,283 @@ class rb_tree(object):
         """Iterates over nodes with inorder traversal."""
         return self.inorder()
 
+    def __reversed__(self):
+        """Iterates over nodes with reverse inorder traversal."""
+        return self.irange(reverse = True)
+
     def inorder(self):
         """Iterate over nodes with inorder traversal."""
-        return self.__traverse(self.root, rb_tree.INORDER)
+        return self.irange()
 
     def preorder(self):
         """Iterate over nodes with preorder traversal."""
-        return self.__traverse(self.root, rb_tree.PREORDER)
+        return self.__preorder(self.root, self._mod_count)
 
     def postorder(self):
         """Iterate over nodes with postorder traversal."""
-        return self.__traverse(self.root, rb_tree.POSTORDER)
+        return self.__postorder(self.root, self._mod_count)
+
+    def irange(self, lo = None, hi = None, inclusive = (True, True), reverse = False):
+        """Lazily iterates over the nodes whose data lies between lo and hi. Seeking to the
+        first node takes O(log n) and every following node amortized O(1), so a scan that
+        yields k nodes costs O(log n + k).
+
+        Parameters
+        ----------
+        lo: int
+            lower bound of the range, None for no lower bound
+        hi: int
+            upper bound of the range, None for no upper bound
+        inclusive: (bool, bool)
+            whether lo and hi themselves are part of the range
+        reverse: bool
+            yield the nodes in descending instead of ascending order"""
+        lo_inclusive, hi_inclusive = inclusive
+        # the iterators are generators, so the first node and the modification count are
+        # taken here, when the iterator is created, and not at its first step
+        if not reverse:
+            first = self.__lower_node(lo, lo_inclusive)
+            return self.__scan(first, hi, hi_inclusive, reverse, self._mod_count)
+        first = self.__upper_node(hi, hi_inclusive)
+        return self.__scan(first, lo, lo_inclusive, reverse, self._mod_count)
+
+    def __lower_node(self, lo, inclusive):
+        """Helper function which returns the first node with data >= lo (> lo if not
+        inclusive), or the sentinel if there is none.
+
+        Parameters
+        ----------
+        lo: int
+            lower bound, None for the smallest node
+        inclusive: bool
+            whether a node equal to lo qualifies"""
+        current_node = self.root
+        found = self.sentinel
+        if current_node is None:
+            return found
+        while current_node is not self.sentinel:
+            if lo is None or lo < current_node.data or (inclusive and lo == current_node.data):
+                # current_node qualifies, but there may be a smaller one on the left
+                found = current_node
+                current_node = current_node.left
+            else:
+                current_node = current_node.right
+        return found
+
+    def __upper_node(self, hi, inclusive):
+        """Helper function which returns the last node with data <= hi (< hi if not
+        inclusive), or the sentinel if there is none.
+
+        Parameters
+        ----------
+        hi: int
+            upper bound, None for the largest node
+        inclusive: bool
+            whether a node equal to hi qualifies"""
+        current_node = self.root
+        found = self.sentinel
+        if current_node is None:
+            return found
+        while current_node is not self.sentinel:
+            if hi is None or current_node.data < hi or (inclusive and current_node.data == hi):
+                # current_node qualifies, but there may be a larger one on the right
+                found = current_node
+                current_node = current_node.right
+            else:
+                current_node = current_node.left
+        return found
+
+    def __scan(self, curr_node, stop, stop_inclusive, reverse, mod_count):
+        """Helper generator which walks from curr_node to its successors (predecessors if
+        reverse) by following parent pointers, until it passes the stop bound. Raises
+        RuntimeError as soon as the tree differs from mod_count.
 
-    def __traverse(self, curr_node, traversal_type):
-        """Helper method for the tree traversal iterators.
-        
         Parameters
         ----------
         curr_node: Node
-            Node to start traversing at
-        traversal_type: int or traversal trypes declared in class
-        """
-        if curr_node is not self.sentinel:
-            if traversal_type == self.PREORDER:
-                yield curr_node
-            yield from self.__traverse(curr_node.left, traversal_type)
-            if traversal_type == self.INORDER:
-                yield curr_node
-            yield from self.__traverse(curr_node.right, traversal_type)
-            if traversal_type == self.POSTORDER:
-                yield curr_node
+            first node to yield, the sentinel for an empty scan
+        stop: int
+            bound at which the scan ends, None to run to the end of the tree
+        stop_inclusive: bool
+            whether a node equal to stop is still yielded
+        reverse: bool
+            walk to predecessors instead of successors
+        mod_count: int
+            modification count of the tree when the iterator was created"""
+        sentinel = self.sentinel
+        if self._mod_count != mod_count:
+            raise RuntimeError('Error, tree changed during iteration')
+        while curr_node is not sentinel:
+            if stop is not None:
+                if reverse:
+                    if curr_node.data < stop or (not stop_inclusive and curr_node.data == stop):
+                        return
+                elif stop < curr_node.data or (not stop_inclusive and curr_node.data == stop):
+                    return
+            yield curr_node
+            if self._mod_count != mod_count:
+                raise RuntimeError('Error, tree changed during iteration')
+            if reverse:
+                curr_node = self.__predecessor(curr_node)
+            else:
+                curr_node = self.__successor(curr_node)
+
+    def __successor(self, curr_node):
+        """Helper function which returns the next node in inorder, or the sentinel if
+        curr_node is the largest node.
+
+        Parameters
+        ----------
+        curr_node: Node
+            node to find the successor of"""
+        sentinel = self.sentinel
+        # Travel left down the right subtree
+        if curr_node.right is not sentinel:
+            curr_node = curr_node.right
+            while curr_node.left is not sentinel:
+                curr_node = curr_node.left
+            return curr_node
+        # Travel up until the node is a left child
+        parent = curr_node.parent
+        while parent is not sentinel and curr_node is parent.right:
+            curr_node = parent
+            parent = parent.parent
+        return parent
+
+    def __predecessor(self, curr_node):
+        """Helper function which returns the previous node in inorder, or the sentinel if
+        curr_node is the smallest node.
+
+        Parameters
+        ----------
+        curr_node: Node
+            node to find the predecessor of"""
+        sentinel = self.sentinel
+        # Travel right down the left subtree
+        if curr_node.left is not sentinel:
+            curr_node = curr_node.left
+            while curr_node.right is not sentinel:
+                curr_node = curr_node.right
+            return curr_node
+        # Travel up until the node is a right child
+        parent = curr_node.parent
+        while parent is not sentinel and curr_node is parent.left:
+            curr_node = parent
+            parent = parent.parent
+        return parent
+
+    def __preorder(self, curr_node, mod_count):
+        """Helper generator for preorder traversal using an explicit stack.
+
+        Parameters
+        ----------
+        curr_node: Node
+            Node to start traversing at, None for an empty tree
+        mod_count: int
+            modification count of the tree when the iterator was created"""
+        sentinel = self.sentinel
+        if self._mod_count != mod_count:
+            raise RuntimeError('Error, tree changed during iteration')
+        stack = [curr_node] if curr_node is not None and curr_node is not sentinel else []
+        while stack:
+            curr_node = stack.pop()
+            yield curr_node
+            if self._mod_count != mod_count:
+                raise RuntimeError('Error, tree changed during iteration')
+            # push right first so that the left subtree is visited first
+            if curr_node.right is not sentinel:
+                stack.append(curr_node.right)
+            if curr_node.left is not sentinel:
+                stack.append(curr_node.left)
+
+    def __postorder(self, curr_node, mod_count):
+        """Helper generator for postorder traversal using an explicit stack.
+
+        Parameters
+        ----------
+        curr_node: Node
+            Node to start traversing at, None for an empty tree
+        mod_count: int
+            modification count of the tree when the iterator was created"""
+        sentinel = self.sentinel
+        if self._mod_count != mod_count:
+            raise RuntimeError('Error, tree changed during iteration')
+        if curr_node is None:
+            return
+        stack = []
+        last_visited = None
+        while stack or curr_node is not sentinel:
+            if curr_node is not sentinel:
+                stack.append(curr_node)
+                curr_node = curr_node.left
+            else:
+                top = stack[-1]
+                # visit the right subtree first unless we are just coming back from it
+                if top.right is not sentinel and top.right is not last_visited:
+                    curr_node = top.right
+                else:
+                    yield top
+                    if self._mod_count != mod_count:
+                        raise RuntimeError('Error, tree changed during iteration')
+                    last_visited = stack.pop()
 
     def find_min(self):
-        """Returns node with the min value of a subtree (this is also the node that has no 
+        """Returns node with the min value of the tree (this is also the node that has no 
         leftChild), if tree is empty returns sentinel."""
-        current_node = self.root
-        while current_node.left:
-            current_node = current_node.left
-        return current_node
+        # the cached leftmost node, the old walk down the left spine never stopped since
+        # the sentinel is truthy
+        return self.leftmost if self.root else self.sentinel
+
+    def find_max(self):
+        """Returns node with the max value of the tree (this is also the node that has no 
+        rightChild), if tree is empty returns sentinel."""
+        return self.rightmost if self.root else self.sentinel
+
+    def peek_min(self):
+        """Returns the node with the smallest data in O(1).
+
+        Raises
+        ------
+        KeyError
+            if the tree is empty"""
+        if not self.root:
+            raise KeyError('Error, tree has no root')
+        return self.leftmost
+
+    def peek_max(self):
+        """Returns the node with the largest data in O(1).
+
+        Raises
+        ------
+        KeyError
+            if the tree is empty"""
+        if not self.root:
+            raise KeyError('Error, tree has no root')
+        return self.rightmost
+
+    def pop_min(self):
+        """Deletes the node with the smallest data and returns its data. The node is 
+        known, so this is just the unlink and the delete fixup, O(1) amortized rotations
+        and recolorings plus the O(log n) walk that updates the subtree sizes.
+
+        Raises
+        ------
+        KeyError
+            if the tree is empty"""
+        node = self.peek_min()
+        self.delete_node(node)
+        return node.data
+
+    def pop_max(self):
+        """Deletes the node with the largest data and returns its data, see pop_min.
+
+        Raises
+        ------
+        KeyError
+            if the tree is empty"""
+        node = self.peek_max()
+        self.delete_node(node)
+        return node.data
     
     # find_node expects a data and returns the Node object for the given data
     def find_node(self, data):
@@ -200,7 +745,7 @@ class rb_tree(object):
 
     def __get(self, data, current_node):
         """Helper function which returns the node with the given data starting with
-        the given node, returns None if current_node does not exist.
+        the given node, returns None if there is no such node.
         
         Parameters
         ----------
@@ -208,21 +753,20 @@ class rb_tree(object):
             data value of the node to get
         current_node: Node
             node which search will begin and go down"""
-        if current_node is self.sentinel: # if current_node does not exist return None
-            print("couldnt find data: {}".format(data))
-            return None
-        elif current_node.data == data:
-            return current_node
-        elif data < current_node.data:
-            # recursively call __get with data and current_node's left
-            return self.__get( data, current_node.left )
-        else: # data is greater than current_node.data
-            # recursively call __get with data and current_node's right
-            return self.__get( data, current_node.right )
-    
+        sentinel = self.sentinel
+        while current_node is not sentinel:
+            node_data = current_node.data
+            if node_data == data:
+                return current_node
+            elif data < node_data:
+                current_node = current_node.left
+            else: # data is greater than current_node.data
+                current_node = current_node.right
+        return None
 
     def find_successor(self, data):
-        """Private method which returns the successor of the given data
+        """Returns the successor of the node with the given data, None if it is the 
+        largest node
         
         Parameters
         ----------
@@ -232,31 +776,197 @@ class rb_tree(object):
         Raises
         ------
         KeyError
-            If tree is empty data is not in tree or if tree is empty"""
-        current_node = self.find_node(data)
+            If data is not in tree or if tree is empty"""
+        return self.successor(self.find_node(data))
 
-        if current_node is self.sentinel:
-            raise KeyError
+    def successor(self, node):
+        """Returns the next node in inorder, None if node is the largest node. Takes O(1)
+        amortized and does not search the tree.
+
+        Parameters
+        ----------
+        node: Node
+            node of this tree, e.g. as returned by insert or find_node"""
+        successor = self.__successor(node)
+        return successor if successor is not self.sentinel else None
+
+    def predecessor(self, node):
+        """Returns the previous node in inorder, None if node is the smallest node. Takes
+        O(1) amortized and does not search the tree.
+
+        Parameters
+        ----------
+        node: Node
+            node of this tree, e.g. as returned by insert or find_node"""
+        predecessor = self.__predecessor(node)
+        return predecessor if predecessor is not self.sentinel else None
+
+    # the nearest-key queries below do a single descent and, unlike find_node and
+    # find_successor, accept data that is not in the tree
+
+    def floor(self, data):
+        """Returns the last node whose data is <= data, None if there is none.
+
+        Parameters
+        ----------
+        data: int
+            data value to search for, does not have to be in the tree"""
+        node = self.__upper_node(data, True)
+        return node if node is not self.sentinel else None
+
+    def ceiling(self, data):
+        """Returns the first node whose data is >= data, None if there is none.
+
+        Parameters
+        ----------
+        data: int
+            data value to search for, does not have to be in the tree"""
+        node = self.__lower_node(data, True)
+        return node if node is not self.sentinel else None
+
+    def lower_bound(self, data):
+        """Returns the first node whose data is not smaller than data (the first place
+        data could be inserted), None if there is none. Same as ceiling.
+
+        Parameters
+        ----------
+        data: int
+            data value to search for, does not have to be in the tree"""
+        return self.ceiling(data)
+
+    def upper_bound(self, data):
+        """Returns the first node whose data is greater than data (the last place data
+        could be inserted), None if there is none.
+
+        Parameters
+        ----------
+        data: int
+            data value to search for, does not have to be in the tree"""
+        node = self.__lower_node(data, False)
+        return node if node is not self.sentinel else None
+
+    def find_predecessor(self, data):
+        """Returns the last node whose data is smaller than data, None if there is none.
+        The counterpart of upper_bound for the previous node.
+
+        Parameters
+        ----------
+        data: int
+            data value to search for, does not have to be in the tree"""
+        node = self.__upper_node(data, False)
+        return node if node is not self.sentinel else None
+
+    def nearest(self, data, k = 1):
+        """Returns the k nodes whose data is closest to data (by absolute difference), 
+        closest first, preferring the smaller one on ties. Lands on data with one descent
+        and then walks outwards in both directions, O(log n + k).
+
+        Parameters
+        ----------
+        data: int
+            data value to search around, does not have to be in the tree
+        k: int
+            number of nodes to return, fewer if the tree is smaller"""
+        sentinel = self.sentinel
+        below = self.__upper_node(data, True)
+        above = self.__successor(below) if below is not sentinel else self.__lower_node(data, True)
+        result = []
+        while len(result) < k and (below is not sentinel or above is not sentinel):
+            if above is sentinel or (below is not sentinel and data - below.data <= above.data - data):
+                result.append(below)
+                below = self.__predecessor(below)
+            else:
+                result.append(above)
+                above = self.__successor(above)
+        return result
+
+    def __len__(self):
+        """Returns the number of nodes in the tree."""
+        if self.root:
+            return self.root.size
+        return 0
+
+    def black_height(self):
+        """Returns the number of black nodes on any path from the root down to a leaf, 0
+        for an empty tree, in O(log n)."""
+        return self.__black_height(self.root or self.sentinel)
 
-        # Travel left down the rightmost subtree
-        if current_node.right:
-            current_node = current_node.right
-            while current_node.left is not self.sentinel:
+    def rank(self, data):
+        """Returns the number of nodes whose data is smaller than the given data. The data
+        does not need to be in the tree.
+
+        Parameters
+        ----------
+        data: int
+            data value to rank"""
+        return self.__count_below(data, inclusive = False)
+
+    def select(self, k):
+        """Returns the node holding the k-th smallest data (counting from 0), so that
+        select(rank(data)) is the first node with the given data.
+
+        Parameters
+        ----------
+        k: int
+            position of the node in an inorder traversal, negative values count from the end
+
+        Raises
+        ------
+        IndexError
+            if k is out of range"""
+        n = len(self)
+        if k < 0:
+            k += n
+        if not 0 <= k < n:
+            raise IndexError('Error, select index out of range')
+
+        current_node = self.root
+        while True:
+            left_size = current_node.left.size
+            if k < left_size:
                 current_node = current_node.left
-            successor = current_node
+            elif k == left_size:
+                return current_node
+            else:
+                # skip the left subtree and current_node itself
+                k -= left_size + 1
+                current_node = current_node.right
 
-        # Travel up until the node is a left child
-        else:
-            parent = current_node.parent
-            while parent is not self.sentinel and current_node is not parent.left:
-                current_node = parent
-                parent = parent.parent
-            successor = parent
-
-        if successor:
-            return successor
-        else:
-            return None
+    def count_range(self, lo, hi):
+        """Returns the number of nodes whose data lies between lo and hi (both inclusive).
+
+        Parameters
+        ----------
+        lo: int
+            lower bound of the range
+        hi: int
+            upper bound of the range"""
+        if hi < lo:
+            return 0
+        return self.__count_below(hi, inclusive = True) - self.__count_below(lo, inclusive = False)
+
+    def __count_below(self, data, inclusive):
+        """Helper function which counts the nodes with data smaller than (or equal to, if
+        inclusive) the given data in a single descent from the root.
+
+        Parameters
+        ----------
+        data: int
+            data value to compare against
+        inclusive: bool
+            whether nodes equal to data are counted as well"""
+        count = 0
+        current_node = self.root
+        if current_node is None:
+            return 0
+        while current_node is not self.sentinel:
+            if data < current_node.data or (not inclusive and data == current_node.data):
+                current_node = current_node.left
+            else:
+                # current_node and its whole left subtree are below data
+                count += current_node.left.size + 1
+                current_node = current_node.right
+        return count
 
     def insert(self, data):
         """"Adds node with given data to the tree and fixes up the rb properties
@@ -264,17 +974,15 @@ class rb_tree(object):
         Parameters
         ----------
         data: int
-            data of the node to insert"""
-        # if the tree has a root
-        if self.root:
-            # use helper method __put to add the new node to the tree
-            new_node = self.__put(data, self.root)
-            self.__rb_insert_fixup(new_node)
-        else: # there is no root
-            # make root a Node with values passed to put
-            self.root = Node(data, parent = self.sentinel, left = self.sentinel, right = self.sentinel)
-            new_node = self.root
-            self.__rb_insert_fixup(new_node)
+            data of the node to insert
+        
+        Returns
+        -------
+        Node
+            the new node, which stays valid as a handle until it is deleted"""
+        new_node = self.__put(data)
+        self._rb_insert_fixup(new_node)
+        return new_node
     
     def bst_insert(self, data):
         """Insert of BST
@@ -282,47 +990,185 @@ class rb_tree(object):
         Parameters
         ----------
         data: int
-            data of the node to insert"""
-        # if the tree has a root
-        if self.root:
-            # use helper method __put to add the new node to the tree
-            self.__put(data, self.root)
-        else: # there is no root
-            # make root a Node with values passed to put
-            self.root = Node(data, parent = self.sentinel, left = self.sentinel, right = self.sentinel)
+            data of the node to insert
         
-    def __put(self, data, current_node):
+        Returns
+        -------
+        Node
+            the new node"""
+        return self.__put(data)
+        
+    def __put(self, data):
         """Helper function that finds the approporiate place to add a node in the tree
+        with a single descent from the root and returns the new (red) node
         
         Parameter
         ---------
         data: int
             data of the node to find and place
-        current_node: Node
-            starting point to search down
         """
-        if data < current_node.data:
-            if current_node.left != self.sentinel:
-                new_node = self.__put(data, current_node.left)
-            else: # current_node has no child
-                new_node = Node(data,
-                    parent = current_node,
-                    left = self.sentinel,
-                    right = self.sentinel )
+        sentinel = self.sentinel
+        # there is no root: make root a Node with the data
+        if not self.root:
+            self.root = self._new_node(data, sentinel)
+            self._mod_count += 1
+            self.leftmost = self.rightmost = self.root
+            self._after_link(self.root)
+            return self.root
+
+        # append fast path: data goes after the current maximum, no descent needed
+        if not data < self.rightmost.data:
+            return self.__attach(data, self.rightmost, is_left = False)
+
+        # the node is created before the descent changes any size
+        new_node = self._new_node(data, sentinel)
+        self._mod_count += 1
+        current_node = self.root
+        while True:
+            # the new node will end up below current_node, so its subtree grows by one
+            current_node.size += 1
+            if data < current_node.data:
+                if current_node.left is not sentinel:
+                    current_node = current_node.left
+                    continue
+                # current_node has no left child
+                new_node.parent = current_node
                 current_node.left = new_node
-        else: # data is greater than or equal to current_node's data
-            if current_node.right != self.sentinel:
-                new_node = self.__put(data, current_node.right)
-            else: # current_node has no right child
-                new_node = Node(data,
-                    parent = current_node,
-                    left = self.sentinel,
-                    right = self.sentinel )
+                if current_node is self.leftmost:
+                    self.leftmost = new_node
+                break
+            else: # data is greater than or equal to current_node's data
+                if current_node.right is not sentinel:
+                    current_node = current_node.right
+                    continue
+                # current_node has no right child
+                new_node.parent = current_node
                 current_node.right = new_node
+                break
+        self._after_link(new_node)
         return new_node
     
+    def insert_hint(self, data, hint):
+        """Adds node with given data as close as possible to the hint node. If the data 
+        belongs right before or right after the hint, the node is attached there without
+        descending from the root (O(1) amortized comparisons and fixup, plus the O(log n)
+        walk that updates the subtree sizes), otherwise this falls back to insert.
+        
+        Parameters
+        ----------
+        data: int
+            data of the node to insert
+        hint: Node
+            node of this tree near the insert position, e.g. the node returned by the 
+            previous insert, or None to hint at the end of the tree
+        
+        Returns
+        -------
+        Node
+            the new node"""
+        sentinel = self.sentinel
+        new_node = None
+        if hint is None:
+            # hinting at the end of the tree is the append fast path of insert
+            return self.insert(data)
+        if not hint.data < data:
+            # data <= hint: the slot between the predecessor and the hint fits if 
+            # predecessor <= data
+            before = self.__predecessor(hint)
+            if before is sentinel or not data < before.data:
+                new_node = self.__attach_between(data, before, hint)
+        else:
+            # hint < data: the slot between the hint and its successor fits if 
+            # data <= successor
+            after = self.__successor(hint)
+            if after is sentinel or not after.data < data:
+                new_node = self.__attach_between(data, hint, after)
+
+        if new_node is None:
+            return self.insert(data)
+        self._rb_insert_fixup(new_node)
+        return new_node
+
+    def __attach_between(self, data, before, after):
+        """Helper function which attaches a new node between two neighbouring nodes, one 
+        of which always has a free child pointer on the side facing the other.
+        
+        Parameters
+        ----------
+        data: int
+            data of the new node
+        before: Node
+            node right before the new node in inorder, the sentinel if there is none
+        after: Node
+            node right after the new node in inorder, the sentinel if there is none"""
+        if after is not self.sentinel and after.left is self.sentinel:
+            return self.__attach(data, after, is_left = True)
+        # otherwise after's left subtree is not empty, so before is its largest node
+        return self.__attach(data, before, is_left = False)
+
+    def __attach(self, data, parent, is_left):
+        """Helper function which creates a red node as the given (free) child of parent, 
+        grows the subtree sizes up to the root and returns the new node.
+        
+        Parameters
+        ----------
+        data: int
+            data of the new node
+        parent: Node
+            node that gets the new node as a child
+        is_left: bool
+            whether the new node becomes the left or the right child"""
+        sentinel = self.sentinel
+        new_node = self._new_node(data, parent)
+        self._mod_count += 1
+        if is_left:
+            parent.left = new_node
+            if parent is self.leftmost:
+                self.leftmost = new_node
+        else:
+            parent.right = new_node
+            if parent is self.rightmost:
+                self.rightmost = new_node
+        while parent is not sentinel:
+            parent.size += 1
+            parent = parent.parent
+        self._after_link(new_node)
+        return new_node
+
+    def _new_node(self, data, parent):
+        """Creates the (red, childless) node for data below parent, before anything in the
+        tree is changed. Every insert and join creates its node here, so subclasses check
+        their data here (see interval_rb_tree).
+
+        Parameters
+        ----------
+        data: int
+            data of the new node
+        parent: Node
+            parent of the new node, the sentinel if it is not known yet"""
+        sentinel = self.sentinel
+        return self.node_class(data, parent = parent, left = sentinel, right = sentinel)
+
+    def _after_link(self, node):
+        """Called with every new node once it is linked into the tree and the subtree
+        sizes are updated, before the insert fixup. Does nothing here, subclasses that
+        keep more per node (see augmented_rb_tree) update it from here.
+
+        Parameters
+        ----------
+        node: Node
+            the new node, or the node joining two trees in join and split"""
+
+    def _after_rebuild(self, nodes):
+        """Called once the big batches of insert_many and delete_many have relinked all
+        nodes of the tree into a new shape at once, instead of _after_link for each
+        node. Does nothing here, see augmented_rb_tree.
+
+        Parameters
+        ----------
+        nodes: list of Node
+            all nodes of the tree, in order"""
 
-    
     def delete(self, data):
         """"Find and delete node with given data, then fixes up the coloring of the nodes.
         
@@ -335,78 +1181,713 @@ class rb_tree(object):
         ------
         KeyError
             if data isn't in tree or if tree is empty"""
-        # Same as binary tree delete, except we call rb_delete fixup at the end.
-
-
         # 1. tree is empty or the data is not in the tree -> note: checking if the data is 
         # in the tree does both
-        node = self.find_node(data)
+        self.delete_node(self.find_node(data))
+
+    def delete_node(self, node):
+        """"Deletes the given node without searching for it, then fixes up the coloring of
+        the nodes. All other nodes stay valid handles, the deleted node is unlinked.
         
-        # 2. Tree has the data, depending on how many children, how do we delete?
-
-        # case 1: node has no children -> can set its parent's pointer to None
-        if (node.right is self.sentinel) and (node.left is self.sentinel):
-            if node.parent is self.sentinel:
-                self.root = None
-            else: 
-                if (node.parent.left is not self.sentinel) and (node.parent.left == node):
-                    node.parent.left = self.sentinel
+        Parameters
+        ----------
+        node: Node
+            node of this tree, e.g. as returned by insert or find_node"""
+        # Same as binary tree delete, except we call rb_delete fixup at the end.
+        # refer page 324 of CLRS book for rb_delete
+
+        self._mod_count += 1
+        # the largest (smallest) node moves to the predecessor (successor) when it is deleted
+        if node is self.rightmost:
+            self.rightmost = self.predecessor(node)
+        if node is self.leftmost:
+            self.leftmost = self.successor(node)
+
+        # 1. y is the node that is actually spliced out of its position: the node itself
+        # if it has at most one child, otherwise its successor (which has no left child)
+        if node.left is self.sentinel or node.right is self.sentinel:
+            y = node
+        else:
+            y = node.right
+            while y.left is not self.sentinel:
+                y = y.left
+        y_original_color = y.color
+
+        # 2. every ancestor of y's position loses exactly one node (either y itself or, 
+        # when y moves up, the node it replaces)
+        ancestor = y.parent
+        while ancestor is not self.sentinel:
+            ancestor.size -= 1
+            ancestor = ancestor.parent
+
+        # case 1 and 2: node has at most one child -> its child (possibly the sentinel)
+        # takes its place
+        if node.left is self.sentinel:
+            x = node.right
+            x_parent = node.parent
+            self.__transplant(node, node.right)
+        elif node.right is self.sentinel:
+            x = node.left
+            x_parent = node.parent
+            self.__transplant(node, node.left)
+
+        # case 3: node has 2 children -> promote the successor into the node's position
+        else:
+            x = y.right
+            # note: x may be the sentinel, fixup still needs to know its parent
+            if y.parent is node:
+                x_parent = y
+            else:
+                x_parent = y.parent
+                self.__transplant(y, y.right)
+                y.right = node.right
+                y.right.parent = y
+            self.__transplant(node, y)
+            y.left = node.left
+            y.left.parent = y
+            y.color = node.color
+            y.size = node.size
+
+        # 3. removing a black node breaks the black height, so fix it up
+        if y_original_color == "black":
+            self._rb_delete_fixup(x, x_parent)
+
+        # the tree is empty again once the last node has been removed
+        if self.root is self.sentinel:
+            self.root = None
+
+        # unlink the deleted node so a stale handle does not keep the tree alive
+        node.left = node.right = node.parent = None
+
+    def __transplant(self, u, v):
+        """Replaces the subtree rooted at u with the subtree rooted at v.
+
+        Parameters
+        ----------
+        u: Node
+            root of the subtree to be replaced
+        v: Node
+            root of the subtree that takes its place, may be the sentinel"""
+        if u.parent is self.sentinel:
+            self.root = v
+        elif u is u.parent.left:
+            u.parent.left = v
+        else:
+            u.parent.right = v
+        # the shared sentinel never gets a parent
+        if v is not self.sentinel:
+            v.parent = u.parent
+
+    def insert_many(self, iterable):
+        """Adds nodes for all the given data. The batch is sorted once and then inserted
+        in order, each node next to the previous one via insert_hint, so nearby data
+        skips the descent from the root. A batch that is large compared with the tree
+        (see REBUILD_FRACTION) is merged with the nodes of the tree instead, and all
+        nodes are relinked into a balanced tree in O(n + m). The existing nodes are
+        reused, so node handles stay valid either way.
+
+        Parameters
+        ----------
+        iterable: iterable of int
+            data of the nodes to insert"""
+        items = sorted(iterable)
+        if not items:
+            return
+        if len(items) > len(self) * self.REBUILD_FRACTION:
+            sentinel = self.sentinel
+            nodes = list(self.inorder())
+            # pausing the garbage collector while allocating, see from_sorted
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                nodes.extend([self._new_node(data, sentinel) for data in items])
+            finally:
+                if gc_enabled:
+                    gc.enable()
+            # timsort merges the two sorted runs in linear time, and being stable keeps
+            # the existing nodes before new ones with equal data, as insert would
+            nodes.sort(key = attrgetter('data'))
+            self.__rebuild(nodes)
+            return
+        hint = None
+        for data in items:
+            hint = self.insert_hint(data, hint) if hint is not None else self.insert(data)
+
+    def delete_many(self, iterable):
+        """Deletes one node for each of the given data. The nodes are located in a single 
+        coordinated pass over the sorted batch before anything is deleted, so a missing
+        data leaves the tree untouched. A batch that is large compared with the tree 
+        relinks the remaining nodes into a balanced tree instead, see insert_many.
+
+        Parameters
+        ----------
+        iterable: iterable of int
+            data of the nodes to delete, data repeated k times deletes k nodes
+
+        Raises
+        ------
+        KeyError
+            if some data isn't in the tree (as often as requested)"""
+        items = sorted(iterable)
+        if not items:
+            return
+        if len(items) > len(self) * self.REBUILD_FRACTION:
+            remaining = []
+            removed = []
+            i = 0
+            for node in self:
+                # a batch entry smaller than node cannot match this or any later node
+                if i < len(items) and items[i] < node.data:
+                    raise KeyError('Error, data not found')
+                if i < len(items) and items[i] == node.data:
+                    removed.append(node)
+                    i += 1
                 else:
-                    node.parent.right = self.sentinel
-            self.__rb_delete_fixup(node)
-        
-        # case 2: node has 1 child -> make the node's parent point to R/L child and vice versa
-        
-        # case 2.a: node only has a left child
-        elif (node.right is self.sentinel) and (node.left is not self.sentinel):
+                    remaining.append(node)
+            if i < len(items):
+                raise KeyError('Error, data not found')
+            self.__rebuild(remaining)
+            # unlink the deleted nodes, see delete_node
+            for node in removed:
+                node.left = node.right = node.parent = None
+            return
+        nodes = self.__locate_sorted(items, distinct = True)
+        if None in nodes:
+            raise KeyError('Error, data not found')
+        for node in nodes:
+            self.delete_node(node)
+
+    def contains_many(self, iterable):
+        """Returns for each of the given data whether it is in the tree, in input order. 
+        The batch is sorted and looked up in one coordinated pass. A NumPy array gets a
+        NumPy bool array back, and when it is large compared with the tree the lookups 
+        are vectorized with searchsorted over the data of the tree.
 
-            # if the current node is a left child
-            if node.parent.left == node:
-                node.parent.left = node.left
-                node.left.parent = node.parent
+        Parameters
+        ----------
+        iterable: iterable of int or numpy.ndarray
+            data to look up"""
+        if numpy is not None and isinstance(iterable, numpy.ndarray):
+            if len(iterable) * 32 >= len(self):
+                data = numpy.array([node.data for node in self])
+                if not len(data):
+                    return numpy.zeros(len(iterable), dtype = bool)
+                positions = numpy.minimum(numpy.searchsorted(data, iterable), len(data) - 1)
+                return data[positions] == iterable
+            return numpy.array([node is not None for node in self.find_many(iterable.tolist())],
+                               dtype = bool)
+        return [node is not None for node in self.find_many(iterable)]
+
+    def find_many(self, iterable):
+        """Returns for each of the given data a node with that data, or None if there is
+        none, in input order. The batch is sorted and looked up in one coordinated pass.
+
+        Parameters
+        ----------
+        iterable: iterable of int or numpy.ndarray
+            data to look up"""
+        if numpy is not None and isinstance(iterable, numpy.ndarray):
+            iterable = iterable.tolist()
+        queries = list(iterable)
+        order = sorted(range(len(queries)), key = queries.__getitem__)
+        found = self.__locate_sorted([queries[i] for i in order], distinct = False)
+        result = [None] * len(queries)
+        for i, node in zip(order, found):
+            result[i] = node
+        return result
+
+    def __locate_sorted(self, items, distinct):
+        """Helper function which finds a node for each of the sorted data in one pass. A
+        cursor moves forward through the tree, short gaps are walked via successors and
+        long ones are skipped with a fresh search from the root.
 
-            # if the current node is a right child
+        Parameters
+        ----------
+        items: list of int
+            sorted data to look up
+        distinct: bool
+            whether repeated data has to match different nodes (for deletion)"""
+        sentinel = self.sentinel
+        found = []
+        if not items:
+            return found
+        cursor = self.__lower_node(items[0], True)
+        for data in items:
+            steps = 0
+            while cursor is not sentinel and cursor.data < data and steps < 8:
+                cursor = self.__successor(cursor)
+                steps += 1
+            if cursor is not sentinel and cursor.data < data:
+                cursor = self.__lower_node(data, True)
+            if cursor is not sentinel and cursor.data == data:
+                found.append(cursor)
+                if distinct:
+                    cursor = self.__successor(cursor)
             else:
-                node.parent.right = node.left
-                node.left.parent = node.parent
-            node = node.left
-            self.__rb_delete_fixup(node)
-            
-        
-        # case 2.b: node only has a right child
-        elif (node.right is not self.sentinel and node.left is self.sentinel):
+                found.append(None)
+        return found
 
-            # if the current node is a left child
-            if node.parent.left == node:
-                node.parent.left = node.right
-                node.right.parent = node.parent
-                
+    def __rebuild(self, nodes):
+        """Helper function which relinks the given nodes into a balanced tree of the shape
+        from_sorted builds, in O(n) and without allocating nodes.
 
-            # if the current node is a right child
-            else:
-                node.parent.right = node.right
-                node.right.parent = node.parent
-            node = node.right
-            self.__rb_delete_fixup(node)
-            
+        Parameters
+        ----------
+        nodes: list of Node
+            all nodes of the new tree, in order"""
+        n = len(nodes)
+        # see from_sorted
+        max_depth = n.bit_length() - 1
+        red_depth = max_depth if (n + 1) & n else -1
+        self.root = self.__relink(nodes, 0, n, 0, red_depth, self.sentinel)
+        self.__reset_root()
+        self._after_rebuild(nodes)
+
+    def __relink(self, nodes, lo, hi, depth, red_depth, parent):
+        """Helper function which recursively links nodes[lo:hi] into a balanced subtree
+        with the middle node as its root, like __build does with new nodes."""
+        if lo >= hi:
+            return self.sentinel
+        mid = (lo + hi) // 2
+        node = nodes[mid]
+        node.parent = parent
+        node.size = hi - lo
+        node.color = 'red' if depth == red_depth else 'black'
+        node.left = self.__relink(nodes, lo, mid, depth + 1, red_depth, node)
+        node.right = self.__relink(nodes, mid + 1, hi, depth + 1, red_depth, node)
+        return node
+
+    @classmethod
+    def join(cls, left, data, right):
+        """Builds a tree holding the nodes of left, a new node with the given data and the
+        nodes of right, in O(log n). The new node is linked in where the black heights of
+        the two trees meet, so only the fixup below that point rotates. The result is a
+        tree of the same kind as left (e.g. with its monoid for augmented_rb_tree), both
+        input trees are left empty.
+
+        Parameters
+        ----------
+        left: rb_tree
+            tree whose data is all <= data
+        data: int
+            data of the node joining the two trees
+        right: rb_tree
+            tree whose data is all >= data
+
+        Raises
+        ------
+        ValueError
+            if the data of the trees is not ordered around data"""
+        if left.sentinel is not right.sentinel:
+            raise ValueError('Error, trees of different kinds cannot be joined')
+        if (left.root and data < left.rightmost.data) or (right.root and right.leftmost.data < data):
+            raise ValueError('Error, trees are not ordered around the joining data')
+
+        tree = left._spawn()
+        sentinel = tree.sentinel
+        node = tree._new_node(data, sentinel)
+        left_root, right_root = left.root or sentinel, right.root or sentinel
+        tree.root, _ = tree.__join(left_root, tree.__black_height(left_root), node,
+                                   right_root, tree.__black_height(right_root))
+        tree.__reset_root()
+        left.__clear()
+        right.__clear()
+        return tree
+
+    def split(self, data):
+        """Splits the tree at the given data into two trees in O(log n): the first holds
+        the nodes with data < data, the second the nodes with data >= data. This tree
+        is left empty.
+
+        Parameters
+        ----------
+        data: int
+            data value at which to split, does not need to be in the tree
+
+        Returns
+        -------
+        (rb_tree, rb_tree)
+            the trees below and from data on"""
+        root = self.root or self.sentinel
+        lower, _, upper, _ = self.__split(root, self.__black_height(root), data)
+        self.__clear()
+        left, right = self._spawn(), self._spawn()
+        left.root, right.root = lower, upper
+        left.__reset_root()
+        right.__reset_root()
+        return left, right
+
+    def union(self, other):
+        """Adds the nodes of other whose data is not in this tree yet, in 
+        O(m log(n/m + 1)) for trees of sizes m <= n. The set operations treat the trees
+        as sets, with duplicate data in an input the multiplicities of the result are
+        unspecified. other is left empty.
+
+        Parameters
+        ----------
+        other: rb_tree
+            tree to merge into this one"""
+        self.root, _ = self.__union(*self.__roots_and_heights(other))
+        other.__clear()
+        self.__reset_root()
+
+    def intersection(self, other):
+        """Keeps only the nodes whose data is also in other, in O(m log(n/m + 1)) plus O(1)
+        to unlink each dropped node. other is left empty.
+
+        Parameters
+        ----------
+        other: rb_tree
+            tree to intersect with"""
+        self.root, _ = self.__intersection(*self.__roots_and_heights(other))
+        other.__clear()
+        self.__reset_root()
+
+    def difference(self, other):
+        """Removes the nodes whose data is in other, in O(m log(n/m + 1)) plus O(1) to
+        unlink each dropped node. other is left empty.
 
+        Parameters
+        ----------
+        other: rb_tree
+            tree whose data to remove"""
+        self.root, _ = self.__difference(*self.__roots_and_heights(other))
+        other.__clear()
+        self.__reset_root()
+
+    def _spawn(self):
+        """Helper function which returns a new empty tree of the same kind as this one,
+        for the results of join and split. Without stats, even if this tree has them."""
+        return getattr(self, '_base_class', type(self))()
+
+    def __roots_and_heights(self, other):
+        """Helper function which returns the roots of this tree and of other (the 
+        sentinel if empty) with their black heights, for the set operations."""
+        root, other_root = self.root or self.sentinel, other.root or other.sentinel
+        return root, self.__black_height(root), other_root, self.__black_height(other_root)
+
+    def __leftmost(self):
+        """Helper function which returns the node with the smallest data, the sentinel if
+        the tree is empty."""
+        current_node = self.root or self.sentinel
+        while current_node.left is not self.sentinel:
+            current_node = current_node.left
+        return current_node
+
+    def __clear(self):
+        """Helper function which empties the tree after its nodes were taken over by
+        another tree."""
+        self.root = self.leftmost = self.rightmost = None
+        self._mod_count += 1
+
+    def __reset_root(self):
+        """Helper function which turns an empty (sentinel) root back into None and finds
+        the leftmost and rightmost nodes again after the shape of the tree changed
+        wholesale."""
+        self._mod_count += 1
+        if self.root is self.sentinel:
+            self.root = None
+        self.leftmost = self.rightmost = self.root
+        if self.root:
+            while self.leftmost.left is not self.sentinel:
+                self.leftmost = self.leftmost.left
+            while self.rightmost.right is not self.sentinel:
+                self.rightmost = self.rightmost.right
+
+    def __black_height(self, root):
+        """Helper function which returns the number of black nodes on any path from root
+        down to a leaf (0 for the sentinel).
+
+        Parameters
+        ----------
+        root: Node
+            root of the subtree"""
+        height = 0
+        while root is not self.sentinel:
+            if root.color == "black":
+                height += 1
+            root = root.left
+        return height
+
+    def __detach(self, node):
+        """Helper function which turns a child subtree into a standalone subtree: it gets 
+        no parent and a black root. Returns node.
 
-        # case 3: node has 2 children
-        # -> find successor and promote successor (this element would have at most one child)
+        Parameters
+        ----------
+        node: Node
+            root of the subtree, may be the sentinel"""
+        if node is not self.sentinel:
+            node.parent = self.sentinel
+            node.color = "black"
+        return node
+
+    def __detach_children(self, root, height):
+        """Helper function which detaches both children of the root of a standalone 
+        subtree with the given black height, and returns them with their black heights:
+        a black child (or the sentinel) is one lower than root, a red child that turns 
+        black is as high as root.
+
+        Parameters
+        ----------
+        root: Node
+            black root of the subtree, not the sentinel
+        height: int
+            black height of root"""
+        left_height = height - (root.left.color == "black")
+        right_height = height - (root.right.color == "black")
+        return (self.__detach(root.left), left_height,
+                self.__detach(root.right), right_height)
+
+    def __join(self, left_root, left_height, node, right_root, right_height):
+        """Helper function which links two standalone subtrees with black roots through
+        node (left <= node <= right) and returns the root of the joined subtree and its 
+        black height, in O(1 + the difference of the black heights). This tree is used as
+        the workspace, so its root is overwritten.
+
+        Parameters
+        ----------
+        left_root: Node
+            root of the left subtree, may be the sentinel
+        left_height: int
+            black height of the left subtree
+        node: Node
+            node to put between the subtrees, its links are overwritten
+        right_root: Node
+            root of the right subtree, may be the sentinel
+        right_height: int
+            black height of the right subtree"""
+        sentinel = self.sentinel
+
+        # same black height: node simply becomes the black root over both subtrees
+        if left_height == right_height:
+            node.left, node.right, node.parent = left_root, right_root, sentinel
+            node.color = "black"
+            node.size = left_root.size + right_root.size + 1
+            if left_root is not sentinel:
+                left_root.parent = node
+            if right_root is not sentinel:
+                right_root.parent = node
+            self.root = node
+            self._after_link(node)
+            return node, left_height + 1
+
+        # otherwise walk down the inner spine of the taller subtree to the black node c 
+        # with the black height of the shorter one, node replaces c and adopts c and the
+        # shorter subtree as its children
+        if left_height > right_height:
+            self.root = left_root
+            parent, c, height = sentinel, left_root, left_height
+            while not (c.color == "black" and height == right_height):
+                if c.color == "black":
+                    height -= 1
+                parent, c = c, c.right
+            parent.right = node
+            node.left, node.right = c, right_root
+            shorter = right_root
         else:
-            successor = self.find_successor(data)
-            # note that the successor can never be the root and always has a parent as
-            # the node has two children thus one of their subtrees must contain 
-            # successor meaning successor is always below current node
-            
-            # case 3a: successor has one child
-            # -> we take the successor's child and point it to the successor's parent
-            saved_data = successor.data
-            self.delete(successor.data)
-            node.data = saved_data
-        
+            self.root = right_root
+            parent, c, height = sentinel, right_root, right_height
+            while not (c.color == "black" and height == left_height):
+                if c.color == "black":
+                    height -= 1
+                parent, c = c, c.left
+            parent.left = node
+            node.left, node.right = left_root, c
+            shorter = left_root
+
+        node.parent = parent
+        node.color = "red"
+        node.size = c.size + shorter.size + 1
+        if c is not sentinel:
+            c.parent = node
+        if shorter is not sentinel:
+            shorter.parent = node
+        # all nodes above node gain the shorter subtree and node itself
+        while parent is not sentinel:
+            parent.size += shorter.size + 1
+            parent = parent.parent
+        self._after_link(node)
+
+        # node is red and may have a red parent, the usual insert fixup repairs that; the
+        # black height only grows if the fixup has to blacken a red root
+        grown = self._rb_insert_fixup(node)
+        return self.root, max(left_height, right_height) + grown
+
+    def __join2(self, left_root, left_height, right_root, right_height):
+        """Helper function which joins two standalone subtrees (left <= right) without a
+        node in between, by taking the smallest node out of the right subtree. Returns 
+        the root and the black height of the joined subtree.
+
+        Parameters
+        ----------
+        left_root: Node
+            root of the left subtree, may be the sentinel
+        left_height: int
+            black height of the left subtree
+        right_root: Node
+            root of the right subtree, may be the sentinel
+        right_height: int
+            black height of the right subtree"""
+        if right_root is self.sentinel:
+            return left_root, left_height
+        # take the smallest node out of the right subtree, using this tree as workspace;
+        # the delete may lower its black height, measuring it again costs no more than
+        # the delete itself
+        self.root, self.leftmost, self.rightmost = right_root, None, None
+        node = self.__leftmost()
+        self.delete_node(node)
+        right_root = self.__detach(self.root or self.sentinel)
+        return self.__join(left_root, left_height, node, right_root, self.__black_height(right_root))
+
+    def __split(self, root, height, data):
+        """Helper function which splits a standalone subtree into the subtrees with data
+        < data and >= data, and returns their roots and black heights.
+
+        Parameters
+        ----------
+        root: Node
+            root of the subtree, may be the sentinel
+        height: int
+            black height of the subtree
+        data: int
+            data value at which to split"""
+        if root is self.sentinel:
+            return root, 0, root, 0
+        left_root, left_height, right_root, right_height = self.__detach_children(root, height)
+        if not root.data < data:
+            lower, lower_height, upper, upper_height = self.__split(left_root, left_height, data)
+            return (lower, lower_height) + self.__join(upper, upper_height, root, right_root, right_height)
+        else:
+            lower, lower_height, upper, upper_height = self.__split(right_root, right_height, data)
+            return self.__join(left_root, left_height, root, lower, lower_height) + (upper, upper_height)
+
+    def __split3(self, root, height, data):
+        """Helper function which splits a standalone subtree at a node with the given data,
+        returns the roots and black heights of the subtrees before and after that node and
+        the node itself (None if there is no node with that data) in between.
+
+        Parameters
+        ----------
+        root: Node
+            root of the subtree, may be the sentinel
+        height: int
+            black height of the subtree
+        data: int
+            data value at which to split"""
+        if root is self.sentinel:
+            return root, 0, None, root, 0
+        left_root, left_height, right_root, right_height = self.__detach_children(root, height)
+        if data == root.data:
+            return left_root, left_height, root, right_root, right_height
+        elif data < root.data:
+            lower, lower_height, match, upper, upper_height = self.__split3(left_root, left_height, data)
+            return (lower, lower_height, match) + self.__join(upper, upper_height, root, right_root, right_height)
+        else:
+            lower, lower_height, match, upper, upper_height = self.__split3(right_root, right_height, data)
+            return self.__join(left_root, left_height, root, lower, lower_height) + (match, upper, upper_height)
+
+    def __union(self, root, height, other_root, other_height):
+        """Helper function which returns the root and the black height of the union of two
+        standalone subtrees.
+
+        Parameters
+        ----------
+        root: Node
+            root of the first subtree, whose nodes are all kept
+        height: int
+            black height of the first subtree
+        other_root: Node
+            root of the second subtree
+        other_height: int
+            black height of the second subtree"""
+        if root is self.sentinel:
+            return other_root, other_height
+        if other_root is self.sentinel:
+            return root, height
+        left_root, left_height, right_root, right_height = self.__detach_children(root, height)
+        lower, lower_height, match, upper, upper_height = self.__split3(other_root, other_height, root.data)
+        lower, lower_height = self.__union(left_root, left_height, lower, lower_height)
+        upper, upper_height = self.__union(right_root, right_height, upper, upper_height)
+        if match is not None:
+            self.__unlink(match)
+        return self.__join(lower, lower_height, root, upper, upper_height)
+
+    def __intersection(self, root, height, other_root, other_height):
+        """Helper function which returns the root and the black height of the nodes of the
+        first subtree whose data is in the second one.
+
+        Parameters
+        ----------
+        root: Node
+            root of the first subtree
+        height: int
+            black height of the first subtree
+        other_root: Node
+            root of the second subtree
+        other_height: int
+            black height of the second subtree"""
+        if root is self.sentinel or other_root is self.sentinel:
+            self.__unlink_subtree(root)
+            self.__unlink_subtree(other_root)
+            return self.sentinel, 0
+        left_root, left_height, right_root, right_height = self.__detach_children(root, height)
+        lower, lower_height, match, upper, upper_height = self.__split3(other_root, other_height, root.data)
+        lower, lower_height = self.__intersection(left_root, left_height, lower, lower_height)
+        upper, upper_height = self.__intersection(right_root, right_height, upper, upper_height)
+        if match is not None:
+            self.__unlink(match)
+            return self.__join(lower, lower_height, root, upper, upper_height)
+        self.__unlink(root)
+        return self.__join2(lower, lower_height, upper, upper_height)
+
+    def __difference(self, root, height, other_root, other_height):
+        """Helper function which returns the root and the black height of the nodes of the
+        first subtree whose data is not in the second one.
+
+        Parameters
+        ----------
+        root: Node
+            root of the first subtree
+        height: int
+            black height of the first subtree
+        other_root: Node
+            root of the second subtree
+        other_height: int
+            black height of the second subtree"""
+        if root is self.sentinel or other_root is self.sentinel:
+            self.__unlink_subtree(other_root)
+            return root, height
+        left_root, left_height, right_root, right_height = self.__detach_children(other_root, other_height)
+        lower, lower_height, match, upper, upper_height = self.__split3(root, height, other_root.data)
+        lower, lower_height = self.__difference(lower, lower_height, left_root, left_height)
+        upper, upper_height = self.__difference(upper, upper_height, right_root, right_height)
+        self.__unlink(other_root)
+        if match is not None:
+            self.__unlink(match)
+        return self.__join2(lower, lower_height, upper, upper_height)
+
+    def __unlink(self, node):
+        """Helper function which unlinks a node dropped by a set operation, like
+        delete_node does with the deleted node, so a stale handle does not look alive."""
+        node.left = node.right = node.parent = None
+
+    def __unlink_subtree(self, root):
+        """Helper function which unlinks all nodes of a standalone subtree dropped by a
+        set operation, see __unlink.
+
+        Parameters
+        ----------
+        root: Node
+            root of the subtree, may be the sentinel"""
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node is not self.sentinel:
+                stack.append(node.left)
+                stack.append(node.right)
+                self.__unlink(node)
 
-        
     def left_rotate(self, current_node):
         """Rotates at current_node to the left. If x is the root of the tree to rotate with left 
         child subtree T1 and right child y, where T2 and T3 are the left and right children of y then:
@@ -452,6 +1933,11 @@ class rb_tree(object):
             y.left = current_node
             current_node.parent = y
 
+            # y takes over current_node's subtree, current_node keeps only T1 and T2
+            self._mod_count += 1
+            y.size = current_node.size
+            current_node.size = current_node.left.size + current_node.right.size + 1
+
     
     def right_rotate(self, current_node):
         """Rotates at current_node to the right. If y is the root of the tree to rotate 
@@ -505,16 +1991,26 @@ class rb_tree(object):
             # 8. update child/parent relationship of left and current
             y.right = current_node
             current_node.parent = y
+
+            # 9. y takes over current_node's subtree, current_node keeps only T2 and T3
+            self._mod_count += 1
+            y.size = current_node.size
+            current_node.size = current_node.left.size + current_node.right.size + 1
         
 
     
-    def __rb_insert_fixup(self, z):
+    def _rb_insert_fixup(self, z):
         """Maintains the balancing and coloring property after bst insertion into the tree
         
         Parameters
         ----------
         z: Node
-            node which to start the balancing of the properties of the RB tree"""
+            node which to start the balancing of the properties of the RB tree
+
+        Returns
+        -------
+        bool
+            whether the root ended up red and was blackened, i.e. the black height grew"""
         # refer page 330 of CLRS book and lecture slides for rb_insert_fixup
 
         # only work with double red (assume everything else is good - it is)
@@ -585,26 +2081,31 @@ class rb_tree(object):
 
         # !! change the root to black in case we changed the root to red in the loop but bc it doesn't have a parent, need to 
         # !! manually change at the end
-        self.root.color = "black"
+        grown = self.root.color == "red"
+        if grown:
+            self.root.color = "black"
+        return grown
             
 
-    def __rb_delete_fixup(self, x):
+    def _rb_delete_fixup(self, x, parent):
         """Maintains the balancing and coloring property after BST deletion from the tree
         
         Parameters
         ----------
         x: Node
-            node where to start the balancing of RB properties"""
+            node where to start the balancing of RB properties, may be the sentinel
+        parent: Node
+            parent of x (passed separately since the shared sentinel has no parent)"""
         # refer page 338 of CLRS book and lecture slides for rb_delete_fixup
 
         # don't work with root or if x is red
         while x is not self.root and x.color == "black":
 
             # CASE 1: x is a left child
-            if x == x.parent.left:
+            if x is parent.left:
 
                 # 1. get the right child
-                w = x.parent.right
+                w = parent.right
                 
                 # CASE 1A: if sibling is red
                 if w.color == "red":
@@ -613,15 +2114,15 @@ class rb_tree(object):
                     w.color = "black"
 
                     # 3. recolor their parent to be red
-                    x.parent.color = "red"
+                    parent.color = "red"
 
                     # 4. rotate left on the parent
-                    self.left_rotate(x.parent)
+                    self.left_rotate(parent)
 
                     # 5. set the sibling as the right child of the parent of x
                     # note: this is bc if during the rotation, the siblings left child becomes the right child of the 
                     # parent, then we need to set this equal the thing we are checking in case i
-                    w = x.parent.right
+                    w = parent.right
 
                 # CASE 1B: if sibling is black, left child of sibling is black, and right child of sibling is black
                 if w.left.color == "black" and w.right.color == "black":
@@ -630,7 +2131,8 @@ class rb_tree(object):
                     w.color = "red"
 
                     # set parent as the new possible black node (if red then it will be changed to black at the end)
-                    x = x.parent
+                    x = parent
+                    parent = x.parent
                 
                 # CASE 1C: if sibling is black and left child is red 
                 else:
@@ -639,31 +2141,32 @@ class rb_tree(object):
                         w.left.color = "black"
                         w.color = "red"
                         self.right_rotate(w)
-                        w = x.parent.right
+                        w = parent.right
                     
 
-                    w.color = x.parent.color
-                    x.parent.color = "black"
+                    w.color = parent.color
+                    parent.color = "black"
                     w.right.color = "black"
-                    self.left_rotate(x.parent)
+                    self.left_rotate(parent)
                     x = self.root
 
             # CASE 2: x is a right child
             else:
                 # 1. get the sibling
-                w = x.parent.left
+                w = parent.left
 
                 # CASE 2A: sibling is red
                 if w.color == "red":
                     w.color = "black"
-                    x.parent.color = "red"
-                    self.right_rotate(x.parent)
-                    w = x.parent.left
+                    parent.color = "red"
+                    self.right_rotate(parent)
+                    w = parent.left
                 
                 # CASE 2B: sibling is black and only has black children
                 if w.right.color == "black" and w.left.color == "black":
                     w.color = "red"
-                    x = x.parent
+                    x = parent
+                    parent = x.parent
                 
                 else:
                     # CASE 2C: sibling is black and left child is black
@@ -671,16 +2174,17 @@ class rb_tree(object):
                         w.right.color = "black"
                         w.color = "red"
                         self.left_rotate(w)
-                        w = x.parent.left
+                        w = parent.left
 
                     # CASE 2D: sibling is left child is red
-                    w.color = x.parent.color
-                    x.parent.color = "black"
+                    w.color = parent.color
+                    parent.color = "black"
                     w.left.color = "black"
-                    self.right_rotate(x.parent)
+                    self.right_rotate(parent)
                     x = self.root
 
-        x.color = "black"
+        if x.color == "red":
+            x.color = "black"
 
 
     
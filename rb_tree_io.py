@@ -0,0 +1,245 @@
+"""Compact binary files for rb_tree.
+
+File layout (all integers little endian):
+    - header: magic b'RBTREE\\0\\0', version (uint16), key kind (uint8), flags (uint8),
+      number of keys n (uint64), padded to 24 bytes
+    - keys in ascending order, depending on the key kind:
+        'q' n int64 values, 'd' n float64 values,
+        's' / 'b' n + 1 uint64 offsets into a blob of utf-8 strings / bytes, then the blob
+    - with the SHAPE flag: n bytes, one per node in preorder, bit 0 set for a red node,
+      bit 1 for a node with a left child and bit 2 for a node with a right child
+
+Without the shape, load rebuilds the tree with rb_tree.from_sorted. With it, load
+rebuilds exactly the dumped tree, with the same colors and rotations. Neither needs any
+fixup. load_mmap maps the file and answers read-only queries straight from the mapped
+keys without deserializing them.
+"""
+import mmap
+import struct
+import sys
+from array import array
+
+MAGIC = b'RBTREE\0\0'
+VERSION = 1
+# flag bits of the header
+SHAPE = 1
+
+_HEADER = struct.Struct('<8sHBBQ')
+_HEADER_SIZE = 24
+_RED, _HAS_LEFT, _HAS_RIGHT = 1, 2, 4
+
+
+def key_kind(keys):
+    """Returns the key kind to store the (non-empty) keys with.
+
+    Raises
+    ------
+    TypeError
+        if the keys are not all ints in int64 range, floats, str or bytes"""
+    if all(type(key) is int and -2 ** 63 <= key < 2 ** 63 for key in keys):
+        return 'q'
+    if all(type(key) is float for key in keys):
+        return 'd'
+    if all(type(key) is str for key in keys):
+        return 's'
+    if all(type(key) is bytes for key in keys):
+        return 'b'
+    raise TypeError('Error, only int64, float, str or bytes data can be dumped')
+
+
+def _little_endian(values):
+    """Returns the array as little endian bytes."""
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _padding(size):
+    return b'\0' * (-size % 8)
+
+
+def dump(tree, path, shape = False):
+    """Writes the data of the tree (and optionally its colors and shape) to a file.
+
+    Parameters
+    ----------
+    tree: rb_tree
+        tree to write, it is not changed
+    path: str
+        file to write
+    shape: bool
+        whether to store the colors and the shape so load rebuilds the identical tree
+
+    Raises
+    ------
+    TypeError
+        if the data is not all int64, float, str or bytes"""
+    keys = [node.data for node in tree]
+    kind = key_kind(keys) if keys else 'q'
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, ord(kind), SHAPE if shape else 0, len(keys)))
+        f.write(_padding(_HEADER.size))
+        if kind in 'qd':
+            f.write(_little_endian(array(kind, keys)))
+        else:
+            blobs = [key.encode('utf-8') for key in keys] if kind == 's' else keys
+            offsets = array('Q', [0])
+            for blob in blobs:
+                offsets.append(offsets[-1] + len(blob))
+            f.write(_little_endian(offsets))
+            f.write(b''.join(blobs))
+            f.write(_padding(offsets[-1]))
+        if shape:
+            sentinel = tree.sentinel
+            f.write(bytes((_RED if node.color == "red" else 0)
+                          | (_HAS_LEFT if node.left is not sentinel else 0)
+                          | (_HAS_RIGHT if node.right is not sentinel else 0)
+                          for node in tree.preorder()))
+
+
+def _read_header(buffer):
+    """Returns (kind, flags, n) from the header of a dumped file.
+
+    Raises
+    ------
+    ValueError
+        if the file is not a dumped tree of a supported version"""
+    if len(buffer) < _HEADER_SIZE:
+        raise ValueError('Error, not an rb_tree file')
+    magic, version, kind, flags, n = _HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError('Error, not an rb_tree file')
+    if version != VERSION:
+        raise ValueError('Error, unsupported rb_tree file version {}'.format(version))
+    return chr(kind), flags, n
+
+
+def _column(buffer, offset, typecode, n):
+    """Returns n values of the typecode stored little endian at offset, as a zero-copy
+    memoryview when the machine is little endian."""
+    view = memoryview(buffer)[offset:offset + 8 * n]
+    if sys.byteorder == 'little':
+        return view.cast(typecode)
+    values = array(typecode, bytes(view))
+    values.byteswap()
+    return values
+
+
+class _blob_keys(object):
+    """Read-only sequence of the str / bytes keys of a file, decoded on access."""
+    __slots__ = ('offsets', 'blob', 'decode')
+
+    def __init__(self, offsets, blob, decode):
+        self.offsets = offsets
+        self.blob = blob
+        self.decode = decode
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        key = bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+        return key.decode('utf-8') if self.decode else key
+
+
+def _keys(buffer, kind, n):
+    """Returns the keys of a file as a sequence over the buffer and the offset right
+    after them."""
+    offset = _HEADER_SIZE
+    if kind in 'qd':
+        return _column(buffer, offset, kind, n), offset + 8 * n
+    offsets = _column(buffer, offset, 'Q', n + 1)
+    start = offset + 8 * (n + 1)
+    end = start + offsets[n]
+    keys = _blob_keys(offsets, memoryview(buffer)[start:end], kind == 's')
+    return keys, end + (-offsets[n] % 8)
+
+
+def load(path, cls = None, *args, **kwargs):
+    """Reads a dumped tree in O(n), without any rotations or fixups.
+
+    Parameters
+    ----------
+    path: str
+        file written by dump
+    cls: type
+        tree class to build, rb_tree by default
+    *args, **kwargs:
+        constructor arguments of cls, e.g. the monoid of an augmented_rb_tree
+
+    Raises
+    ------
+    ValueError
+        if the file is not a dumped tree of a supported version"""
+    if cls is None:
+        from rb_tree import rb_tree as cls
+    with open(path, 'rb') as f:
+        buffer = f.read()
+    kind, flags, n = _read_header(buffer)
+    keys, end = _keys(buffer, kind, n)
+    keys = list(keys)
+    if not flags & SHAPE:
+        return cls.from_sorted(keys, *args, **kwargs)
+    return _build_shape(cls(*args, **kwargs), keys, buffer[end:end + n])
+
+
+def _build_shape(tree, keys, shape):
+    """Helper function which rebuilds the exact dumped tree into the empty tree from
+    the preorder shape bytes, handing out the sorted keys in inorder. The nodes are
+    created through the _new_node hook of the tree, and _after_link is called for each
+    node once its children are linked and before it has a parent, so subclasses check
+    and update their nodes bottom up in O(1) each."""
+    sentinel = tree.sentinel
+    if not keys:
+        return tree
+    records = iter(shape)
+    data = iter(keys)
+
+    def build():
+        flags = next(records)
+        left = build() if flags & _HAS_LEFT else sentinel
+        node = tree._new_node(next(data), sentinel)
+        right = build() if flags & _HAS_RIGHT else sentinel
+        node.color = "red" if flags & _RED else "black"
+        node.left, node.right = left, right
+        for child in (left, right):
+            if child is not sentinel:
+                child.parent = node
+        node.size = left.size + right.size + 1
+        tree._after_link(node)
+        return node
+
+    tree.root = build()
+    tree.leftmost = tree.rightmost = tree.root
+    while tree.leftmost.left is not sentinel:
+        tree.leftmost = tree.leftmost.left
+    while tree.rightmost.right is not sentinel:
+        tree.rightmost = tree.rightmost.right
+    return tree
+
+
+def load_mmap(path):
+    """Maps a dumped file into memory and returns a read-only frozen_rb_tree whose
+    queries read the keys straight from the mapping, so nothing is deserialized up front
+    and the operating system pages the keys in on demand.
+
+    Parameters
+    ----------
+    path: str
+        file written by dump
+
+    Raises
+    ------
+    ValueError
+        if the file is not a dumped tree of a supported version"""
+    from frozen_rb_tree import frozen_rb_tree
+    with open(path, 'rb') as f:
+        mapping = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+    kind, _, n = _read_header(mapping)
+    keys, _ = _keys(mapping, kind, n)
+    return frozen_rb_tree.from_sequence(keys)
@@ -0,0 +1,283 @@
+"""Opt-in instrumentation of rb_tree (see rb_tree.enable_stats).
+
+An instrumented tree is the same object with its class swapped for a subclass that
+counts around the plain methods, so rb_tree itself holds no stats code and a tree
+without stats runs exactly the plain methods. The subclass times the public
+operations, measures the depth of each search and insert from the node it ends at,
+counts the rotations after they are done, and replaces the two fixups with copies of
+the ones of rb_tree into which counters are compiled (see _counted), so the fixup
+algorithms are only written once.
+"""
+import ast
+import inspect
+import textwrap
+import time
+
+from rb_tree import rb_tree
+
+
+class tree_stats(object):
+    """tree_stats
+    Counters collected by an instrumented rb_tree.
+
+    Attributes
+    ----------
+    comparisons: int
+        key comparisons made by the descents of searches (find_node) and inserts
+    rotations: int
+        calls of left_rotate and right_rotate
+    recolors: int
+        nodes whose color the fixups changed
+    insert_fixup_iterations / delete_fixup_iterations: int
+        passes through the loops of _rb_insert_fixup / _rb_delete_fixup
+    depth_histogram: dict
+        number of descents (searches and inserts) that visited a given number of nodes,
+        0 for the append fast path of insert
+    operations: dict
+        number of calls of each timed operation (operations built on other ones, like
+        find_successor on find_node, count both)
+    hook: callable
+        called as hook(operation, seconds) after every timed operation, None to skip the
+        timing
+
+    Methods
+    -------
+    height():
+        Returns the number of nodes on the longest root to leaf path, in O(n).
+    black_height():
+        Returns the number of black nodes on any root to leaf path, in O(log n).
+    reset():
+        Sets all counters back to zero.
+    as_dict():
+        Returns the counters, height and black height as a dict.
+    """
+    # public operations which are counted and timed
+    TIMED = ('insert', 'insert_hint', 'delete', 'delete_node', 'find_node',
+             'find_successor', 'rank', 'select', 'insert_many', 'delete_many')
+
+    def __init__(self, tree, hook = None):
+        self.tree = tree
+        self.hook = hook
+        self.reset()
+
+    def reset(self):
+        """Sets all counters back to zero."""
+        self.comparisons = 0
+        self.rotations = 0
+        self.recolors = 0
+        self.insert_fixup_iterations = 0
+        self.delete_fixup_iterations = 0
+        self.depth_histogram = {}
+        self.operations = {}
+        # set by insert until its new node is linked, see _counting._after_link
+        self._descent_pending = False
+
+    def height(self):
+        """Returns the number of nodes on the longest root to leaf path of the tree."""
+        tree = self.tree
+        if tree.root is None:
+            return 0
+        best = 0
+        stack = [(tree.root, 1)]
+        while stack:
+            node, depth = stack.pop()
+            best = max(best, depth)
+            for child in (node.left, node.right):
+                if child is not tree.sentinel:
+                    stack.append((child, depth + 1))
+        return best
+
+    def black_height(self):
+        """Returns the number of black nodes on any path from the root to a leaf."""
+        return self.tree.black_height()
+
+    def as_dict(self):
+        """Returns the counters, the height and the black height as a dict."""
+        return {
+            'comparisons': self.comparisons,
+            'rotations': self.rotations,
+            'recolors': self.recolors,
+            'insert_fixup_iterations': self.insert_fixup_iterations,
+            'delete_fixup_iterations': self.delete_fixup_iterations,
+            'depth_histogram': dict(self.depth_histogram),
+            'operations': dict(self.operations),
+            'height': self.height(),
+            'black_height': self.black_height(),
+        }
+
+    def _record_descent(self, depth, comparisons):
+        """Called after a search or insert descent that visited depth nodes and made the
+        given number of key comparisons."""
+        self.comparisons += comparisons
+        self.depth_histogram[depth] = self.depth_histogram.get(depth, 0) + 1
+
+
+def _timed(name):
+    """Returns a method which counts and (if there is a hook) times the method name of
+    the uninstrumented class."""
+    def method(self, *args):
+        stats = self.stats
+        stats.operations[name] = stats.operations.get(name, 0) + 1
+        base = getattr(super(_instrumented, self), name)
+        if stats.hook is None:
+            return base(*args)
+        start = time.perf_counter()
+        try:
+            return base(*args)
+        finally:
+            stats.hook(name, time.perf_counter() - start)
+    method.__name__ = name
+    return method
+
+
+class _instrumented(object):
+    """Mixin placed in front of an rb_tree class by rb_tree.enable_stats, it only adds
+    the counting and timing wrappers of the TIMED operations."""
+
+
+for _name in tree_stats.TIMED:
+    setattr(_instrumented, _name, _timed(_name))
+del _name
+
+
+def _depth(tree, node):
+    """Returns the number of nodes from the root of the tree down to node, 0 for None."""
+    depth = 0
+    if node is not None:
+        while node is not tree.sentinel:
+            depth += 1
+            node = node.parent
+    return depth
+
+
+class _add_counters(ast.NodeTransformer):
+    """Adds 'self.stats.<iterations> += 1' at the start of every loop pass and
+    'self.stats.recolors += 1' after every assignment to a color."""
+
+    def __init__(self, iterations):
+        self.iterations = iterations
+
+    @staticmethod
+    def increment(counter):
+        return ast.parse('self.stats.{} += 1'.format(counter)).body[0]
+
+    def visit_While(self, node):
+        self.generic_visit(node)
+        node.body.insert(0, self.increment(self.iterations))
+        return node
+
+    def visit_Assign(self, node):
+        if any(isinstance(target, ast.Attribute) and target.attr == 'color'
+               for target in node.targets):
+            return [node, self.increment('recolors')]
+        return node
+
+
+def _counted(function, iterations):
+    """Returns a copy of a fixup function of rb_tree which counts its loop passes into
+    the given counter of the stats and every color it assigns into recolors. The copy
+    is compiled from the source of the function, with its line numbers."""
+    tree = ast.parse(textwrap.dedent(inspect.getsource(function)))
+    ast.increment_lineno(tree, function.__code__.co_firstlineno - 1)
+    tree = ast.fix_missing_locations(_add_counters(iterations).visit(tree))
+    namespace = {}
+    exec(compile(tree, inspect.getsourcefile(function), 'exec'), function.__globals__, namespace)
+    return namespace[function.__name__]
+
+
+class _counting(object):
+    """Mixin placed between _instrumented and the rb_tree class, it counts the work of
+    the plain methods: the descents of searches and inserts, the rotations and, with
+    counted copies of the fixups, their loop passes and recolorings."""
+
+    def find_node(self, data):
+        empty = self.root is None
+        try:
+            node = super(_counting, self).find_node(data)
+        except KeyError:
+            if not empty:
+                # the search ended below the deeper one of the neighbours of data
+                depth = max(_depth(self, self.find_predecessor(data)),
+                            _depth(self, self.upper_bound(data)))
+                self.stats._record_descent(depth, 2 * depth)
+            raise
+        # every node above costs an equality and an order comparison
+        depth = _depth(self, node)
+        self.stats._record_descent(depth, 2 * depth - 1)
+        return node
+
+    def insert(self, data):
+        self.stats._descent_pending = True
+        try:
+            return super(_counting, self).insert(data)
+        finally:
+            self.stats._descent_pending = False
+
+    def bst_insert(self, data):
+        self.stats._descent_pending = True
+        try:
+            return super(_counting, self).bst_insert(data)
+        finally:
+            self.stats._descent_pending = False
+
+    def _after_link(self, node):
+        stats = self.stats
+        if stats._descent_pending:
+            stats._descent_pending = False
+            if node is self.root:
+                stats._record_descent(0, 0)
+            elif node is self.rightmost:
+                # the append fast path only compares with the rightmost node
+                stats._record_descent(0, 1)
+            else:
+                # one comparison for every node above the new one, plus the one with
+                # the rightmost node
+                depth = _depth(self, node.parent)
+                stats._record_descent(depth, depth + 1)
+        super(_counting, self)._after_link(node)
+
+    def left_rotate(self, current_node):
+        super(_counting, self).left_rotate(current_node)
+        if current_node is not None:
+            self.stats.rotations += 1
+
+    def right_rotate(self, current_node):
+        super(_counting, self).right_rotate(current_node)
+        if current_node is not None:
+            self.stats.rotations += 1
+
+    _rb_insert_fixup = _counted(rb_tree._rb_insert_fixup, 'insert_fixup_iterations')
+    _rb_delete_fixup = _counted(rb_tree._rb_delete_fixup, 'delete_fixup_iterations')
+
+# instrumented subclass of each tree class, created on first use
+_classes = {}
+
+
+def instrumented_class(cls):
+    """Returns the instrumented subclass of an rb_tree class."""
+    if cls not in _classes:
+        _classes[cls] = type('instrumented_' + cls.__name__, (_instrumented, _counting, cls), {
+            '_base_class': cls,
+            '__module__': cls.__module__,
+        })
+    return _classes[cls]
+
+
+def enable(tree, hook = None):
+    """Swaps the class of the tree for its instrumented subclass, see
+    rb_tree.enable_stats."""
+    if tree.stats is None:
+        tree.stats = tree_stats(tree, hook)
+        tree.__class__ = instrumented_class(type(tree))
+    elif hook is not None:
+        tree.stats.hook = hook
+    return tree.stats
+
+
+def disable(tree):
+    """Swaps the uninstrumented class back in, see rb_tree.disable_stats."""
+    stats = tree.stats
+    if stats is not None:
+        tree.__class__ = tree._base_class
+        del tree.stats
+    return stats
@@ -0,0 +1,353 @@
+"""Capture and replay of rb_tree workloads.
+
+A trace_recorder wraps a tree and appends every insert, delete, find_node,
+find_successor and iteration to a compact binary trace file. replay runs a trace
+against any tree with the same methods and reports the throughput and the latency
+percentiles of each operation. From the command line:
+
+    python rb_tree_trace.py trace.bin
+    python rb_tree_trace.py trace.bin --tree btree
+    python rb_tree_trace.py trace.bin --tree arena_rb_tree:arena_rb_tree
+
+File layout: the magic b'RBTRACE\\0' and a version (uint16), the snapshot of the data
+the tree held when recording started (a uint64 count and the keys in order), then one
+record per call: an operation byte followed by its argument. Keys are a type byte and
+little endian int64 / float64, length prefixed utf-8 str / bytes, or length prefixed
+pickle for anything else. An iteration stores the number of nodes the caller consumed,
+as uint64, at the position where the iteration was started.
+"""
+import argparse
+import itertools
+import pickle
+import struct
+import sys
+import time
+
+import tree_engines
+
+MAGIC = b'RBTRACE\0'
+VERSION = 2
+
+INSERT, DELETE, FIND_NODE, FIND_SUCCESSOR, ITERATE = b'i', b'd', b'f', b's', b'n'
+# pseudo operation of the first record read_trace returns, with the initial data
+SNAPSHOT = b'S'
+OPERATIONS = {INSERT: 'insert', DELETE: 'delete', FIND_NODE: 'find_node',
+              FIND_SUCCESSOR: 'find_successor', ITERATE: 'iterate'}
+
+_VERSION = struct.Struct('<H')
+_INT = struct.Struct('<q')
+_FLOAT = struct.Struct('<d')
+_LENGTH = struct.Struct('<I')
+_COUNT = struct.Struct('<Q')
+
+
+def _encode(data):
+    """Returns the trace encoding of a key."""
+    kind = type(data)
+    if kind is int and -2 ** 63 <= data < 2 ** 63:
+        return b'q' + _INT.pack(data)
+    if kind is float:
+        return b'd' + _FLOAT.pack(data)
+    if kind is str:
+        data = data.encode('utf-8')
+        return b's' + _LENGTH.pack(len(data)) + data
+    if kind is bytes:
+        return b'b' + _LENGTH.pack(len(data)) + data
+    data = pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+    return b'p' + _LENGTH.pack(len(data)) + data
+
+
+def _decode(buffer, offset):
+    """Returns the key stored at offset and the offset after it."""
+    kind = buffer[offset:offset + 1]
+    offset += 1
+    if kind == b'q':
+        return _INT.unpack_from(buffer, offset)[0], offset + 8
+    if kind == b'd':
+        return _FLOAT.unpack_from(buffer, offset)[0], offset + 8
+    length = _LENGTH.unpack_from(buffer, offset)[0]
+    offset += 4
+    raw = bytes(buffer[offset:offset + length])
+    if kind == b's':
+        return raw.decode('utf-8'), offset + length
+    if kind == b'b':
+        return raw, offset + length
+    if kind == b'p':
+        return pickle.loads(raw), offset + length
+    raise ValueError('Error, corrupt trace')
+
+
+class trace_recorder(object):
+    """trace_recorder
+    Wraps a tree and records the calls of its main operations to a trace file, in the
+    order they were made, after a snapshot of the data the tree already holds. Records
+    are buffered in memory and written in blocks of BUFFER_SIZE bytes. Calls that raise
+    (e.g. KeyError for missing data) are recorded too, so the replay sees the same
+    misses. An iteration is recorded when it is started, its node count is filled in
+    once it is exhausted or dropped, or at the latest by close().
+
+    Attributes
+    ----------
+    tree: rb_tree
+        the wrapped tree, calls made on it directly are not recorded
+
+    Methods
+    -------
+    insert(data) / delete(data) / find_node(data) / find_successor(data):
+        Recorded calls of the tree's methods.
+    __iter__() / inorder():
+        Recorded iteration, the trace stores how many nodes were consumed.
+    __patch(iteration):
+        Helper function which fills in the node count of a recorded iteration.
+    flush():
+        Writes the buffered records to the file.
+    close():
+        Flushes and closes the file, also done when leaving a with block.
+    """
+
+    # number of buffered bytes after which the records are written to the file
+    BUFFER_SIZE = 1 << 16
+
+    def __init__(self, tree, path):
+        """Wraps a tree and starts a new trace file with a snapshot of its data.
+
+        Parameters
+        ----------
+        tree: rb_tree
+            tree to forward the calls to
+        path: str
+            trace file to write, replaced if it exists"""
+        self.tree = tree
+        self._file = open(path, 'wb')
+        self._buffer = bytearray(MAGIC + _VERSION.pack(VERSION))
+        self._buffer += _COUNT.pack(len(tree))
+        for node in tree.inorder():
+            self._buffer += _encode(node.data)
+        # bytes already written to the file, and [offset, count] of the iterations
+        # that are still running
+        self._written = 0
+        self._iterations = []
+
+    def __record(self, op, data):
+        """Helper function which buffers one record, flushing full buffers."""
+        buffer = self._buffer
+        buffer += op
+        buffer += _encode(data)
+        if len(buffer) >= self.BUFFER_SIZE:
+            self.flush()
+
+    def insert(self, data):
+        self.__record(INSERT, data)
+        return self.tree.insert(data)
+
+    def delete(self, data):
+        self.__record(DELETE, data)
+        return self.tree.delete(data)
+
+    def find_node(self, data):
+        self.__record(FIND_NODE, data)
+        return self.tree.find_node(data)
+
+    def find_successor(self, data):
+        self.__record(FIND_SUCCESSOR, data)
+        return self.tree.find_successor(data)
+
+    def __iter__(self):
+        return self.inorder()
+
+    def inorder(self):
+        """Records an iteration right away and returns an in order iterator over the tree,
+        which fills in the number of nodes consumed once it is exhausted or dropped."""
+        iteration = [self._written + len(self._buffer) + len(ITERATE), 0]
+        self._buffer += ITERATE + _COUNT.pack(0)
+        self._iterations.append(iteration)
+        return self.__iterate(iteration)
+
+    def __iterate(self, iteration):
+        """Helper function which iterates over the tree and counts the nodes consumed."""
+        try:
+            for node in self.tree.inorder():
+                iteration[1] += 1
+                yield node
+        finally:
+            if not self._file.closed:
+                self._iterations.remove(iteration)
+                self.__patch(iteration)
+
+    def __patch(self, iteration):
+        """Helper function which writes the node count of an iteration into its record,
+        in the buffer or, if that part was flushed already, in the file."""
+        offset, count = iteration
+        if offset >= self._written:
+            _COUNT.pack_into(self._buffer, offset - self._written, count)
+        else:
+            # the record was flushed already, overwrite its count in the file
+            self._file.seek(offset)
+            self._file.write(_COUNT.pack(count))
+            self._file.seek(0, 2)
+
+    def __len__(self):
+        return len(self.tree)
+
+    def flush(self):
+        """Writes the buffered records to the trace file."""
+        self._file.write(self._buffer)
+        self._written += len(self._buffer)
+        self._buffer = bytearray()
+        self._file.flush()
+
+    def close(self):
+        """Fills in the counts of the iterations still running, flushes the buffered
+        records and closes the trace file."""
+        if not self._file.closed:
+            for iteration in self._iterations:
+                self.__patch(iteration)
+            self._iterations = []
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_trace(path):
+    """Returns the records of a trace file as a list of (operation byte, argument)
+    pairs, the argument of an iteration is its node count. The first record is
+    (SNAPSHOT, list of the data the tree held when recording started).
+
+    Parameters
+    ----------
+    path: str
+        trace file written by a trace_recorder
+
+    Raises
+    ------
+    ValueError
+        if the file is not a trace of a supported version"""
+    with open(path, 'rb') as f:
+        buffer = f.read()
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError('Error, not an rb_tree trace')
+    version = _VERSION.unpack_from(buffer, len(MAGIC))[0]
+    if version != VERSION:
+        raise ValueError('Error, unsupported trace version {}'.format(version))
+    offset = len(MAGIC) + _VERSION.size
+    n = _COUNT.unpack_from(buffer, offset)[0]
+    offset += _COUNT.size
+    snapshot = []
+    for _ in range(n):
+        data, offset = _decode(buffer, offset)
+        snapshot.append(data)
+    records = [(SNAPSHOT, snapshot)]
+    while offset < len(buffer):
+        op = buffer[offset:offset + 1]
+        offset += 1
+        if op == ITERATE:
+            argument = _COUNT.unpack_from(buffer, offset)[0]
+            offset += _COUNT.size
+        elif op in OPERATIONS:
+            argument, offset = _decode(buffer, offset)
+        else:
+            raise ValueError('Error, corrupt trace')
+        records.append((op, argument))
+    return records
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def replay(records, tree):
+    """Re-executes a trace against a tree and returns its throughput and, per operation,
+    the number of calls, misses (calls that raised KeyError) and latency percentiles in
+    seconds. The data of a snapshot record is inserted first, untimed and not counted
+    as operations, so the tree should start out empty.
+
+    Parameters
+    ----------
+    records: str or list
+        trace file, or records returned by read_trace (reading the file is not timed)
+    tree: object
+        tree to run the trace on, e.g. an rb_tree, arena_rb_tree or persistent_rb_tree
+
+    Returns
+    -------
+    dict
+        'operations', 'seconds' and 'ops_per_sec' of the whole replay, and under
+        'latency' for each operation its 'count', 'misses', 'p50', 'p90', 'p99' and
+        'max'"""
+    if isinstance(records, str):
+        records = read_trace(records)
+    methods = {op: getattr(tree, name) for op, name in OPERATIONS.items() if op != ITERATE}
+    timings = {op: [] for op in OPERATIONS}
+    misses = dict.fromkeys(OPERATIONS, 0)
+    clock = time.perf_counter
+    islice = itertools.islice
+
+    if records and records[0][0] == SNAPSHOT:
+        snapshot, records = records[0][1], records[1:]
+        if hasattr(tree, 'insert_many'):
+            tree.insert_many(snapshot)
+        else:
+            for data in snapshot:
+                tree.insert(data)
+
+    total = clock()
+    for op, argument in records:
+        start = clock()
+        if op == ITERATE:
+            for _ in islice(iter(tree), argument):
+                pass
+        else:
+            try:
+                methods[op](argument)
+            except KeyError:
+                misses[op] += 1
+        timings[op].append(clock() - start)
+    total = clock() - total
+
+    latency = {}
+    for op, samples in timings.items():
+        if samples:
+            samples.sort()
+            latency[OPERATIONS[op]] = {
+                'count': len(samples),
+                'misses': misses[op],
+                'p50': _percentile(samples, 0.5),
+                'p90': _percentile(samples, 0.9),
+                'p99': _percentile(samples, 0.99),
+                'max': samples[-1],
+            }
+    return {
+        'operations': len(records),
+        'seconds': total,
+        'ops_per_sec': len(records) / total if total else float('inf'),
+        'latency': latency,
+    }
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Replay an rb_tree trace.')
+    parser.add_argument('trace', help = 'trace file written by a trace_recorder')
+    parser.add_argument('--tree', default = 'rb',
+                        help = 'tree to replay against, an engine name of tree_engines '
+                               '(rb, arena, btree) or a class as module:class')
+    args = parser.parse_args(argv)
+
+    cls = tree_engines.engine_class(args.tree)
+    records = read_trace(args.trace)
+    result = replay(records, cls())
+    print('{} operations in {:.3f} s, {:,.0f} ops/s'.format(
+        result['operations'], result['seconds'], result['ops_per_sec']))
+    for name, stats in result['latency'].items():
+        print('{:<15} {:>9} calls {:>7} misses  p50 {:.2e}  p90 {:.2e}  p99 {:.2e}  '
+              'max {:.2e} s'.format(name, stats['count'], stats['misses'], stats['p50'],
+                                     stats['p90'], stats['p99'], stats['max']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
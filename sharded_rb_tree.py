@@ -0,0 +1,461 @@
+import bisect
+import multiprocessing
+import os
+
+import tree_engines
+
+
+# The operations a shard worker runs on its tree. They take and return plain data, as
+# nodes cannot leave the worker process.
+
+def _insert_many(tree, items):
+    tree.insert_many(items)
+
+
+def _delete(tree, data):
+    tree.delete(data)
+
+
+def _contains_many(tree, keys):
+    found = []
+    find_node = tree.find_node
+    for data in keys:
+        try:
+            find_node(data)
+            found.append(True)
+        except KeyError:
+            found.append(False)
+    return found
+
+
+def _successor(tree, data):
+    node = tree.find_successor(data)
+    return node.data if node is not None else None
+
+
+def _first(tree):
+    for node in tree.inorder():
+        return node.data
+    return None
+
+
+def _range(tree, lo, hi, inclusive):
+    return [node.data for node in tree.irange(lo, hi, inclusive)]
+
+
+def _count_ranges(tree, ranges):
+    counts = []
+    for lo, hi in ranges:
+        if hasattr(tree, 'count_range'):
+            counts.append(tree.count_range(lo, hi))
+        else:
+            counts.append(sum(1 for _ in tree.irange(lo, hi)))
+    return counts
+
+
+def _aggregate(tree, lo, hi, inclusive, function):
+    return function(node.data for node in tree.irange(lo, hi, inclusive))
+
+
+_OPERATIONS = {
+    'insert_many': _insert_many,
+    'delete': _delete,
+    'contains_many': _contains_many,
+    'successor': _successor,
+    'first': _first,
+    'range': _range,
+    'count_ranges': _count_ranges,
+    'aggregate': _aggregate,
+    'len': len,
+}
+
+
+def _serve(connection, engine, items, options):
+    """Main loop of a shard worker: builds the shard's tree from its sorted items, then
+    runs the requests (operation name, arguments) it receives and sends back
+    (True, result), or (False, exception) to be raised in the caller."""
+    cls = tree_engines.engine_class(engine)
+    tree = cls.from_sorted(items, **options)
+    del items
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        operation, args = request
+        try:
+            connection.send((True, _OPERATIONS[operation](tree, *args)))
+        except Exception as error:
+            connection.send((False, error))
+    connection.close()
+
+
+class sharded_rb_tree(object):
+    """sharded_rb_tree
+    Tree partitioned by key range into shards, each an rb_tree (or another engine of
+    tree_engines) owned by its own worker process, so the shards work on different
+    cores instead of taking turns under one GIL. Shard i holds the data from
+    boundaries[i - 1] (inclusive) up to boundaries[i] (exclusive).
+
+    A single operation is sent to the one shard owning its data. A batch is split by
+    shard in the caller, every shard gets its part in one message and all of them work
+    on it at the same time, then the results are put back into the order of the batch
+    (lookups) or of the keys (range scans, which concatenate the shards in order).
+    Every request and result crosses a pipe and is pickled, so single operations are
+    much slower than on a local tree and the throughput comes from large batches.
+
+    The data must be picklable, and so must the function of aggregate. Call close()
+    (or use a with block) to stop the workers.
+
+    Attributes
+    ----------
+    boundaries: list
+        the first data of every shard but the first, in ascending order
+    engine: str
+        engine of the shards, see tree_engines.ENGINES
+
+    Methods
+    -------
+    from_iterable(iterable, shards, engine):
+        Class method which splits the data into shards of equal size and builds them.
+    insert(data) / delete(data) / __contains__(data) / find_successor(data):
+        Single operations, routed to the owning shard.
+    insert_many(iterable) / contains_many(keys):
+        Batches, run by all shards in parallel.
+    irange(lo, hi, inclusive):
+        Iterates over the data between lo and hi, scanned by all shards in parallel.
+    count_range(lo, hi) / count_ranges(ranges):
+        Number of data between lo and hi (both inclusive), for one or a batch of ranges.
+    aggregate(lo, hi, function, combine, inclusive):
+        Applies function to the data of every shard between lo and hi in parallel and
+        combines the results in order.
+    __len__() / __iter__() / shard_sizes():
+        Number of data, ascending iteration and the number of data per shard.
+    close():
+        Stops the workers, also done when leaving a with block.
+    """
+
+    def __init__(self, boundaries = (), engine = 'rb', items = None, **options):
+        """Starts one worker per shard.
+
+        Parameters
+        ----------
+        boundaries: iterable of int
+            first data of every shard but the first, len(boundaries) + 1 shards
+        engine: str
+            engine of the shards, a name of tree_engines.ENGINES or module:class
+        items: iterable of int
+            initial data in ascending order, None for empty shards
+        options:
+            passed on to from_sorted of the engine, e.g. fanout for 'btree'"""
+        self.boundaries = list(boundaries)
+        for i in range(1, len(self.boundaries)):
+            if not self.boundaries[i - 1] < self.boundaries[i]:
+                raise ValueError('Error, boundaries must be strictly ascending')
+        self.engine = engine
+        # the class is only resolved here to fail early on an unknown engine
+        tree_engines.engine_class(engine)
+
+        parts = [[] for _ in range(len(self.boundaries) + 1)]
+        if items is not None:
+            items = list(items)
+            for i in range(1, len(items)):
+                if items[i] < items[i - 1]:
+                    raise ValueError('Error, data is not sorted')
+            # every shard gets one slice of the sorted items
+            start = 0
+            for i, boundary in enumerate(self.boundaries):
+                end = bisect.bisect_left(items, boundary, start)
+                parts[i] = items[start:end]
+                start = end
+            parts[-1] = items[start:]
+
+        self._connections = []
+        self._workers = []
+        for part in parts:
+            connection, child = multiprocessing.Pipe()
+            worker = multiprocessing.Process(target = _serve, args = (child, engine, part, options),
+                                             daemon = True)
+            worker.start()
+            child.close()
+            self._connections.append(connection)
+            self._workers.append(worker)
+        self._len = len(items) if items is not None else 0
+
+    @classmethod
+    def from_iterable(cls, iterable, shards = None, engine = 'rb', **options):
+        """Sorts the data and builds a tree whose shards hold about the same number of
+        data, with the boundaries at the quantiles of the data.
+
+        Parameters
+        ----------
+        iterable: iterable of int
+            initial data, in any order
+        shards: int
+            number of shards, the number of CPUs by default
+        engine: str
+            engine of the shards, see __init__"""
+        items = sorted(iterable)
+        if shards is None:
+            shards = os.cpu_count() or 1
+        boundaries = []
+        for i in range(1, shards):
+            boundary = items[len(items) * i // shards] if items else None
+            # equal data must stay in one shard, skip quantiles that repeat
+            if boundary is not None and (not boundaries or boundaries[-1] < boundary) \
+                    and items[0] < boundary:
+                boundaries.append(boundary)
+        return cls(boundaries, engine, items, **options)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Stops the workers and waits for them to exit."""
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+            connection.close()
+        for worker in self._workers:
+            worker.join()
+        self._connections = []
+        self._workers = []
+
+    def __shard(self, data):
+        """Helper function which returns the index of the shard owning data."""
+        return bisect.bisect_right(self.boundaries, data)
+
+    def __scatter(self, requests):
+        """Helper function which sends every shard its request, a dict of shard index to
+        (operation name, arguments), before waiting for any of them, so the shards run
+        in parallel. Returns a dict of shard index to result.
+
+        Raises
+        ------
+        Exception
+            the first exception raised by a shard, after all shards replied"""
+        for i, request in requests.items():
+            self._connections[i].send(request)
+        results = {}
+        error = None
+        for i in requests:
+            ok, result = self._connections[i].recv()
+            if ok:
+                results[i] = result
+            elif error is None:
+                error = result
+        if error is not None:
+            raise error
+        return results
+
+    def __call(self, i, operation, *args):
+        """Helper function which runs one request on shard i and returns its result."""
+        return self.__scatter({i: (operation, args)})[i]
+
+    def __group(self, keys):
+        """Helper function which splits keys by shard. Returns a dict of shard index to
+        (positions in keys, keys of that shard)."""
+        groups = {}
+        boundaries = self.boundaries
+        bisect_right = bisect.bisect_right
+        for position, data in enumerate(keys):
+            i = bisect_right(boundaries, data)
+            group = groups.get(i)
+            if group is None:
+                group = groups[i] = ([], [])
+            group[0].append(position)
+            group[1].append(data)
+        return groups
+
+    def __shards_between(self, lo, hi):
+        """Helper function which returns the range of the shards that may hold data
+        between lo and hi, None for no bound."""
+        first = self.__shard(lo) if lo is not None else 0
+        last = self.__shard(hi) if hi is not None else len(self.boundaries)
+        return range(first, last + 1)
+
+    def __len__(self):
+        return self._len
+
+    def shard_sizes(self):
+        """Returns the number of data of every shard, in order."""
+        results = self.__scatter({i: ('len', ()) for i in range(len(self._connections))})
+        return [results[i] for i in range(len(self._connections))]
+
+    def insert(self, data):
+        """Inserts data into the shard owning it.
+
+        Parameters
+        ----------
+        data: int
+            data to insert"""
+        self.__call(self.__shard(data), 'insert_many', [data])
+        self._len += 1
+
+    def insert_many(self, iterable):
+        """Inserts a batch of data, every shard inserts its part in parallel.
+
+        Parameters
+        ----------
+        iterable: iterable of int
+            data to insert"""
+        groups = self.__group(list(iterable))
+        self.__scatter({i: ('insert_many', (keys,)) for i, (_, keys) in groups.items()})
+        self._len += sum(len(keys) for _, keys in groups.values())
+
+    def delete(self, data):
+        """Deletes one occurrence of data from the shard owning it.
+
+        Parameters
+        ----------
+        data: int
+            data to delete
+
+        Raises
+        ------
+        KeyError
+            if data isn't in the tree"""
+        self.__call(self.__shard(data), 'delete', data)
+        self._len -= 1
+
+    def __contains__(self, data):
+        return self.__call(self.__shard(data), 'contains_many', [data])[0]
+
+    def contains_many(self, keys):
+        """Looks up a batch of data, every shard searches its part in parallel.
+
+        Parameters
+        ----------
+        keys: iterable of int
+            data to look up
+
+        Returns
+        -------
+        list of bool
+            whether each of the keys is in the tree, in the order of keys"""
+        keys = list(keys)
+        groups = self.__group(keys)
+        results = self.__scatter({i: ('contains_many', (group,)) for i, (_, group) in groups.items()})
+        found = [False] * len(keys)
+        for i, (positions, _) in groups.items():
+            for position, result in zip(positions, results[i]):
+                found[position] = result
+        return found
+
+    def find_successor(self, data):
+        """Returns the data following (one occurrence of) data in order, None if it is
+        the largest data. Asks the next shards for their smallest data if data is the
+        largest of its shard.
+
+        Parameters
+        ----------
+        data: int
+            data to find the successor of
+
+        Raises
+        ------
+        KeyError
+            If data is not in the tree"""
+        i = self.__shard(data)
+        successor = self.__call(i, 'successor', data)
+        while successor is None and i < len(self.boundaries):
+            i += 1
+            successor = self.__call(i, 'first')
+        return successor
+
+    def irange(self, lo = None, hi = None, inclusive = (True, True)):
+        """Iterates over the data between lo and hi in ascending order. All shards that
+        overlap the range scan their part at the same time, the parts are then yielded
+        shard by shard.
+
+        Parameters
+        ----------
+        lo: int
+            lower bound of the range, None for no lower bound
+        hi: int
+            upper bound of the range, None for no upper bound
+        inclusive: (bool, bool)
+            whether lo and hi themselves are part of the range"""
+        shards = self.__shards_between(lo, hi)
+        results = self.__scatter({i: ('range', (lo, hi, inclusive)) for i in shards})
+        for i in shards:
+            for data in results[i]:
+                yield data
+
+    def __iter__(self):
+        return self.irange()
+
+    def count_range(self, lo, hi):
+        """Returns the number of data between lo and hi (both inclusive).
+
+        Parameters
+        ----------
+        lo: int
+            lower bound of the range
+        hi: int
+            upper bound of the range"""
+        return self.count_ranges([(lo, hi)])[0]
+
+    def count_ranges(self, ranges):
+        """Counts the data in a batch of ranges, every shard counts its parts of all
+        ranges in parallel.
+
+        Parameters
+        ----------
+        ranges: iterable of (int, int)
+            (lo, hi) bounds, both inclusive
+
+        Returns
+        -------
+        list of int
+            the count of each range, in the order of ranges"""
+        ranges = list(ranges)
+        # every shard counts the ranges it overlaps, clipped to itself by its own tree
+        parts = {}
+        for position, (lo, hi) in enumerate(ranges):
+            if hi < lo:
+                continue
+            for i in self.__shards_between(lo, hi):
+                part = parts.get(i)
+                if part is None:
+                    part = parts[i] = ([], [])
+                part[0].append(position)
+                part[1].append((lo, hi))
+        results = self.__scatter({i: ('count_ranges', (part,)) for i, (_, part) in parts.items()})
+        counts = [0] * len(ranges)
+        for i, (positions, _) in parts.items():
+            for position, count in zip(positions, results[i]):
+                counts[position] += count
+        return counts
+
+    def aggregate(self, lo, hi, function, combine, inclusive = (True, True)):
+        """Applies function to an iterator over the data of every shard between lo and
+        hi, all shards at the same time, and combines the results in ascending order,
+        e.g. function = sum and combine = operator.add for the sum of the range.
+
+        Parameters
+        ----------
+        lo: int
+            lower bound of the range, None for no lower bound
+        hi: int
+            upper bound of the range, None for no upper bound
+        function: callable
+            picklable function (e.g. a builtin or a module level function) reducing an
+            iterator of data
+        combine: callable
+            function combining two results
+        inclusive: (bool, bool)
+            whether lo and hi themselves are part of the range"""
+        shards = self.__shards_between(lo, hi)
+        if not shards:
+            # hi < lo, no shard has data in the range
+            return function(iter(()))
+        results = self.__scatter({i: ('aggregate', (lo, hi, inclusive, function)) for i in shards})
+        result = results[shards[0]]
+        for i in shards[1:]:
+            result = combine(result, results[i])
+        return result
@@ -0,0 +1,84 @@
+"""Invariant checks shared by the tests."""
+
+
+def check_rb_tree(tree):
+    """Asserts the red black properties, the parent links, the subtree sizes and the
+    cached leftmost / rightmost nodes of an rb_tree. Returns the data in order. Nodes
+    are compared with == so the node views of arena_rb_tree can be checked too."""
+    sentinel = tree.sentinel
+    cached_ends = hasattr(tree, 'leftmost')
+    if tree.root is None:
+        assert not cached_ends or (tree.leftmost is None and tree.rightmost is None)
+        return []
+    assert tree.root.color == 'black'
+    assert tree.root.parent == sentinel
+    assert sentinel.color == 'black' and sentinel.size == 0
+
+    def walk(node):
+        # returns the black height and the size of the subtree at node
+        if node == sentinel:
+            return 0, 0
+        for child in (node.left, node.right):
+            if child != sentinel:
+                assert child.parent == node
+                if node.color == 'red':
+                    assert child.color == 'black'
+        left_height, left_size = walk(node.left)
+        right_height, right_size = walk(node.right)
+        assert left_height == right_height
+        assert node.size == left_size + right_size + 1
+        return left_height + (node.color == 'black'), node.size
+
+    walk(tree.root)
+    data = [node.data for node in tree]
+    assert data == sorted(data)
+    assert len(tree) == len(data)
+    if cached_ends:
+        assert tree.leftmost.data == data[0] and tree.leftmost.left == sentinel
+        assert tree.rightmost.data == data[-1] and tree.rightmost.right == sentinel
+    return data
+
+
+def check_persistent_tree(root):
+    """Asserts the red black properties and the sizes of a persistent subtree (None
+    children, no parent links). Returns the data in order."""
+    if root is None:
+        return []
+    assert root.color == 'black'
+    data = []
+
+    def walk(node):
+        if node is None:
+            return 0, 0
+        if node.color == 'red':
+            assert node.left is None or node.left.color == 'black'
+            assert node.right is None or node.right.color == 'black'
+        left_height, left_size = walk(node.left)
+        data.append(node.data)
+        right_height, right_size = walk(node.right)
+        assert left_height == right_height
+        assert node.size == left_size + right_size + 1
+        return left_height + (node.color == 'black'), node.size
+
+    walk(root)
+    assert data == sorted(data)
+    return data
+
+
+def check_aggregates(tree):
+    """Asserts that every node of an augmented_rb_tree holds its value and the aggregate
+    of its subtree, recomputed from scratch. Returns the data in order."""
+    sentinel = tree.sentinel
+
+    def walk(node):
+        if node is sentinel:
+            return tree.identity
+        left = walk(node.left)
+        right = walk(node.right)
+        assert node.value == tree.value(node.data)
+        expected = tree.combine(tree.combine(left, node.value), right)
+        assert node.aggregate == expected
+        return expected
+
+    walk(tree.root or sentinel)
+    return check_rb_tree(tree)
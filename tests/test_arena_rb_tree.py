@@ -0,0 +1,46 @@
+import bisect
+import random
+
+import pytest
+
+from arena_rb_tree import arena_rb_tree
+from rb_checks import check_rb_tree
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_insert_delete_keeps_invariants(seed):
+    rng = random.Random(seed)
+    tree = arena_rb_tree()
+    data = []
+    for step in range(3000):
+        x = rng.randrange(200)
+        if rng.random() < 0.6:
+            tree.insert(x)
+            bisect.insort(data, x)
+        elif x in data:
+            tree.delete(x)
+            data.remove(x)
+        else:
+            with pytest.raises(KeyError):
+                tree.delete(x)
+        if step % 100 == 0:
+            assert check_rb_tree(tree) == data
+    assert check_rb_tree(tree) == data
+    for k, x in enumerate(data):
+        assert tree.select(k).data == x
+    while data:
+        x = data.pop(rng.randrange(len(data)))
+        tree.delete(x)
+    assert check_rb_tree(tree) == []
+    assert tree.root is None
+
+
+def test_freed_slots_are_reused():
+    tree = arena_rb_tree.from_sorted(range(100))
+    for x in range(0, 100, 2):
+        tree.delete(x)
+    slots = len(tree._key)
+    for x in range(0, 100, 2):
+        tree.insert(x)
+    assert len(tree._key) == slots
+    assert check_rb_tree(tree) == list(range(100))
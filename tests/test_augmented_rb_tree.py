@@ -0,0 +1,134 @@
+import bisect
+import random
+
+import pytest
+
+from augmented_rb_tree import augmented_rb_tree
+from interval_rb_tree import interval_rb_tree
+from rb_checks import check_aggregates
+
+
+def random_tree(rng, n, key_range):
+    tree = augmented_rb_tree(combine = max, identity = -1)
+    for _ in range(n):
+        tree.insert(rng.randrange(key_range))
+    return tree
+
+
+def test_aggregate_after_inserts_and_deletes():
+    rng = random.Random(0)
+    tree = augmented_rb_tree()
+    data = []
+    for _ in range(2000):
+        x = rng.randrange(300)
+        if rng.random() < 0.6 or x not in data:
+            tree.insert(x)
+            bisect.insort(data, x)
+        else:
+            tree.delete(x)
+            data.remove(x)
+    assert check_aggregates(tree) == data
+    for lo, hi in ((0, 299), (10, 20), (150, 100), (None, 50), (250, None)):
+        expected = sum(x for x in data if (lo is None or lo <= x) and (hi is None or x <= hi))
+        assert tree.aggregate(lo, hi) == expected
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_join_and_split_keep_aggregates(seed):
+    rng = random.Random(seed)
+    left = random_tree(rng, rng.randrange(100), 100)
+    right = augmented_rb_tree.from_sorted(sorted(rng.randrange(200, 300) for _ in range(50)),
+                                          combine = max, identity = -1)
+    tree = augmented_rb_tree.join(left, 150, right)
+    data = check_aggregates(tree)
+    assert tree.aggregate() == max(data)
+    at = rng.randrange(300)
+    lower, upper = tree.split(at)
+    assert check_aggregates(lower) == [x for x in data if x < at]
+    assert check_aggregates(upper) == [x for x in data if x >= at]
+    assert upper.aggregate() == max([x for x in data if x >= at], default = -1)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_set_operations_keep_aggregates(seed):
+    rng = random.Random(seed)
+    a = set(rng.sample(range(500), rng.randrange(1, 200)))
+    b = set(rng.sample(range(500), rng.randrange(1, 200)))
+    for operation, expected in (('union', a | b), ('intersection', a & b),
+                                ('difference', a - b)):
+        tree = augmented_rb_tree.from_iterable(a)
+        getattr(tree, operation)(augmented_rb_tree.from_iterable(b))
+        assert check_aggregates(tree) == sorted(expected)
+        assert tree.aggregate(100, 400) == sum(x for x in expected if 100 <= x <= 400)
+
+
+def test_large_batches_keep_aggregates():
+    tree = augmented_rb_tree.from_sorted(range(0, 100, 2))
+    node = tree.find_node(40)
+    tree.insert_many(range(1, 100, 2))
+    assert check_aggregates(tree) == list(range(100))
+    tree.delete_many(range(0, 100, 3))
+    assert check_aggregates(tree) == [x for x in range(100) if x % 3]
+    assert tree.find_node(40) is node
+    assert tree.aggregate(10, 20) == sum(x for x in range(10, 21) if x % 3)
+
+
+def test_stats_on_augmented_tree():
+    tree = augmented_rb_tree()
+    stats = tree.enable_stats()
+    keys = random.Random(1).sample(range(1000), 300)
+    for x in keys:
+        tree.insert(x)
+    hint = None
+    for x in range(1000, 1010):
+        hint = tree.insert_hint(x, hint)
+    for x in keys[::3]:
+        tree.delete(x)
+    assert stats.operations['insert'] >= 300
+    data = check_aggregates(tree)
+    assert tree.aggregate(100, 900) == sum(x for x in data if 100 <= x <= 900)
+    lower, upper = tree.split(500)
+    check_aggregates(lower)
+    check_aggregates(upper)
+
+
+def test_stats_on_interval_tree():
+    rng = random.Random(2)
+    tree = interval_rb_tree()
+    tree.enable_stats()
+    intervals = []
+    for _ in range(300):
+        start = rng.randrange(1000)
+        interval = (start, start + rng.randrange(50))
+        tree.insert(interval)
+        intervals.append(interval)
+    for interval in intervals[::4]:
+        tree.remove(*interval)
+    del intervals[::4]
+    check_aggregates(tree)
+    for lo in range(0, 1000, 37):
+        expected = sorted(i for i in intervals if i[0] <= lo + 10 and lo <= i[1])
+        assert [node.data for node in tree.overlapping(lo, lo + 10)] == expected
+    assert tree.stats.operations['insert'] == 300
+
+
+def test_inverted_intervals_are_rejected_everywhere():
+    intervals = [(x, x + 5) for x in range(0, 100, 10)]
+    tree = interval_rb_tree.from_sorted(intervals)
+    node = tree.find_node((10, 15))
+    for insert in (tree.insert, tree.bst_insert, lambda data: tree.insert_hint(data, node),
+                   lambda data: tree.insert_many([data]),
+                   lambda data: tree.insert_many([(1, 2)] * 10 + [data])):
+        with pytest.raises(ValueError):
+            insert((12, 11))
+    with pytest.raises(ValueError):
+        interval_rb_tree.join(interval_rb_tree(), (30, 25), interval_rb_tree())
+    assert check_aggregates(tree) == intervals
+
+
+def test_overlapping_fails_after_modification_before_first_step():
+    tree = interval_rb_tree.from_sorted([(x, x + 5) for x in range(0, 100, 10)])
+    iterator = tree.overlapping(12, 40)
+    tree.insert((50, 51))
+    with pytest.raises(RuntimeError):
+        next(iterator)
@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+
+import benchmark
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_cli_at_a_tiny_size(tmp_path):
+    output = str(tmp_path / 'results.json')
+    subprocess.run([sys.executable, 'benchmark.py', '--sizes', '200', '--repeat', '1',
+                    '--output', output], cwd = ROOT, check = True, capture_output = True)
+    with open(output) as f:
+        report = json.load(f)
+    records = report['results']
+    assert {record['implementation'] for record in records} == set(benchmark.IMPLEMENTATIONS)
+    assert {record['distribution'] for record in records} == set(benchmark.DISTRIBUTIONS)
+    for record in records:
+        assert record['n'] == 200 and record['seconds'] >= 0
+        if record['operation'] == 'build':
+            assert record['peak_memory'] > 0
+    # the run is its own baseline, so nothing can be slower by the whole threshold
+    assert benchmark.main(['--sizes', '200', '--repeat', '1', '--no-memory', '--output',
+                           str(tmp_path / 'again.json'), '--baseline', output,
+                           '--threshold', '1.0']) == 0
+
+
+def test_compare_reports_regressions():
+    old = [{'implementation': 'rb_tree', 'operation': 'build', 'distribution': 'random',
+            'n': 10, 'ops_per_sec': 100.0}]
+    new = [dict(old[0], ops_per_sec = 70.0)]
+    assert benchmark.compare(new, old, 0.2) == [(new[0], 100.0)]
+    assert benchmark.compare(new, old, 0.5) == []
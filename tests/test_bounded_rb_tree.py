@@ -0,0 +1,90 @@
+import heapq
+import random
+
+import pytest
+
+from bounded_rb_tree import bounded_rb_tree
+from rb_checks import check_rb_tree
+
+
+@pytest.mark.parametrize('keep', ['largest', 'smallest'])
+def test_insert_keeps_the_best_data(keep):
+    rng = random.Random(5)
+    evicted = []
+    tree = bounded_rb_tree(capacity = 20, keep = keep, on_evict = evicted.append)
+    best = heapq.nlargest if keep == 'largest' else heapq.nsmallest
+    offered = []
+    for _ in range(500):
+        x = rng.randrange(1000)
+        offered.append(x)
+        tree.insert(x)
+        assert len(tree) == min(len(offered), 20)
+    assert [node.data for node in tree] == sorted(best(20, offered))
+    check_rb_tree(tree)
+    # every evicted data was the worst one of a full tree at the time
+    for data in evicted:
+        if keep == 'largest':
+            assert data <= tree.leftmost.data
+        else:
+            assert data >= tree.rightmost.data
+    stats = tree.eviction_stats()
+    assert stats['offered'] == 500
+    assert stats['evicted'] == len(evicted)
+    assert stats['accepted'] == 20 + len(evicted)
+    assert stats['threshold'] == (tree.leftmost if keep == 'largest' else tree.rightmost).data
+
+
+def test_eviction_order_and_rejection():
+    evicted = []
+    tree = bounded_rb_tree(capacity = 3, on_evict = evicted.append)
+    for x in (5, 1, 4, 2, 8, 0, 9):
+        tree.insert(x)
+    assert evicted == [1, 2, 4]
+    assert tree.insert(3) is None
+    assert [node.data for node in tree] == [5, 8, 9]
+
+    evicted = []
+    tree = bounded_rb_tree(capacity = 3, keep = 'smallest', on_evict = evicted.append)
+    for x in (5, 1, 4, 2, 8, 0, 9):
+        tree.insert(x)
+    assert evicted == [5, 4]
+    assert tree.insert(3) is None
+    assert [node.data for node in tree] == [0, 1, 2]
+
+
+@pytest.mark.parametrize('keep', ['largest', 'smallest'])
+def test_insert_many_and_from_iterable(keep):
+    rng = random.Random(6)
+    data = [rng.randrange(1000) for _ in range(300)]
+    best = heapq.nlargest if keep == 'largest' else heapq.nsmallest
+    tree = bounded_rb_tree(capacity = 25, keep = keep)
+    tree.insert_many(data[:10])
+    tree.insert_many(data[10:])
+    assert [node.data for node in tree] == sorted(best(25, data))
+    assert tree.offered == 300
+
+    built = bounded_rb_tree.from_iterable(data, capacity = 25, keep = keep)
+    assert [node.data for node in built] == sorted(best(25, data))
+    assert (built.capacity, built.keep, built.offered, built.rejected) == (25, keep, 300, 275)
+    check_rb_tree(built)
+    built.insert(-1 if keep == 'smallest' else 1000)
+    assert len(built) == 25
+    with pytest.raises(ValueError):
+        bounded_rb_tree.from_sorted([3, 2, 1, 4], capacity = 2)
+
+
+def test_split_and_join_keep_the_bound():
+    evicted = []
+    tree = bounded_rb_tree.from_sorted(range(100), capacity = 100, on_evict = evicted.append)
+    left, right = tree.split(50)
+    for part in (left, right):
+        assert (part.capacity, part.keep, part.on_evict) == (100, 'largest', evicted.append)
+        for x in range(1000, 1060):
+            part.insert(x)
+        assert len(part) == 100
+        check_rb_tree(part)
+    left = bounded_rb_tree.from_sorted(range(60), capacity = 100)
+    right = bounded_rb_tree.from_sorted(range(61, 121), capacity = 100)
+    joined = bounded_rb_tree.join(left, 60, right)
+    assert [node.data for node in joined] == list(range(21, 121))
+    check_rb_tree(joined)
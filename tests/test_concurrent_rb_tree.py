@@ -0,0 +1,32 @@
+import threading
+
+import pytest
+
+from concurrent_rb_tree import concurrent_rb_tree
+from rb_checks import check_rb_tree
+
+
+def test_iterator_fails_after_a_write_before_its_first_step():
+    tree = concurrent_rb_tree()
+    tree.insert_many(range(10))
+    iterator = tree.irange(5)
+    tree.delete(5)
+    with pytest.raises(RuntimeError):
+        next(iterator)
+
+
+def test_concurrent_writers_and_readers():
+    tree = concurrent_rb_tree()
+
+    def write(offset):
+        for x in range(offset, 1000, 4):
+            tree.insert(x)
+
+    threads = [threading.Thread(target = write, args = (i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [node.data for node in tree] == list(range(1000))
+    with tree.read_section() as plain:
+        check_rb_tree(plain)
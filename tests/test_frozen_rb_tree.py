@@ -0,0 +1,82 @@
+import bisect
+import random
+
+import pytest
+
+from frozen_rb_tree import frozen_rb_tree
+from rb_checks import check_rb_tree
+from rb_tree import rb_tree
+
+
+@pytest.fixture
+def reference():
+    rng = random.Random(4)
+    return sorted(rng.randrange(300) for _ in range(400))
+
+
+def test_lookup(reference):
+    frozen = rb_tree.from_iterable(reference).freeze()
+    assert list(frozen) == reference
+    assert list(reversed(frozen)) == reference[::-1]
+    assert len(frozen) == len(reference)
+    for x in range(-5, 310):
+        assert (x in frozen) == (x in reference)
+        if x in reference:
+            i = reference.index(x)
+            assert frozen.find(x) == i
+            assert frozen.find_successor(x) == (reference[i + 1] if i + 1 < len(reference) else None)
+        else:
+            with pytest.raises(KeyError):
+                frozen.find(x)
+            with pytest.raises(KeyError):
+                frozen.find_successor(x)
+    queries = list(range(-5, 310, 7))
+    assert frozen.contains_many(queries) == [x in reference for x in queries]
+    assert frozen.find_many(queries) == [reference.index(x) if x in reference else -1 for x in queries]
+    with pytest.raises(KeyError):
+        frozen_rb_tree().find(1)
+
+
+def test_rank_and_select(reference):
+    frozen = frozen_rb_tree(reference)
+    for x in range(-5, 310, 3):
+        assert frozen.rank(x) == bisect.bisect_left(reference, x)
+    assert frozen.rank_many(range(0, 300, 11)) == [bisect.bisect_left(reference, x)
+                                                   for x in range(0, 300, 11)]
+    for k in range(-len(reference), len(reference)):
+        assert frozen.select(k) == reference[k]
+    for k in (len(reference), -len(reference) - 1):
+        with pytest.raises(IndexError):
+            frozen.select(k)
+
+
+def test_range_queries(reference):
+    frozen = frozen_rb_tree(reference)
+    rng = random.Random(5)
+    for _ in range(100):
+        lo, hi = sorted(rng.randrange(-10, 310) for _ in range(2))
+        assert frozen.count_range(lo, hi) == sum(lo <= x <= hi for x in reference)
+        assert frozen.count_range(hi + 1, lo) == 0
+        for inclusive in ((True, True), (True, False), (False, True), (False, False)):
+            expected = [x for x in reference
+                        if (lo < x or (inclusive[0] and x == lo))
+                        and (x < hi or (inclusive[1] and x == hi))]
+            assert list(frozen.irange(lo, hi, inclusive)) == expected
+            assert list(frozen.irange(lo, hi, inclusive, reverse = True)) == expected[::-1]
+    assert list(frozen.irange(hi = 10)) == [x for x in reference if x <= 10]
+    assert list(frozen.irange(lo = 290)) == [x for x in reference if x >= 290]
+
+
+def test_immutability_and_thaw(reference):
+    frozen = frozen_rb_tree(reference)
+    for name in ('insert', 'delete', 'insert_many', 'delete_node'):
+        with pytest.raises(AttributeError):
+            getattr(frozen, name)(1)
+    with pytest.raises(AttributeError):
+        frozen.extra = 1
+    with pytest.raises(ValueError):
+        frozen_rb_tree([2, 1])
+    tree = frozen.thaw()
+    tree.insert(-1)
+    assert check_rb_tree(tree) == [-1] + reference
+    assert list(frozen) == reference
@@ -0,0 +1,146 @@
+import glob
+import os
+import time
+
+import pytest
+
+from journaled_rb_tree import journaled_rb_tree
+from rb_checks import check_rb_tree
+
+
+def crash_after(directory, work, **options):
+    """Runs work(journal) in a child process that then dies without closing the
+    journal, like a crash."""
+    if not hasattr(os, 'fork'):
+        pytest.skip('needs os.fork')
+    pid = os.fork()
+    if pid == 0:
+        try:
+            work(journaled_rb_tree(directory, **options))
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+
+def test_reopen_after_close(tmp_path):
+    directory = str(tmp_path)
+    with journaled_rb_tree(directory) as journal:
+        for x in range(100):
+            journal.insert(x)
+        journal.delete(50)
+        journal.insert_many([200, 201])
+        journal.delete_many([0, 1])
+    with journaled_rb_tree(directory) as journal:
+        expected = [x for x in range(2, 100) if x != 50] + [200, 201]
+        assert check_rb_tree(journal.tree) == expected
+
+
+def test_crash_keeps_synced_records(tmp_path):
+    directory = str(tmp_path)
+
+    def work(journal):
+        for x in range(10):
+            journal.insert(x)
+        journal.sync()
+        # pending, never synced
+        for x in range(10, 20):
+            journal.insert(x)
+
+    crash_after(directory, work, batch_size = 1000, fsync_interval = None)
+    with journaled_rb_tree(directory) as journal:
+        assert check_rb_tree(journal.tree) == list(range(10))
+
+
+def test_flush_timer_syncs_idle_records(tmp_path):
+    directory = str(tmp_path)
+
+    def work(journal):
+        for x in range(10):
+            journal.insert(x)
+        # no further modification, only the timer can commit the records
+        time.sleep(0.5)
+
+    crash_after(directory, work, batch_size = 1000, fsync_interval = 0.05)
+    with journaled_rb_tree(directory) as journal:
+        assert check_rb_tree(journal.tree) == list(range(10))
+
+
+def test_recovery_drops_torn_tail(tmp_path):
+    directory = str(tmp_path)
+    with journaled_rb_tree(directory) as journal:
+        for x in range(10):
+            journal.insert(x)
+    log, = glob.glob(os.path.join(directory, 'journal-*.log'))
+    good_size = os.path.getsize(log)
+    with open(log, 'ab') as f:
+        # header of a record whose payload never made it to disk
+        f.write(b'\x20\x00\x00\x00\x01\x02\x03\x04partial')
+
+    with journaled_rb_tree(directory) as journal:
+        assert check_rb_tree(journal.tree) == list(range(10))
+        assert os.path.getsize(log) == good_size
+        journal.insert(10)
+    with journaled_rb_tree(directory) as journal:
+        assert check_rb_tree(journal.tree) == list(range(11))
+
+
+def test_recovery_drops_corrupt_record(tmp_path):
+    directory = str(tmp_path)
+    with journaled_rb_tree(directory) as journal:
+        for x in range(5):
+            journal.insert(x)
+    log, = glob.glob(os.path.join(directory, 'journal-*.log'))
+    with open(log, 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xff]))
+    with journaled_rb_tree(directory) as journal:
+        assert check_rb_tree(journal.tree) == list(range(4))
+
+
+def test_checkpoints_and_recovery(tmp_path):
+    directory = str(tmp_path)
+
+    def work(journal):
+        for x in range(250):
+            journal.insert(x)
+        for x in range(0, 250, 5):
+            journal.delete(x)
+        journal.sync()
+
+    crash_after(directory, work, checkpoint_every = 40)
+    with journaled_rb_tree(directory) as journal:
+        assert check_rb_tree(journal.tree) == [x for x in range(250) if x % 5]
+        assert journal.generation > 0
+    # only the files of the current generation are left
+    assert len(glob.glob(os.path.join(directory, 'checkpoint-*.rbt'))) == 1
+    assert len(glob.glob(os.path.join(directory, 'journal-*.log'))) == 1
+
+
+def test_failed_delete_is_not_logged(tmp_path):
+    directory = str(tmp_path)
+    with journaled_rb_tree(directory) as journal:
+        journal.insert(1)
+        with pytest.raises(KeyError):
+            journal.delete(2)
+        with pytest.raises(KeyError):
+            journal.delete_many([1, 2])
+    with journaled_rb_tree(directory) as journal:
+        assert check_rb_tree(journal.tree) == [1]
+
+
+def test_undumpable_data_is_rejected_before_logging(tmp_path):
+    directory = str(tmp_path)
+    with journaled_rb_tree(directory, checkpoint_every = 3) as journal:
+        journal.insert(1)
+        for bad in ((1, 2), 'one', 2 ** 70):
+            with pytest.raises(TypeError):
+                journal.insert(bad)
+        with pytest.raises(TypeError):
+            journal.insert_many([2, 2.5])
+        # the checkpoints taken by the next inserts still work
+        journal.insert_many([2, 3])
+        journal.insert(4)
+    with journaled_rb_tree(directory) as journal:
+        assert check_rb_tree(journal.tree) == [1, 2, 3, 4]
@@ -0,0 +1,64 @@
+import bisect
+import random
+
+import pytest
+
+from persistent_rb_tree import persistent_rb_tree
+from rb_checks import check_persistent_tree
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_random_insert_delete_keeps_invariants(seed):
+    rng = random.Random(seed)
+    tree = persistent_rb_tree()
+    data = []
+    for step in range(2000):
+        x = rng.randrange(150)
+        if rng.random() < 0.6:
+            tree.insert(x)
+            bisect.insort(data, x)
+        elif x in data:
+            tree.delete(x)
+            data.remove(x)
+        else:
+            with pytest.raises(KeyError):
+                tree.delete(x)
+        if step % 100 == 0:
+            assert check_persistent_tree(tree.root) == data
+    assert [node.data for node in tree] == data
+    assert len(tree) == len(data)
+
+
+def test_snapshots_do_not_change():
+    rng = random.Random(7)
+    tree = persistent_rb_tree()
+    data = []
+    snapshots = []
+    for step in range(1500):
+        x = rng.randrange(100)
+        if rng.random() < 0.6:
+            tree.insert(x)
+            bisect.insort(data, x)
+        elif x in data:
+            tree.delete(x)
+            data.remove(x)
+        if step % 50 == 0:
+            snapshots.append((tree.snapshot(), list(data)))
+    for snapshot, expected in snapshots:
+        assert check_persistent_tree(snapshot.root) == expected
+        assert [node.data for node in snapshot] == expected
+        assert len(snapshot) == len(expected)
+
+
+def test_snapshot_queries():
+    tree = persistent_rb_tree()
+    for x in range(20):
+        tree.insert(x)
+    snapshot = tree.snapshot()
+    tree.delete(5)
+    assert snapshot.find_node(5).data == 5
+    with pytest.raises(KeyError):
+        tree.find_node(5)
+    assert snapshot.rank(10) == 10 and tree.rank(10) == 9
+    assert [node.data for node in snapshot.irange(3, 6)] == [3, 4, 5, 6]
+    assert [node.data for node in tree.irange(3, 6)] == [3, 4, 6]
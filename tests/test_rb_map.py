@@ -0,0 +1,30 @@
+from rb_checks import check_rb_tree
+from rb_map import rb_map
+
+
+def test_key_function_runs_once_per_call():
+    calls = []
+
+    def key(k):
+        calls.append(k)
+        return k.lower()
+
+    m = rb_map(key = key)
+    m['b'] = 1
+    assert calls == ['b']
+    m['B'] = 2
+    assert calls == ['b', 'B']
+    assert m.setdefault('a', 3) == 3
+    assert calls == ['b', 'B', 'a']
+    assert list(m.items()) == [('a', 3), ('b', 2)]
+    check_rb_tree(m.tree)
+
+
+def test_mapping_operations():
+    m = rb_map({3: 'c', 1: 'a'})
+    m[2] = 'b'
+    assert list(m) == [1, 2, 3]
+    assert m.pop(2) == 'b'
+    assert m.get(2) is None
+    del m[1]
+    assert list(m.items()) == [(3, 'c')]
@@ -0,0 +1,27 @@
+import pytest
+
+from rb_multiset import rb_multiset
+
+
+def test_counts():
+    s = rb_multiset()
+    s.add(5, 3)
+    s.add(1)
+    assert len(s) == 4 and s.count(5) == 3
+    assert s.discard(5, 2) == 2
+    assert s.discard(5, 7) == 1
+    assert s.discard(5) == 0
+    with pytest.raises(KeyError):
+        s.remove(1, 2)
+    s.remove(1)
+    assert len(s) == 0
+
+
+@pytest.mark.parametrize('n', [0, -1])
+def test_copies_must_be_positive(n):
+    s = rb_multiset()
+    s.add(5, 2)
+    for method in (s.add, s.discard, s.remove):
+        with pytest.raises(ValueError):
+            method(5, n)
+    assert s.count(5) == 2 and len(s) == 2
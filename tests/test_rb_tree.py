@@ -0,0 +1,237 @@
+import bisect
+import random
+
+import pytest
+
+from rb_checks import check_rb_tree
+from rb_tree import rb_tree
+
+
+def random_tree(rng, n, key_range):
+    tree = rb_tree()
+    data = []
+    for _ in range(n):
+        x = rng.randrange(key_range)
+        tree.insert(x)
+        bisect.insort(data, x)
+    return tree, data
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_insert_delete_keeps_invariants(seed):
+    rng = random.Random(seed)
+    tree = rb_tree()
+    data = []
+    for step in range(3000):
+        x = rng.randrange(200)
+        if rng.random() < 0.6:
+            tree.insert(x)
+            bisect.insort(data, x)
+        elif x in data:
+            tree.delete(x)
+            data.remove(x)
+        else:
+            with pytest.raises(KeyError):
+                tree.delete(x)
+        if step % 100 == 0:
+            assert check_rb_tree(tree) == data
+    assert check_rb_tree(tree) == data
+    for x in list(data):
+        tree.delete(x)
+    assert check_rb_tree(tree) == []
+    assert tree.root is None
+
+
+def test_find_node_and_successor():
+    tree = rb_tree.from_iterable([5, 1, 9, 3, 7])
+    assert tree.find_node(3).data == 3
+    assert tree.find_successor(3).data == 5
+    assert tree.find_successor(9) is None
+    with pytest.raises(KeyError):
+        tree.find_node(4)
+    with pytest.raises(KeyError):
+        rb_tree().find_node(1)
+
+
+def test_order_statistics():
+    rng = random.Random(1)
+    tree, data = random_tree(rng, 500, 100)
+    for k in range(len(data)):
+        assert tree.select(k).data == data[k]
+    for x in range(-1, 102):
+        assert tree.rank(x) == bisect.bisect_left(data, x)
+        assert tree.count_range(x, x + 10) == bisect.bisect_right(data, x + 10) - bisect.bisect_left(data, x)
+
+
+def test_irange_bounds():
+    tree = rb_tree.from_sorted(range(20))
+    assert [n.data for n in tree.irange(5, 9)] == [5, 6, 7, 8, 9]
+    assert [n.data for n in tree.irange(5, 9, (False, False))] == [6, 7, 8]
+    assert [n.data for n in tree.irange(5, 9, reverse = True)] == [9, 8, 7, 6, 5]
+    assert [n.data for n in reversed(tree)] == list(range(19, -1, -1))
+
+
+def test_iterator_fails_after_modification():
+    tree = rb_tree.from_sorted(range(10))
+    iterator = iter(tree)
+    next(iterator)
+    tree.insert(3)
+    with pytest.raises(RuntimeError):
+        next(iterator)
+
+
+@pytest.mark.parametrize('make_iterator', [
+    iter, reversed, lambda tree: tree.irange(5), lambda tree: tree.preorder(),
+    lambda tree: tree.postorder()])
+@pytest.mark.parametrize('modify', [
+    lambda tree: tree.delete(5), lambda tree: tree.insert(100)])
+def test_iterator_fails_after_modification_before_first_step(make_iterator, modify):
+    tree = rb_tree.from_sorted(range(10))
+    iterator = make_iterator(tree)
+    modify(tree)
+    with pytest.raises(RuntimeError):
+        next(iterator)
+
+
+def test_from_sorted_rejects_unsorted_data():
+    with pytest.raises(ValueError):
+        rb_tree.from_sorted([2, 1])
+
+
+@pytest.mark.parametrize('n', [0, 1, 2, 3, 7, 8, 100])
+def test_from_sorted_is_valid(n):
+    assert check_rb_tree(rb_tree.from_sorted(range(n))) == list(range(n))
+
+
+def test_from_iterable_sorts_the_data():
+    data = [random.Random(n).randrange(50) for n in range(200)]
+    assert check_rb_tree(rb_tree.from_iterable(data)) == sorted(data)
+
+
+def test_insert_many_and_delete_many():
+    rng = random.Random(2)
+    tree, data = random_tree(rng, 300, 1000)
+    # a small batch goes through insert_hint, a large one merges
+    for size in (10, 1000):
+        batch = [rng.randrange(1000) for _ in range(size)]
+        tree.insert_many(batch)
+        data = sorted(data + batch)
+        assert check_rb_tree(tree) == data
+    for size in (10, 1000):
+        batch = rng.sample(data, size)
+        tree.delete_many(batch)
+        for x in batch:
+            data.remove(x)
+        assert check_rb_tree(tree) == data
+    with pytest.raises(KeyError):
+        tree.delete_many([-1])
+    assert check_rb_tree(tree) == data
+
+
+def test_large_batches_keep_node_handles():
+    tree = rb_tree.from_sorted(range(0, 100, 2))
+    handles = {node.data: node for node in tree}
+    tree.insert_many(range(1, 100, 2))
+    assert check_rb_tree(tree) == list(range(100))
+    tree.delete_many(range(1, 100, 2))
+    assert check_rb_tree(tree) == list(range(0, 100, 2))
+    for data, node in handles.items():
+        assert tree.find_node(data) is node
+    tree.delete_node(handles[50])
+    assert 50 not in [node.data for node in tree]
+
+
+def test_large_delete_many_unlinks_the_deleted_nodes():
+    tree = rb_tree.from_sorted(range(100))
+    deleted = [tree.find_node(x) for x in range(0, 100, 2)]
+    tree.delete_many(range(0, 100, 2))
+    assert check_rb_tree(tree) == list(range(1, 100, 2))
+    for node in deleted:
+        assert node.left is None and node.right is None and node.parent is None
+
+
+def test_insert_hint():
+    tree = rb_tree()
+    hint = None
+    for x in range(100):
+        hint = tree.insert_hint(x, hint)
+    # a hint next to the position, and one far away that falls back to insert
+    tree.insert_hint(50, tree.find_node(51))
+    tree.insert_hint(-1, tree.find_node(90))
+    assert check_rb_tree(tree) == [-1] + list(range(51)) + list(range(50, 100))
+
+
+def test_pop_min_and_max():
+    tree = rb_tree.from_sorted(range(100))
+    assert tree.peek_min().data == 0 and tree.peek_max().data == 99
+    assert tree.pop_min() == 0
+    assert tree.pop_max() == 99
+    assert check_rb_tree(tree) == list(range(1, 99))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_join(seed):
+    rng = random.Random(seed)
+    left, left_data = random_tree(rng, rng.randrange(200), 100)
+    right, right_data = random_tree(rng, rng.randrange(200), 100)
+    right = rb_tree.from_sorted(x + 200 for x in right_data)
+    tree = rb_tree.join(left, 150, right)
+    assert check_rb_tree(tree) == left_data + [150] + [x + 200 for x in right_data]
+    assert left.root is None and right.root is None
+
+
+def test_join_rejects_unordered_trees():
+    with pytest.raises(ValueError):
+        rb_tree.join(rb_tree.from_sorted([5]), 3, rb_tree())
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_split(seed):
+    rng = random.Random(seed)
+    tree, data = random_tree(rng, 500, 300)
+    at = rng.randrange(-10, 310)
+    lower, upper = tree.split(at)
+    assert check_rb_tree(lower) == [x for x in data if x < at]
+    assert check_rb_tree(upper) == [x for x in data if x >= at]
+    assert tree.root is None
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_set_operations(seed):
+    rng = random.Random(seed)
+    a = set(rng.sample(range(1000), rng.randrange(1, 400)))
+    b = set(rng.sample(range(1000), rng.randrange(1, 400)))
+    for operation, expected in (('union', a | b), ('intersection', a & b),
+                                ('difference', a - b)):
+        tree = rb_tree.from_iterable(a)
+        other = rb_tree.from_iterable(b)
+        getattr(tree, operation)(other)
+        assert check_rb_tree(tree) == sorted(expected)
+        assert other.root is None
+
+
+@pytest.mark.parametrize('operation', ['union', 'intersection', 'difference'])
+def test_set_operations_keep_or_unlink_node_handles(operation):
+    tree = rb_tree.from_sorted(range(0, 60, 2))
+    other = rb_tree.from_sorted(range(0, 60, 3))
+    handles = list(tree) + list(other)
+    getattr(tree, operation)(other)
+    kept = set(map(id, tree))
+    for node in handles:
+        if id(node) in kept:
+            assert tree.find_node(node.data) is not None
+        else:
+            assert node.left is None and node.right is None and node.parent is None
+    # a kept handle still works as a hint
+    hint = tree.leftmost
+    tree.insert_hint(hint.data + 1, hint)
+    check_rb_tree(tree)
+
+
+def test_nearest_key_queries():
+    tree = rb_tree.from_sorted([10, 20, 30])
+    assert tree.floor(25).data == 20
+    assert tree.ceiling(25).data == 30
+    assert tree.upper_bound(20).data == 30
+    assert tree.find_predecessor(10) is None
+    assert [n.data for n in tree.nearest(21, 2)] == [20, 30]
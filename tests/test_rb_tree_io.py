@@ -0,0 +1,110 @@
+import random
+
+import pytest
+
+from augmented_rb_tree import augmented_rb_tree
+from rb_checks import check_aggregates, check_rb_tree
+from rb_tree import rb_tree
+
+
+def shape_of(tree):
+    return [(node.data, node.color, node.left.data, node.right.data) for node in tree.preorder()]
+
+
+@pytest.mark.parametrize('keys', [
+    [],
+    [5],
+    list(range(-50, 1000, 3)),
+    [-2 ** 63, 0, 2 ** 63 - 1],
+    [0.5, -1.25, 1e300],
+    ['', 'a', 'bé', 'zz' * 50],
+    [b'', b'\x00\xff', b'abc'],
+])
+@pytest.mark.parametrize('shape', [False, True])
+def test_round_trip(tmp_path, keys, shape):
+    tree = rb_tree()
+    for key in random.Random(1).sample(keys, len(keys)):
+        tree.insert(key)
+    path = str(tmp_path / 'tree.rbt')
+    tree.dump(path, shape = shape)
+    loaded = rb_tree.load(path)
+    assert check_rb_tree(loaded) == sorted(keys)
+    if shape:
+        assert shape_of(loaded) == shape_of(tree)
+    mapped = rb_tree.load_mmap(path)
+    assert list(mapped) == sorted(keys)
+    for key in keys:
+        assert key in mapped
+
+
+def test_round_trip_with_duplicates(tmp_path):
+    tree = rb_tree.from_iterable([3, 1, 3, 2, 3])
+    path = str(tmp_path / 'tree.rbt')
+    tree.dump(path, shape = True)
+    assert check_rb_tree(rb_tree.load(path)) == [1, 2, 3, 3, 3]
+
+
+def test_loaded_tree_can_be_modified(tmp_path):
+    path = str(tmp_path / 'tree.rbt')
+    rb_tree.from_sorted(range(100)).dump(path, shape = True)
+    tree = rb_tree.load(path)
+    for x in range(0, 100, 3):
+        tree.delete(x)
+    tree.insert(1000)
+    assert check_rb_tree(tree) == [x for x in range(100) if x % 3] + [1000]
+
+
+def test_dump_rejects_unsupported_data(tmp_path):
+    with pytest.raises(TypeError):
+        rb_tree.from_iterable([1, 2.5]).dump(str(tmp_path / 'tree.rbt'))
+    with pytest.raises(TypeError):
+        rb_tree.from_iterable([(1, 2)]).dump(str(tmp_path / 'tree.rbt'))
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'not a tree at all, just some bytes')
+    with pytest.raises(ValueError):
+        rb_tree.load(str(path))
+
+
+@pytest.mark.parametrize('shape', [False, True])
+def test_round_trip_with_augmented_tree(tmp_path, shape):
+    tree = augmented_rb_tree(value = lambda data: data * data, combine = max, identity = -1)
+    for key in random.Random(2).sample(range(300), 200):
+        tree.insert(key)
+    path = str(tmp_path / 'tree.rbt')
+    tree.dump(path, shape = shape)
+    loaded = augmented_rb_tree.load(path, value = lambda data: data * data, combine = max,
+                                    identity = -1)
+    assert check_aggregates(loaded) == sorted(node.data for node in tree)
+    assert loaded.aggregate() == tree.aggregate()
+    if shape:
+        assert shape_of(loaded) == shape_of(tree)
+    loaded.delete(loaded.rightmost.data)
+    check_aggregates(loaded)
+
+
+def test_shape_load_goes_through_the_node_hooks(tmp_path):
+    linked = []
+
+    class hooked_tree(rb_tree):
+        def _new_node(self, data, parent):
+            if data < 0:
+                raise ValueError('Error, negative data')
+            return rb_tree._new_node(self, data, parent)
+
+        def _after_link(self, node):
+            # children are linked before their parent
+            assert all(child is self.sentinel or id(child) in linked
+                       for child in (node.left, node.right))
+            linked.append(id(node))
+
+    path = str(tmp_path / 'tree.rbt')
+    rb_tree.from_iterable(range(50)).dump(path, shape = True)
+    tree = hooked_tree.load(path)
+    assert check_rb_tree(tree) == list(range(50))
+    assert len(linked) == 50
+    rb_tree.from_iterable(range(-5, 5)).dump(path, shape = True)
+    with pytest.raises(ValueError):
+        hooked_tree.load(path)
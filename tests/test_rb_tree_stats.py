@@ -0,0 +1,67 @@
+import random
+
+from rb_checks import check_rb_tree
+from rb_tree import rb_tree
+
+
+def test_counters():
+    tree = rb_tree()
+    stats = tree.enable_stats()
+    keys = random.Random(1).sample(range(1000), 500)
+    for x in keys:
+        tree.insert(x)
+    assert stats.operations['insert'] == 500
+    assert stats.rotations > 0
+    assert stats.insert_fixup_iterations > 0
+    assert sum(stats.depth_histogram.values()) == 500
+
+    stats.reset()
+    tree.find_node(keys[0])
+    # the search compares for equality and order at every node but the one it finds
+    depth, = stats.depth_histogram
+    assert stats.comparisons == 2 * depth - 1
+    assert stats.operations == {'find_node': 1}
+
+    for x in keys[::2]:
+        tree.delete(x)
+    assert stats.delete_fixup_iterations > 0
+    assert stats.height() >= stats.black_height() > 0
+    check_rb_tree(tree)
+
+
+def test_hook_and_disable():
+    calls = []
+    tree = rb_tree()
+    tree.enable_stats(hook = lambda operation, seconds: calls.append(operation))
+    tree.insert(1)
+    tree.find_successor(1)
+    assert calls == ['insert', 'find_node', 'find_successor']
+    stats = tree.disable_stats()
+    assert type(tree) is rb_tree and tree.stats is None
+    tree.insert(2)
+    assert stats.operations['insert'] == 1
+    assert check_rb_tree(tree) == [1, 2]
+
+
+def test_as_dict():
+    tree = rb_tree.from_sorted(range(7))
+    tree.enable_stats()
+    result = tree.stats.as_dict()
+    assert result['height'] == 3 and result['black_height'] == 3
+
+
+def test_exact_counts_of_a_small_tree():
+    tree = rb_tree()
+    stats = tree.enable_stats()
+    for x in (1, 2, 3):
+        tree.insert(x)
+    # the first root is blackened, the third insert recolors its parent and grandparent
+    # in one fixup pass and rotates once
+    assert (stats.recolors, stats.insert_fixup_iterations, stats.rotations) == (3, 1, 1)
+    assert stats.depth_histogram == {0: 3}
+    assert stats.comparisons == 2
+    stats.reset()
+    tree.bst_insert(0)
+    assert stats.depth_histogram == {2: 1} and stats.comparisons == 3
+    assert stats.recolors == 0
+
@@ -0,0 +1,38 @@
+import rb_tree_trace
+from rb_tree import rb_tree
+from rb_tree_trace import ITERATE, SNAPSHOT, read_trace, replay, trace_recorder
+
+
+def test_snapshot_of_initial_data(tmp_path):
+    path = str(tmp_path / 'trace.bin')
+    with trace_recorder(rb_tree.from_sorted([1, 2.5, 3]), path) as recorder:
+        recorder.delete(2.5)
+        recorder.find_node(3)
+    records = read_trace(path)
+    assert records[0] == (SNAPSHOT, [1, 2.5, 3])
+    result = replay(records, rb_tree())
+    assert result['operations'] == 2
+    # the delete finds the data of the snapshot
+    assert result['latency']['delete']['misses'] == 0
+    assert rb_tree_trace.main([path]) == 0
+
+
+def test_iterations_are_recorded_where_they_start(tmp_path, monkeypatch):
+    path = str(tmp_path / 'trace.bin')
+    monkeypatch.setattr(trace_recorder, 'BUFFER_SIZE', 16)
+    recorder = trace_recorder(rb_tree.from_sorted(range(10)), path)
+    unstarted = recorder.inorder()
+    late = recorder.inorder()
+    next(late)
+    next(late)
+    # flushed before the late iteration ends, its count is patched in the file
+    recorder.find_node(5)
+    partial = iter(recorder)
+    next(partial)
+    for _ in recorder:
+        pass
+    late.close()
+    recorder.close()
+    assert read_trace(path)[1:] == [(ITERATE, 0), (ITERATE, 2), (b'f', 5), (ITERATE, 1),
+                                    (ITERATE, 10)]
+    del unstarted, partial
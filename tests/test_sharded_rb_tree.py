@@ -0,0 +1,80 @@
+import operator
+
+import pytest
+
+from sharded_rb_tree import sharded_rb_tree
+
+# 0, 3, ..., 297 split at two data values: [0, 99), [99, 201) and [201, 300)
+DATA = list(range(0, 300, 3))
+BOUNDARIES = [99, 201]
+
+
+@pytest.fixture(scope = 'module', params = ['rb', 'btree'])
+def tree(request):
+    with sharded_rb_tree(BOUNDARIES, engine = request.param, items = DATA) as tree:
+        yield tree
+
+
+def in_range(x, lo, hi, inclusive):
+    return (lo < x or (inclusive[0] and x == lo)) and (x < hi or (inclusive[1] and x == hi))
+
+
+def test_shards_hold_their_key_ranges(tree):
+    assert tree.shard_sizes() == [33, 34, 33]
+    assert list(tree) == DATA and len(tree) == len(DATA)
+
+
+@pytest.mark.parametrize('inclusive', [(True, True), (True, False), (False, True), (False, False)])
+def test_irange_with_exclusive_bounds(tree, inclusive):
+    # the bounds are the first data of the second and third shard
+    for lo, hi in ((99, 201), (96, 99), (0, 297), (100, 200), (201, 201)):
+        expected = [x for x in DATA if in_range(x, lo, hi, inclusive)]
+        assert list(tree.irange(lo, hi, inclusive)) == expected
+    assert list(tree.irange(hi = 99, inclusive = inclusive)) == \
+        [x for x in DATA if x < 99 or (inclusive[1] and x == 99)]
+    assert list(tree.irange(lo = 201, inclusive = inclusive)) == \
+        [x for x in DATA if x > 201 or (inclusive[0] and x == 201)]
+
+
+def test_count_ranges_across_shards(tree):
+    ranges = [(0, 297), (50, 250), (98, 99), (99, 99), (200, 202), (150, 140), (-10, -1),
+              (290, 1000)]
+    assert tree.count_ranges(ranges) == [sum(lo <= x <= hi for x in DATA) for lo, hi in ranges]
+    assert tree.count_range(90, 210) == sum(90 <= x <= 210 for x in DATA)
+
+
+def test_aggregate(tree):
+    assert tree.aggregate(None, None, sum, operator.add) == sum(DATA)
+    assert tree.aggregate(50, 250, sum, operator.add) == sum(x for x in DATA if 50 <= x <= 250)
+    assert tree.aggregate(99, 201, sum, operator.add, (False, False)) == \
+        sum(x for x in DATA if 99 < x < 201)
+    assert tree.aggregate(10, 280, max, max) == 279
+    assert tree.aggregate(5, 1, sum, operator.add) == 0
+
+
+def test_find_successor_crosses_into_the_next_shard(tree):
+    assert tree.find_successor(96) == 99
+    assert tree.find_successor(198) == 201
+    assert tree.find_successor(99) == 102
+    assert tree.find_successor(297) is None
+    with pytest.raises(KeyError):
+        tree.find_successor(1)
+
+
+def test_find_successor_skips_empty_shards():
+    with sharded_rb_tree([10, 20, 30], items = [1, 5, 35]) as tree:
+        assert tree.shard_sizes() == [2, 0, 0, 1]
+        assert tree.find_successor(5) == 35
+        assert tree.find_successor(35) is None
+
+
+@pytest.mark.parametrize('engine', ['rb', 'btree'])
+def test_delete_of_a_missing_key(engine):
+    with sharded_rb_tree(BOUNDARIES, engine = engine, items = DATA) as tree:
+        with pytest.raises(KeyError):
+            tree.delete(100)
+        # the worker survives the error and the size is unchanged
+        assert len(tree) == len(DATA)
+        tree.delete(99)
+        assert 99 not in tree and len(tree) == len(DATA) - 1
+        assert tree.shard_sizes() == [33, 33, 33]
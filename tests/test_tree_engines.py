@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+from sharded_rb_tree import sharded_rb_tree
+from tree_engines import ENGINES, make_tree
+
+
+@pytest.mark.parametrize('engine', sorted(ENGINES))
+def test_insert_many(engine):
+    rng = random.Random(3)
+    tree = make_tree(engine)
+    data = []
+    # a batch that is small and one that is large compared with the tree
+    for size in (200, 10, 1000):
+        batch = [rng.randrange(500) for _ in range(size)]
+        tree.insert_many(batch)
+        data = sorted(data + batch)
+        assert [item.data for item in tree] == data
+        assert len(tree) == len(data)
+    tree.insert(250)
+    tree.delete(250)
+    assert [item.data for item in tree] == data
+
+
+def test_sharded_insert_many():
+    with sharded_rb_tree.from_iterable(range(0, 100, 2), shards = 2, engine = 'btree') as tree:
+        tree.insert_many(range(1, 100, 2))
+        assert list(tree) == list(range(100))
+        assert sum(tree.shard_sizes()) == 100
+
+
+# the arena engine has no fail-fast iterators
+@pytest.mark.parametrize('engine', ['btree', 'rb'])
+@pytest.mark.parametrize('reverse', [False, True])
+def test_irange_fails_after_modification_before_first_step(engine, reverse):
+    tree = make_tree(engine)
+    tree.insert_many(range(10))
+    iterator = tree.irange(2, 8, reverse = reverse)
+    tree.delete(5)
+    with pytest.raises(RuntimeError):
+        next(iterator)
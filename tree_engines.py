@@ -0,0 +1,51 @@
+"""Selection of the tree engine by name, so a caller can switch between engines with a
+configuration value and compare them on the same workload.
+
+All engines support insert, insert_many, delete, find_node, find_successor, inorder,
+iteration and len, and the nodes / items they return have the data as .data.
+
+Examples
+--------
+    tree = make_tree('btree', fanout = 128)
+    tree = make_tree(config.get('engine', 'rb'))
+"""
+import importlib
+
+# engine name -> module:class, imported when the engine is first used
+ENGINES = {
+    'rb': 'rb_tree:rb_tree',
+    'arena': 'arena_rb_tree:arena_rb_tree',
+    'btree': 'b_tree:b_tree',
+}
+
+
+def engine_class(engine):
+    """Returns the tree class of an engine.
+
+    Parameters
+    ----------
+    engine: str
+        a name of ENGINES, or any tree class as module:class
+
+    Raises
+    ------
+    ValueError
+        if engine is neither"""
+    spec = ENGINES.get(engine, engine)
+    module, _, name = spec.partition(':')
+    if not name:
+        raise ValueError('Error, unknown engine {!r}, expected one of {} or module:class'.format(
+            engine, ', '.join(sorted(ENGINES))))
+    return getattr(importlib.import_module(module), name)
+
+
+def make_tree(engine = 'rb', *args, **kwargs):
+    """Creates an empty tree of the given engine.
+
+    Parameters
+    ----------
+    engine: str
+        a name of ENGINES, or any tree class as module:class
+    args, kwargs:
+        passed on to the constructor, e.g. typecode for 'arena' or fanout for 'btree'"""
+    return engine_class(engine)(*args, **kwargs)